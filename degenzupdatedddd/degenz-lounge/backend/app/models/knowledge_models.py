@@ -2,13 +2,49 @@
 Knowledge Management System models for DeGeNz Lounge.
 """
 
-from sqlalchemy import Column, Integer, String, Text, ForeignKey, DateTime, Boolean, Table, Float
+import os
+import re
+from sqlalchemy import Column, Integer, String, Text, ForeignKey, DateTime, Boolean, Table, Float, Index
 from sqlalchemy.orm import relationship
-from sqlalchemy.sql import func
+from sqlalchemy.sql import func, literal_column
 from sqlalchemy.dialects.postgresql import JSONB, ARRAY
 
 from app.database import Base
 
+# Optional pgvector support for server-side similarity search
+try:
+    from pgvector.sqlalchemy import Vector
+except ImportError:
+    Vector = None
+
+EMBEDDING_DIMENSIONS = int(os.getenv("EMBEDDING_DIMENSIONS", "768"))
+PGVECTOR_INDEX_TYPE = os.getenv("KNOWLEDGE_PGVECTOR_INDEX", "hnsw")  # hnsw or ivfflat
+PGVECTOR_ENABLED = Vector is not None and os.getenv("KNOWLEDGE_VECTOR_BACKEND", "numpy") == "pgvector"
+
+# Text search configuration for the knowledge_items full-text index
+FTS_CONFIG = os.getenv("KNOWLEDGE_FTS_CONFIG", "english")
+if not re.fullmatch(r"[a-z_]+", FTS_CONFIG):
+    raise ValueError(f"Invalid KNOWLEDGE_FTS_CONFIG {FTS_CONFIG!r}: expected a text search configuration name")
+
+
+def fts_config():
+    """
+    The text search configuration as a SQL literal. It is inlined rather than bound because the
+    GIN expression index only matches queries that repeat the same constant.
+    """
+    return literal_column(f"'{FTS_CONFIG}'")
+
+
+def search_document(title, content):
+    """
+    tsvector over an item's title and content. The GIN index and full-text queries must build
+    the same expression for Postgres to use the index.
+    """
+    return func.to_tsvector(
+        fts_config(),
+        func.coalesce(title, '') + ' ' + func.coalesce(content, '')
+    )
+
 
 # Association table for knowledge items and tags
 knowledge_item_tags = Table(
@@ -72,6 +108,9 @@ class KnowledgeItem(Base):
     importance = Column(Float, default=1.0)  # Used for ranking and retrieval
     metadata = Column(JSONB)
     embedding = Column(ARRAY(Float))  # Vector embedding for semantic search
+    if PGVECTOR_ENABLED:
+        # Same embedding as a pgvector column so Postgres can rank by distance (see migrate_knowledge.py)
+        embedding_vector = Column(Vector(EMBEDDING_DIMENSIONS))
     created_at = Column(DateTime(timezone=True), server_default=func.now())
     updated_at = Column(DateTime(timezone=True), onupdate=func.now())
     repository_id = Column(Integer, ForeignKey('knowledge_repositories.id'))
@@ -85,6 +124,20 @@ class KnowledgeItem(Base):
     related_agents = relationship("Agent", secondary=knowledge_item_agents, back_populates="knowledge_items")
     connections = relationship("KnowledgeConnection", back_populates="source_item")
 
+    __table_args__ = (
+        # Full-text index for lexical and hybrid search (Postgres only)
+        Index('ix_knowledge_items_fts', search_document(title, content), postgresql_using='gin').ddl_if(dialect='postgresql'),
+    )
+    if PGVECTOR_ENABLED:
+        __table_args__ += (
+            Index(
+                'ix_knowledge_items_embedding_vector',
+                'embedding_vector',
+                postgresql_using=PGVECTOR_INDEX_TYPE,
+                postgresql_ops={'embedding_vector': 'vector_cosine_ops'}
+            ),
+        )
+
 
 class KnowledgeTag(Base):
     """
@@ -131,8 +184,13 @@ class Document(Base):
     file_path = Column(String(500), nullable=False)
     file_type = Column(String(50))  # pdf, docx, txt, etc.
     file_size = Column(Integer)  # Size in bytes
+    content_hash = Column(String(64), index=True)  # sha256 of the file contents
     processed = Column(Boolean, default=False)
-    processing_status = Column(String(50), default="pending")  # pending, processing, completed, failed
+    processing_status = Column(String(50), default="pending")  # pending, queued, processing, completed, failed
+    processing_attempts = Column(Integer, default=0)
+    processing_error = Column(Text, nullable=True)
+    # Refreshed by the process holding the document's job; recovery only takes expired leases
+    processing_heartbeat_at = Column(DateTime(timezone=True), nullable=True)
     created_at = Column(DateTime(timezone=True), server_default=func.now())
     updated_at = Column(DateTime(timezone=True), onupdate=func.now())
     uploader_id = Column(Integer, ForeignKey('users.id'))
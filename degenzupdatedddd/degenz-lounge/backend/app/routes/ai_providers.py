@@ -2,11 +2,18 @@
 API routes for AI provider management
 """
 
+import json
+
 from fastapi import APIRouter, Depends, HTTPException, Body
+from fastapi.responses import StreamingResponse
 from typing import Dict, List, Any, Optional
 from pydantic import BaseModel
 
 from app.services.ai.ai_service import AIService
+from app.services.ai.completion_cache import completion_cache
+from app.services.ai.router import provider_router
+from app.services.ai.rate_limiter import rate_limiter
+from app.services.ai.single_flight import single_flight
 from app.utils.auth import get_current_user
 
 router = APIRouter(
@@ -27,21 +34,33 @@ class GenerateResponseRequest(BaseModel):
     messages: List[Dict[str, str]]
     agent_config: Dict[str, Any]
     api_key: Optional[str] = None
+    cache: Optional[bool] = None
 
 @router.get("/")
 async def get_available_providers(current_user = Depends(get_current_user)):
     """Get all available AI providers"""
     return ai_service.get_available_providers()
 
+@router.get("/cache/stats")
+async def get_completion_cache_stats(current_user = Depends(get_current_user)):
+    """Hit-rate statistics for the completion cache and in-flight request coalescing"""
+    return dict(completion_cache.stats(), coalescing=single_flight.stats())
+
+@router.get("/health")
+async def get_provider_health(current_user = Depends(get_current_user)):
+    """Per-provider error rate, p95 latency, circuit breaker state and rate limiter queues"""
+    return dict(provider_router.stats(), rate_limits=rate_limiter.stats())
+
 @router.get("/{provider}/models")
 async def get_provider_models(
     provider: str, 
     api_key: Optional[str] = None,
+    refresh: bool = False,
     current_user = Depends(get_current_user)
 ):
     """Get available models for a specific provider"""
     try:
-        models = ai_service.get_provider_models(provider, api_key)
+        models = await ai_service.get_provider_models(provider, api_key, refresh)
         return {"models": models}
     except Exception as e:
         raise HTTPException(status_code=400, detail=str(e))
@@ -52,7 +71,7 @@ async def validate_api_key(
     current_user = Depends(get_current_user)
 ):
     """Validate an API key for a specific provider"""
-    is_valid = ai_service.validate_api_key(request.provider, request.api_key)
+    is_valid = await ai_service.validate_api_key(request.provider, request.api_key)
     return {"valid": is_valid}
 
 @router.post("/generate")
@@ -62,12 +81,33 @@ async def generate_response(
 ):
     """Generate a response using a specific provider"""
     try:
-        response = ai_service.generate_agent_response(
+        response = await ai_service.generate_agent_response(
             provider_name=request.provider,
             messages=request.messages,
             agent_config=request.agent_config,
-            api_key=request.api_key
+            api_key=request.api_key,
+            cache=request.cache,
+            client=f"user:{current_user.id}"
         )
         return {"response": response}
     except Exception as e:
         raise HTTPException(status_code=400, detail=str(e))
+
+@router.post("/generate/stream")
+async def stream_response(
+    request: GenerateResponseRequest,
+    current_user = Depends(get_current_user)
+):
+    """Stream a response using a specific provider as server-sent events"""
+    async def events():
+        async for delta in ai_service.stream_agent_response(
+            provider_name=request.provider,
+            messages=request.messages,
+            agent_config=request.agent_config,
+            api_key=request.api_key,
+            client=f"user:{current_user.id}"
+        ):
+            yield f"data: {json.dumps({'delta': delta})}\n\n"
+        yield "data: [DONE]\n\n"
+    
+    return StreamingResponse(events(), media_type="text/event-stream")
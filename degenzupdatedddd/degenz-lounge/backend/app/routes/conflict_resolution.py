@@ -6,7 +6,7 @@ import json
 from app.database import get_db
 from app.models import schemas, models
 from app.utils import auth
-from app.services.ai.gemini_service import GeminiService, LangChainService
+from app.services.ai.gemini_service import GeminiService, LangChainService, get_gemini_service
 
 router = APIRouter()
 
@@ -15,7 +15,7 @@ async def create_conflict_resolution(
     conflict_resolution: schemas.ConflictResolutionCreate, 
     db: Session = Depends(get_db), 
     current_user: schemas.User = Depends(auth.get_current_user),
-    gemini_service: GeminiService = Depends(lambda: GeminiService())
+    gemini_service: GeminiService = Depends(get_gemini_service)
 ):
     """
     Create a new conflict resolution record
@@ -128,7 +128,7 @@ async def create_conflict_resolution(
         
         try:
             # Generate response from the manager agent
-            response = await langchain_service.run_agent_workflow(agent_data, prompt)
+            response = await langchain_service.run_agent_workflow(agent_data, prompt, f"session:{session.id}")
             
             # Save the resolution message to the database
             resolution_message = models.Message(
@@ -307,7 +307,7 @@ async def submit_consensus_proposal(
     proposal_data: Dict[str, Any],
     db: Session = Depends(get_db),
     current_user: schemas.User = Depends(auth.get_current_user),
-    gemini_service: GeminiService = Depends(lambda: GeminiService())
+    gemini_service: GeminiService = Depends(get_gemini_service)
 ):
     """
     Submit a proposal for consensus-based conflict resolution
@@ -417,7 +417,7 @@ async def submit_consensus_proposal(
         
         try:
             # Generate synthesis from the manager agent
-            synthesis = await langchain_service.run_agent_workflow(agent_data, prompt)
+            synthesis = await langchain_service.run_agent_workflow(agent_data, prompt, f"session:{session.id}")
             
             # Save the resolution message to the database
             resolution_message = models.Message(
@@ -6,7 +6,7 @@ import json
 from app.database import get_db
 from app.models import schemas, models
 from app.utils import auth
-from app.services.ai.gemini_service import GeminiService, LangChainService
+from app.services.ai.gemini_service import GeminiService, LangChainService, get_gemini_service
 
 router = APIRouter()
 
@@ -482,7 +482,7 @@ async def create_hierarchical_message(
     message: schemas.HierarchicalMessageCreate,
     db: Session = Depends(get_db), 
     current_user: schemas.User = Depends(auth.get_current_user),
-    gemini_service: GeminiService = Depends(lambda: GeminiService())
+    gemini_service: GeminiService = Depends(get_gemini_service)
 ):
     """
     Create a new hierarchical message
@@ -715,7 +715,7 @@ async def create_hierarchical_message(
         
         try:
             # Generate response from the agent
-            response = await langchain_service.run_agent_workflow(agent_data, prompt)
+            response = await langchain_service.run_agent_workflow(agent_data, prompt, f"session:{session.id}")
             
             # Determine the appropriate response type
             response_type = "response"
@@ -2,11 +2,13 @@
 API routes for Knowledge Management System.
 """
 
+import os
 from typing import List, Optional, Dict, Any
-from fastapi import APIRouter, Depends, HTTPException, UploadFile, File, Form, Query
+from fastapi import APIRouter, Depends, HTTPException, UploadFile, File, Form, Query, Request, Response
+from fastapi.responses import StreamingResponse
 from sqlalchemy.orm import Session
 
-from app.database import get_db
+from app.database import get_db, SessionLocal
 from app.utils.auth import get_current_user
 from app.models.knowledge_models import (
     KnowledgeRepository,
@@ -21,8 +23,11 @@ from app.services.knowledge.knowledge_service import (
     KnowledgeService,
     DocumentService,
     WebResearchService,
-    CitationService
+    CitationService,
+    vector_indexes,
+    embedding_cache
 )
+from app.services.knowledge.document_queue import document_queue
 from app.models.schemas import (
     KnowledgeRepositoryCreate,
     KnowledgeRepositoryResponse,
@@ -39,12 +44,40 @@ from app.models.schemas import (
     UserResponse
 )
 
+# Largest number of items accepted by one /items:batch request
+KNOWLEDGE_BATCH_MAX_ITEMS = int(os.getenv("KNOWLEDGE_BATCH_MAX_ITEMS", "1000"))
+
 router = APIRouter(
     prefix="/knowledge",
     tags=["knowledge"],
     responses={404: {"description": "Not found"}},
 )
 
+@router.on_event("startup")
+def load_vector_indexes():
+    """Load persisted vector indexes, rebuilding any that are missing or stale."""
+    db = SessionLocal()
+    try:
+        if not KnowledgeService.uses_pgvector(db):
+            vector_indexes.load_all(db)
+    finally:
+        db.close()
+
+@router.on_event("shutdown")
+def flush_vector_indexes():
+    """Persist vector index changes that have not been written yet."""
+    vector_indexes.flush()
+
+@router.on_event("startup")
+async def start_document_queue():
+    """Start the document processing workers."""
+    await document_queue.start()
+
+@router.on_event("shutdown")
+async def stop_document_queue():
+    """Stop the document processing workers and the extraction process pool."""
+    await document_queue.stop()
+
 # Repository routes
 @router.post("/repositories", response_model=KnowledgeRepositoryResponse)
 async def create_repository(
@@ -92,6 +125,16 @@ async def get_repository(
     
     return repository
 
+@router.delete("/repositories/{repository_id}", status_code=204)
+async def delete_repository(
+    repository_id: int,
+    db: Session = Depends(get_db),
+    current_user: UserResponse = Depends(get_current_user)
+):
+    """Delete a repository and everything in it. Only the owner can delete a repository."""
+    await KnowledgeService.delete_repository(db=db, repository_id=repository_id, owner_id=current_user.id)
+    return None
+
 @router.post("/repositories/{repository_id}/share", response_model=KnowledgeRepositoryResponse)
 async def share_repository(
     repository_id: int,
@@ -129,25 +172,88 @@ async def create_knowledge_item(
         tag_ids=item.tag_ids
     )
 
+@router.post("/items:batch")
+async def create_knowledge_items(
+    items: List[KnowledgeItemCreate],
+    db: Session = Depends(get_db),
+    current_user: UserResponse = Depends(get_current_user)
+):
+    """Create many knowledge items with one embedding pass and one transaction."""
+    if len(items) > KNOWLEDGE_BATCH_MAX_ITEMS:
+        raise HTTPException(
+            status_code=413, detail=f"At most {KNOWLEDGE_BATCH_MAX_ITEMS} items can be created per batch"
+        )
+    
+    item_ids = await KnowledgeService.create_knowledge_items(
+        db=db,
+        items=[item.dict() for item in items],
+        creator_id=current_user.id
+    )
+    return {"created": len(item_ids), "item_ids": item_ids}
+
+@router.delete("/items/{item_id}", status_code=204)
+async def delete_knowledge_item(
+    item_id: int,
+    db: Session = Depends(get_db),
+    current_user: UserResponse = Depends(get_current_user)
+):
+    """Delete a knowledge item."""
+    await KnowledgeService.delete_knowledge_item(db=db, item_id=item_id, user_id=current_user.id)
+    return None
+
 @router.get("/search", response_model=List[KnowledgeItemResponse])
 async def search_knowledge(
     query: str,
     repository_id: Optional[int] = None,
     tag_ids: List[int] = Query(None),
     limit: int = 10,
+    nprobe: Optional[int] = Query(None, ge=1, description="Index clusters probed per repository; higher is slower but more accurate"),
+    exact: bool = False,
+    mode: Optional[str] = Query(None, pattern="^(vector|lexical|hybrid)$", description="Retrieval mode; defaults to KNOWLEDGE_SEARCH_MODE"),
     db: Session = Depends(get_db),
     current_user: UserResponse = Depends(get_current_user)
 ):
-    """Search knowledge items using semantic search."""
+    """Search knowledge items using semantic, full-text or hybrid retrieval."""
     return await KnowledgeService.search_knowledge(
         db=db,
         user_id=current_user.id,
         query=query,
         repository_id=repository_id,
         tag_ids=tag_ids,
-        limit=limit
+        limit=limit,
+        nprobe=nprobe,
+        exact=exact,
+        mode=mode
+    )
+
+@router.get("/search/documents")
+async def search_documents(
+    query: str,
+    repository_id: Optional[int] = None,
+    limit: int = 10,
+    chunks_per_document: int = Query(3, ge=1, le=20),
+    nprobe: Optional[int] = Query(None, ge=1),
+    db: Session = Depends(get_db),
+    current_user: UserResponse = Depends(get_current_user)
+):
+    """Search document chunks, grouped by document and ranked by best chunk."""
+    return await KnowledgeService.search_documents(
+        db=db,
+        user_id=current_user.id,
+        query=query,
+        repository_id=repository_id,
+        limit=limit,
+        chunks_per_document=chunks_per_document,
+        nprobe=nprobe
     )
 
+@router.get("/embedding-cache/stats")
+async def get_embedding_cache_stats(
+    current_user: UserResponse = Depends(get_current_user)
+):
+    """Get hit/miss counters for the embedding cache."""
+    return embedding_cache.stats()
+
 @router.post("/connections", response_model=KnowledgeConnectionResponse)
 async def create_connection(
     connection: KnowledgeConnectionCreate,
@@ -165,19 +271,87 @@ async def create_connection(
 
 @router.get("/graph", response_model=KnowledgeGraphResponse)
 async def get_knowledge_graph(
+    request: Request,
+    response: Response,
     repository_id: Optional[int] = None,
     central_item_id: Optional[int] = None,
-    depth: int = 2,
+    depth: int = Query(2, ge=1, le=10),
+    max_nodes: Optional[int] = Query(None, ge=1, le=50000),
     db: Session = Depends(get_db),
     current_user: UserResponse = Depends(get_current_user)
 ):
-    """Get knowledge graph data for visualization."""
+    """
+    Get knowledge graph data for visualization.
+    Responses carry an ETag; send it back in If-None-Match to get a 304 when nothing changed.
+    """
+    etag = await KnowledgeService.get_graph_etag(
+        db=db,
+        user_id=current_user.id,
+        repository_id=repository_id,
+        central_item_id=central_item_id,
+        depth=depth,
+        max_nodes=max_nodes
+    )
+    if etag:
+        if request.headers.get("if-none-match") == etag:
+            return Response(status_code=304, headers={"ETag": etag})
+        response.headers["ETag"] = etag
+    
     return await KnowledgeService.get_knowledge_graph(
         db=db,
         user_id=current_user.id,
         repository_id=repository_id,
         central_item_id=central_item_id,
-        depth=depth
+        depth=depth,
+        max_nodes=max_nodes
+    )
+
+@router.get("/graph/export")
+async def export_knowledge_graph(
+    repository_id: Optional[int] = None,
+    db: Session = Depends(get_db),
+    current_user: UserResponse = Depends(get_current_user)
+):
+    """Stream the whole graph as NDJSON: one node or edge object per line, nodes first."""
+    lines = await KnowledgeService.export_knowledge_graph(
+        db=db,
+        user_id=current_user.id,
+        repository_id=repository_id
+    )
+    return StreamingResponse(lines, media_type="application/x-ndjson")
+
+@router.get("/graph/nodes")
+async def get_graph_nodes(
+    repository_id: Optional[int] = None,
+    cursor: Optional[int] = None,
+    limit: int = Query(1000, ge=1, le=10000),
+    db: Session = Depends(get_db),
+    current_user: UserResponse = Depends(get_current_user)
+):
+    """Page through graph nodes; follow next_cursor until it is null."""
+    return await KnowledgeService.get_graph_nodes_page(
+        db=db,
+        user_id=current_user.id,
+        repository_id=repository_id,
+        cursor=cursor,
+        limit=limit
+    )
+
+@router.get("/graph/edges")
+async def get_graph_edges(
+    repository_id: Optional[int] = None,
+    cursor: Optional[int] = None,
+    limit: int = Query(1000, ge=1, le=10000),
+    db: Session = Depends(get_db),
+    current_user: UserResponse = Depends(get_current_user)
+):
+    """Page through graph edges; follow next_cursor until it is null."""
+    return await KnowledgeService.get_graph_edges_page(
+        db=db,
+        user_id=current_user.id,
+        repository_id=repository_id,
+        cursor=cursor,
+        limit=limit
     )
 
 # Document routes
@@ -200,7 +374,7 @@ async def get_document(
     db: Session = Depends(get_db),
     current_user: UserResponse = Depends(get_current_user)
 ):
-    """Get a specific document."""
+    """Get a specific document. Poll processing_status to follow background processing."""
     document = db.query(Document).filter(
         Document.id == document_id,
         Document.uploader_id == current_user.id
@@ -217,7 +391,7 @@ async def process_document(
     db: Session = Depends(get_db),
     current_user: UserResponse = Depends(get_current_user)
 ):
-    """Process a document and extract knowledge items."""
+    """Queue a document for (re)processing."""
     # Check if user has permission
     document = db.query(Document).filter(
         Document.id == document_id,
@@ -227,7 +401,15 @@ async def process_document(
     if not document:
         raise HTTPException(status_code=404, detail="Document not found or you don't have permission")
     
-    return await DocumentService.process_document(db=db, document_id=document_id)
+    if document.processing_status in ("queued", "processing"):
+        return document
+    
+    document.processing_status = "queued"
+    document.processing_attempts = 0
+    db.commit()
+    db.refresh(document)
+    await document_queue.enqueue(document.id)
+    return document
 
 # Web research routes
 @router.post("/web/search", response_model=List[WebSearchResultResponse])
@@ -5,7 +5,7 @@ from typing import List, Optional, Dict, Any
 from app.database import get_db
 from app.models import schemas, models
 from app.utils import auth
-from app.services.ai.gemini_service import GeminiService, LangChainService
+from app.services.ai.gemini_service import GeminiService, LangChainService, get_gemini_service
 
 router = APIRouter()
 
@@ -242,7 +242,7 @@ async def execute_workflow_step(
     workflow_session_id: int, 
     db: Session = Depends(get_db), 
     current_user: schemas.User = Depends(auth.get_current_user),
-    gemini_service: GeminiService = Depends(lambda: GeminiService())
+    gemini_service: GeminiService = Depends(get_gemini_service)
 ):
     """
     Execute the current step of a workflow
@@ -370,7 +370,7 @@ async def execute_workflow_step(
     
     try:
         # Generate response from the agent
-        response = await langchain_service.run_agent_workflow(agent_data, prompt)
+        response = await langchain_service.run_agent_workflow(agent_data, prompt, f"session:{session.id}")
         
         # Save the message to the database
         db_message = models.Message(
@@ -7,14 +7,17 @@ This module implements connections to various AI providers:
 - Perplexity
 - Hugging Face
 - Mistral
+- Local mock (offline)
 """
 
 import os
 import json
-import requests
 from typing import Dict, List, Any, Optional
 import logging
 
+from app.services.ai.http_client import get_http_client
+from app.services.ai.providers import LocalMockProvider
+
 logger = logging.getLogger(__name__)
 
 class OpenRouterService:
@@ -30,22 +33,22 @@ class OpenRouterService:
             "HTTP-Referer": "https://degenz-lounge.com"  # Replace with your actual domain
         }
     
-    def list_models(self) -> List[Dict[str, Any]]:
+    async def list_models(self) -> List[Dict[str, Any]]:
         """Get available models from OpenRouter."""
         try:
-            response = requests.get(f"{self.base_url}/models", headers=self.headers)
+            response = await get_http_client("openrouter").get(f"{self.base_url}/models", headers=self.headers)
             response.raise_for_status()
             return response.json().get("data", [])
         except Exception as e:
             logger.error(f"Error fetching OpenRouter models: {e}")
             return []
     
-    def generate_response(self, 
-                         prompt: str, 
-                         model: str = "openai/gpt-3.5-turbo", 
-                         system_prompt: Optional[str] = None,
-                         temperature: float = 0.7,
-                         max_tokens: int = 1024) -> Dict[str, Any]:
+    async def generate_response(self, 
+                               prompt: str, 
+                               model: str = "openai/gpt-3.5-turbo", 
+                               system_prompt: Optional[str] = None,
+                               temperature: float = 0.7,
+                               max_tokens: int = 1024) -> Dict[str, Any]:
         """Generate a response using OpenRouter API."""
         try:
             messages = []
@@ -60,7 +63,7 @@ class OpenRouterService:
                 "max_tokens": max_tokens
             }
             
-            response = requests.post(
+            response = await get_http_client("openrouter").post(
                 f"{self.base_url}/chat/completions", 
                 headers=self.headers,
                 json=payload
@@ -84,11 +87,11 @@ class GrokService:
             "Content-Type": "application/json"
         }
     
-    def generate_response(self, 
-                         prompt: str, 
-                         system_prompt: Optional[str] = None,
-                         temperature: float = 0.7,
-                         max_tokens: int = 1024) -> Dict[str, Any]:
+    async def generate_response(self, 
+                               prompt: str, 
+                               system_prompt: Optional[str] = None,
+                               temperature: float = 0.7,
+                               max_tokens: int = 1024) -> Dict[str, Any]:
         """Generate a response using Grok API."""
         try:
             messages = []
@@ -102,7 +105,7 @@ class GrokService:
                 "max_tokens": max_tokens
             }
             
-            response = requests.post(
+            response = await get_http_client("grok").post(
                 f"{self.base_url}/chat/completions", 
                 headers=self.headers,
                 json=payload
@@ -126,22 +129,22 @@ class DeepSeekService:
             "Content-Type": "application/json"
         }
     
-    def list_models(self) -> List[Dict[str, Any]]:
+    async def list_models(self) -> List[Dict[str, Any]]:
         """Get available models from DeepSeek."""
         try:
-            response = requests.get(f"{self.base_url}/models", headers=self.headers)
+            response = await get_http_client("deepseek").get(f"{self.base_url}/models", headers=self.headers)
             response.raise_for_status()
             return response.json().get("data", [])
         except Exception as e:
             logger.error(f"Error fetching DeepSeek models: {e}")
             return []
     
-    def generate_response(self, 
-                         prompt: str, 
-                         model: str = "deepseek-chat",
-                         system_prompt: Optional[str] = None,
-                         temperature: float = 0.7,
-                         max_tokens: int = 1024) -> Dict[str, Any]:
+    async def generate_response(self, 
+                               prompt: str, 
+                               model: str = "deepseek-chat",
+                               system_prompt: Optional[str] = None,
+                               temperature: float = 0.7,
+                               max_tokens: int = 1024) -> Dict[str, Any]:
         """Generate a response using DeepSeek API."""
         try:
             messages = []
@@ -156,7 +159,7 @@ class DeepSeekService:
                 "max_tokens": max_tokens
             }
             
-            response = requests.post(
+            response = await get_http_client("deepseek").post(
                 f"{self.base_url}/chat/completions", 
                 headers=self.headers,
                 json=payload
@@ -180,12 +183,12 @@ class PerplexityService:
             "Content-Type": "application/json"
         }
     
-    def generate_response(self, 
-                         prompt: str, 
-                         model: str = "pplx-7b-online",
-                         system_prompt: Optional[str] = None,
-                         temperature: float = 0.7,
-                         max_tokens: int = 1024) -> Dict[str, Any]:
+    async def generate_response(self, 
+                               prompt: str, 
+                               model: str = "pplx-7b-online",
+                               system_prompt: Optional[str] = None,
+                               temperature: float = 0.7,
+                               max_tokens: int = 1024) -> Dict[str, Any]:
         """Generate a response using Perplexity API."""
         try:
             messages = []
@@ -200,7 +203,7 @@ class PerplexityService:
                 "max_tokens": max_tokens
             }
             
-            response = requests.post(
+            response = await get_http_client("perplexity").post(
                 f"{self.base_url}/chat/completions", 
                 headers=self.headers,
                 json=payload
@@ -215,6 +218,8 @@ class PerplexityService:
 class HuggingFaceService:
     """Service for interacting with Hugging Face Inference API."""
     
+    EMBEDDING_BATCH_SIZE = 32
+    
     def __init__(self, api_key: Optional[str] = None):
         """Initialize Hugging Face service with API key."""
         self.api_key = api_key or os.environ.get("HUGGINGFACE_API_KEY")
@@ -224,12 +229,12 @@ class HuggingFaceService:
             "Content-Type": "application/json"
         }
     
-    def generate_response(self, 
-                         prompt: str, 
-                         model: str = "meta-llama/Llama-2-70b-chat-hf",
-                         system_prompt: Optional[str] = None,
-                         temperature: float = 0.7,
-                         max_tokens: int = 1024) -> Dict[str, Any]:
+    async def generate_response(self, 
+                               prompt: str, 
+                               model: str = "meta-llama/Llama-2-70b-chat-hf",
+                               system_prompt: Optional[str] = None,
+                               temperature: float = 0.7,
+                               max_tokens: int = 1024) -> Dict[str, Any]:
         """Generate a response using Hugging Face Inference API."""
         try:
             # Format prompt based on whether system prompt is provided
@@ -246,7 +251,7 @@ class HuggingFaceService:
                 }
             }
             
-            response = requests.post(
+            response = await get_http_client("huggingface").post(
                 f"{self.base_url}/{model}", 
                 headers=self.headers,
                 json=payload
@@ -269,11 +274,25 @@ class HuggingFaceService:
         except Exception as e:
             logger.error(f"Error generating Hugging Face response: {e}")
             return {"error": str(e)}
+    
+    async def embed_texts(self, 
+                          texts: List[str], 
+                          model: str = "sentence-transformers/all-mpnet-base-v2") -> List[List[float]]:
+        """Generate embeddings for a batch of texts using the feature-extraction pipeline."""
+        response = await get_http_client("huggingface").post(
+            f"https://api-inference.huggingface.co/pipeline/feature-extraction/{model}",
+            headers=self.headers,
+            json={"inputs": texts, "options": {"wait_for_model": True}}
+        )
+        response.raise_for_status()
+        return response.json()
 
 
 class MistralService:
     """Service for interacting with Mistral AI API."""
     
+    EMBEDDING_BATCH_SIZE = 64
+    
     def __init__(self, api_key: Optional[str] = None):
         """Initialize Mistral service with API key."""
         self.api_key = api_key or os.environ.get("MISTRAL_API_KEY")
@@ -283,22 +302,22 @@ class MistralService:
             "Content-Type": "application/json"
         }
     
-    def list_models(self) -> List[Dict[str, Any]]:
+    async def list_models(self) -> List[Dict[str, Any]]:
         """Get available models from Mistral."""
         try:
-            response = requests.get(f"{self.base_url}/models", headers=self.headers)
+            response = await get_http_client("mistral").get(f"{self.base_url}/models", headers=self.headers)
             response.raise_for_status()
             return response.json().get("data", [])
         except Exception as e:
             logger.error(f"Error fetching Mistral models: {e}")
             return []
     
-    def generate_response(self, 
-                         prompt: str, 
-                         model: str = "mistral-medium",
-                         system_prompt: Optional[str] = None,
-                         temperature: float = 0.7,
-                         max_tokens: int = 1024) -> Dict[str, Any]:
+    async def generate_response(self, 
+                               prompt: str, 
+                               model: str = "mistral-medium",
+                               system_prompt: Optional[str] = None,
+                               temperature: float = 0.7,
+                               max_tokens: int = 1024) -> Dict[str, Any]:
         """Generate a response using Mistral AI API."""
         try:
             messages = []
@@ -313,7 +332,7 @@ class MistralService:
                 "max_tokens": max_tokens
             }
             
-            response = requests.post(
+            response = await get_http_client("mistral").post(
                 f"{self.base_url}/chat/completions", 
                 headers=self.headers,
                 json=payload
@@ -323,6 +342,57 @@ class MistralService:
         except Exception as e:
             logger.error(f"Error generating Mistral response: {e}")
             return {"error": str(e)}
+    
+    async def embed_texts(self, texts: List[str], model: str = "mistral-embed") -> List[List[float]]:
+        """Generate embeddings for a batch of texts using Mistral AI API."""
+        response = await get_http_client("mistral").post(
+            f"{self.base_url}/embeddings",
+            headers=self.headers,
+            json={"model": model, "input": texts}
+        )
+        response.raise_for_status()
+        data = sorted(response.json().get("data", []), key=lambda item: item.get("index", 0))
+        return [item.get("embedding", []) for item in data]
+
+
+class LocalMockService:
+    """Service for the offline local mock model, answering in the OpenAI-compatible format."""
+    
+    def __init__(self, api_key: Optional[str] = None):
+        """Initialize the local mock service; latency and failures come from the LOCAL_LLM_* settings."""
+        self.provider = LocalMockProvider(api_key)
+        self.api_key = self.provider.api_key
+    
+    async def list_models(self) -> List[Dict[str, Any]]:
+        """Get the local mock model."""
+        return await self.provider.get_available_models()
+    
+    async def generate_response(self, 
+                               prompt: str, 
+                               model: str = "local-mock",
+                               system_prompt: Optional[str] = None,
+                               temperature: float = 0.7,
+                               max_tokens: int = 1024) -> Dict[str, Any]:
+        """Generate a deterministic response from the local mock model."""
+        result = await self.provider.generate(
+            [{"role": "user", "content": prompt}], system_prompt, temperature, max_tokens, model=model
+        )
+        if result.error is not None:
+            return {"error": result.error}
+        return {
+            "model": result.model,
+            "choices": [
+                {
+                    "message": {"role": "assistant", "content": result.text},
+                    "finish_reason": result.finish_reason
+                }
+            ],
+            "usage": {
+                "prompt_tokens": result.prompt_tokens,
+                "completion_tokens": result.completion_tokens,
+                "total_tokens": result.total_tokens
+            }
+        }
 
 
 class AIProviderFactory:
@@ -337,7 +407,8 @@ class AIProviderFactory:
             "deepseek": DeepSeekService,
             "perplexity": PerplexityService,
             "huggingface": HuggingFaceService,
-            "mistral": MistralService
+            "mistral": MistralService,
+            "local": LocalMockService
         }
         
         provider_class = providers.get(provider_name.lower())
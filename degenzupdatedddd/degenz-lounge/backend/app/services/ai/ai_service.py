@@ -7,9 +7,16 @@ This service manages AI provider integrations and handles agent interactions.
 import os
 import json
 import logging
-from typing import Dict, List, Any, Optional, Union
+from typing import AsyncIterator, Dict, List, Any, Optional, Union
 
-from app.services.ai.providers import get_provider, get_all_providers
+from app.services.ai.providers import get_all_providers, LOCAL_LLM_ENABLED
+from app.services.ai.provider_registry import provider_registry, provider_key
+from app.services.ai.model_catalog import model_catalog
+from app.services.ai.router import provider_router
+from app.services.ai.rate_limiter import rate_limiter, estimate_tokens
+from app.services.ai.single_flight import single_flight
+from app.services.ai.completion_cache import completion_cache
+from app.services.ai.usage import GenerationResult
 
 logger = logging.getLogger(__name__)
 
@@ -18,7 +25,7 @@ class AIService:
     
     def __init__(self):
         """Initialize the AI service"""
-        self.default_provider = "gemini"
+        self.default_provider = "local" if LOCAL_LLM_ENABLED else "gemini"
         self.providers_info = get_all_providers()
     
     def get_available_providers(self) -> Dict[str, Dict[str, Any]]:
@@ -30,37 +37,52 @@ class AIService:
         """
         return self.providers_info
     
-    def get_provider_models(self, provider_name: str, api_key: str = None) -> List[Dict[str, str]]:
+    async def get_provider_models(self, provider_name: str, api_key: str = None,
+                                  refresh: bool = False) -> List[Dict[str, str]]:
         """
-        Get available models for a specific provider
+        Get available models for a specific provider, served from the model catalog cache
         
         Args:
             provider_name: Name of the provider
             api_key: Optional API key
+            refresh: Discard the cached catalog and fetch it again
             
         Returns:
             List of model dictionaries with 'id' and 'name' keys
         """
         try:
-            provider = get_provider(provider_name, api_key)
-            return provider.get_available_models()
+            provider = provider_registry.get(provider_name, api_key)
+            key = provider_key(provider_name, api_key)
+            if refresh:
+                model_catalog.invalidate(key)
+            return await model_catalog.get(key, provider.get_available_models)
         except Exception as e:
             logger.error(f"Error getting models for provider {provider_name}: {str(e)}")
             return []
     
-    def generate_agent_response(self, 
-                               provider_name: str,
-                               messages: List[Dict[str, str]],
-                               agent_config: Dict[str, Any],
-                               api_key: str = None) -> str:
+    async def generate_agent_response(self, 
+                                     provider_name: str,
+                                     messages: List[Dict[str, str]],
+                                     agent_config: Dict[str, Any],
+                                     api_key: str = None,
+                                     cache: Optional[bool] = None,
+                                     priority: str = "interactive",
+                                     client: str = "default") -> str:
         """
         Generate a response from an agent using the specified provider
         
         Args:
             provider_name: Name of the AI provider to use
             messages: List of message dictionaries with 'role' and 'content' keys
-            agent_config: Configuration for the agent (system prompt, temperature, etc.)
+            agent_config: Configuration for the agent (system prompt, temperature, etc.).
+                Optional "fallback_providers" lists providers to fail over to, and
+                "hedge_after_ms" sends a backup request when the provider is slower than that
             api_key: Optional API key for the provider
+            cache: True to cache this call, False to bypass the completion cache;
+                by default only temperature-0 calls are cached
+            priority: Scheduling class for the provider rate limiter
+                ("interactive", "default" or "background")
+            client: User or session id; the rate limiter queues clients fairly
             
         Returns:
             Generated response text
@@ -70,39 +92,119 @@ class AIService:
             if not provider_name:
                 provider_name = self.default_provider
             
-            # Get provider instance
-            provider = get_provider(provider_name, api_key)
-            
             # Extract agent configuration
             system_prompt = agent_config.get("system_prompt", "")
             temperature = agent_config.get("temperature", 0.7)
             max_tokens = agent_config.get("max_tokens", 1024)
             model = agent_config.get("model", "")
             
-            # Generate response
-            if provider_name in ["openrouter", "huggingface"] and model:
-                # These providers need model specified in the method call
-                return provider.generate_response(
-                    messages=messages,
-                    system_prompt=system_prompt,
-                    temperature=temperature,
-                    max_tokens=max_tokens,
-                    model=model
+            providers = [provider_name] + [p for p in agent_config.get("fallback_providers", []) if p != provider_name]
+            request_key = completion_cache.request_key(
+                provider_name, model, system_prompt, messages, temperature, max_tokens
+            )
+            
+            use_cache = completion_cache.should_cache(temperature, cache)
+            if use_cache:
+                cached = completion_cache.get(request_key)
+                if cached is not None:
+                    return cached
+            
+            async def attempt(name: str) -> GenerationResult:
+                # The API key and model only apply to the requested provider; fallbacks use their defaults
+                primary = name == provider_name
+                return await self._call_provider(
+                    name, messages, system_prompt, temperature, max_tokens,
+                    model if primary else "", api_key if primary else None, priority, client
                 )
-            else:
-                # Standard provider call
-                return provider.generate_response(
-                    messages=messages,
-                    system_prompt=system_prompt,
-                    temperature=temperature,
-                    max_tokens=max_tokens
+            
+            async def generate() -> str:
+                # Generate response, failing over along fallback_providers
+                used_provider, result = await provider_router.call(
+                    attempt, providers, hedge_after_ms=agent_config.get("hedge_after_ms")
                 )
+                if use_cache and used_provider == provider_name:
+                    completion_cache.set(request_key, result.text)
+                return result.text
+            
+            # Identical concurrent requests share one upstream call
+            flight_key = completion_cache.request_key(
+                provider_name, model, system_prompt, messages, temperature, max_tokens,
+                fallback_providers=providers[1:], api_key=provider_key(provider_name, api_key)
+            )
+            return await single_flight.do(flight_key, generate)
                 
         except Exception as e:
             logger.error(f"Error generating agent response with provider {provider_name}: {str(e)}")
             return f"Error: Unable to generate response with {provider_name}. {str(e)}"
     
-    def validate_api_key(self, provider_name: str, api_key: str) -> bool:
+    async def _call_provider(self, provider_name: str, messages: List[Dict[str, str]], system_prompt: str,
+                             temperature: float, max_tokens: int, model: str = "", api_key: str = None,
+                             priority: str = "interactive", client: str = "default") -> GenerationResult:
+        provider = provider_registry.get(provider_name, api_key)
+        kwargs = {
+            "messages": messages,
+            "system_prompt": system_prompt,
+            "temperature": temperature,
+            "max_tokens": max_tokens
+        }
+        if provider_name in ["openrouter", "huggingface"] and model:
+            # These providers need model specified in the method call
+            kwargs["model"] = model
+        
+        tokens = estimate_tokens(messages, system_prompt, max_tokens)
+        async with rate_limiter.slot(provider_name, api_key, tokens=tokens, priority=priority, client=client,
+                                     prompt_tokens=tokens - max_tokens) as grant:
+            result = await provider.generate(**kwargs)
+            grant.record(result)
+        return result
+    
+    async def stream_agent_response(self,
+                                    provider_name: str,
+                                    messages: List[Dict[str, str]],
+                                    agent_config: Dict[str, Any],
+                                    api_key: str = None,
+                                    client: str = "default") -> AsyncIterator[str]:
+        """
+        Stream a response from an agent using the specified provider
+        
+        Args:
+            provider_name: Name of the AI provider to use
+            messages: List of message dictionaries with 'role' and 'content' keys
+            agent_config: Configuration for the agent (system prompt, temperature, etc.)
+            api_key: Optional API key for the provider
+            client: User or session id; the rate limiter queues clients fairly
+            
+        Yields:
+            Response text deltas; a failure is reported as a final "Error: ..." delta
+        """
+        provider_name = provider_name or self.default_provider
+        try:
+            provider = provider_registry.get(provider_name, api_key)
+            
+            kwargs = {
+                "messages": messages,
+                "system_prompt": agent_config.get("system_prompt", ""),
+                "temperature": agent_config.get("temperature", 0.7),
+                "max_tokens": agent_config.get("max_tokens", 1024)
+            }
+            model = agent_config.get("model", "")
+            if provider_name in ["openrouter", "huggingface"] and model:
+                kwargs["model"] = model
+            
+            tokens = estimate_tokens(messages, kwargs["system_prompt"], kwargs["max_tokens"])
+            async with rate_limiter.slot(provider_name, api_key, tokens=tokens, client=client,
+                                         prompt_tokens=tokens - kwargs["max_tokens"]) as grant:
+                parts = []
+                async for delta in provider.stream_response(**kwargs):
+                    parts.append(delta)
+                    yield delta
+                grant.record("".join(parts))
+        
+        except Exception as e:
+            logger.error(f"Error streaming agent response with provider {provider_name}: {str(e)}")
+            yield f"Error: Unable to generate response with {provider_name}. {str(e)}"
+    
+    async def validate_api_key(self, provider_name: str, api_key: str) -> bool:
         """
         Validate an API key for a specific provider
         
@@ -114,10 +216,10 @@ class AIService:
             True if the API key is valid, False otherwise
         """
         try:
-            provider = get_provider(provider_name, api_key)
+            provider = provider_registry.get(provider_name, api_key)
             
             # Try to get models as a simple validation test
-            models = provider.get_available_models()
+            models = await provider.get_available_models()
             
             # If we get here without an exception, the key is valid
             return True
@@ -0,0 +1,87 @@
+"""
+Completion cache for deterministic LLM calls.
+
+Responses are keyed by a hash of the canonicalized request (provider, model, system prompt,
+messages and sampling parameters) and stored in the in-process LRU with an optional Redis tier.
+Only temperature-0 requests are cached unless the caller opts in with cache=True;
+cache=False bypasses the cache for a single call.
+"""
+
+import os
+import json
+import hashlib
+import logging
+from typing import Any, Dict, List, Optional
+
+from app.services.ai.usage import response_error
+from app.utils.cache import TieredCache
+
+logger = logging.getLogger(__name__)
+
+COMPLETION_CACHE_ENABLED = os.getenv("COMPLETION_CACHE_ENABLED", "true").lower() == "true"
+COMPLETION_CACHE_SIZE = int(os.getenv("COMPLETION_CACHE_SIZE", "2000"))
+COMPLETION_CACHE_TTL = float(os.getenv("COMPLETION_CACHE_TTL", "86400"))
+
+
+class CompletionCache:
+    """Cache of provider responses keyed by canonical request hash, with hit-rate counters."""
+
+    def __init__(self, max_size: int = None, ttl: float = None, use_redis: bool = True, enabled: bool = None):
+        self.enabled = COMPLETION_CACHE_ENABLED if enabled is None else enabled
+        self.cache = TieredCache(
+            namespace="completions",
+            max_size=max_size or COMPLETION_CACHE_SIZE,
+            ttl=ttl or COMPLETION_CACHE_TTL,
+            use_redis=use_redis
+        )
+        self.bypasses = 0
+
+    @staticmethod
+    def request_key(provider: str, model: Optional[str], system_prompt: Optional[str],
+                    messages: List[Dict[str, str]], temperature: float, max_tokens: int,
+                    **params) -> str:
+        """Hash of the request; equal requests map to the same key regardless of dict ordering."""
+        request = {
+            "provider": provider.lower(),
+            "model": model or "",
+            "system_prompt": system_prompt or "",
+            "messages": [{"role": m.get("role", "user"), "content": m.get("content", "")} for m in messages],
+            "temperature": round(float(temperature), 4),
+            "max_tokens": int(max_tokens),
+            "params": {key: value for key, value in params.items() if value is not None}
+        }
+        canonical = json.dumps(request, sort_keys=True, separators=(",", ":"), ensure_ascii=False, default=str)
+        return hashlib.sha256(canonical.encode("utf-8")).hexdigest()
+
+    def should_cache(self, temperature: float, cache: Optional[bool] = None) -> bool:
+        """Whether a call takes part in caching: explicit opt-in/out wins, otherwise temperature 0 only."""
+        if not self.enabled or cache is False:
+            if cache is False:
+                self.bypasses += 1
+            return False
+        return bool(cache) or float(temperature) == 0.0
+
+    @staticmethod
+    def is_cacheable(response: Any) -> bool:
+        """Failed calls ({"error": ...} dicts, GenerationResults with `error` set) and empty text are not cached."""
+        return response != "" and response_error(response) is None
+
+    def get(self, key: str) -> Any:
+        return self.cache.get(key)
+
+    def set(self, key: str, response: Any) -> None:
+        if self.is_cacheable(response):
+            self.cache.set(key, response)
+
+    def delete(self, key: str) -> None:
+        self.cache.delete(key)
+
+    def stats(self) -> Dict[str, Any]:
+        stats = self.cache.stats()
+        stats["enabled"] = self.enabled
+        stats["bypasses"] = self.bypasses
+        return stats
+
+
+# Shared cache used by the AI services
+completion_cache = CompletionCache()
@@ -1,29 +1,108 @@
 import os
-from langchain.llms import Gemini
-from langchain.chains import LLMChain
-from langchain.prompts import PromptTemplate
-from typing import Dict, List, Any, Optional
+import time
+import logging
+from typing import AsyncIterator, Dict, List, Any, Optional
 import json
 
+try:
+    from langchain.llms import Gemini
+    from langchain.chains import LLMChain
+    from langchain.prompts import PromptTemplate
+except ImportError:  # only needed for the hosted model; the local mock runs without it
+    Gemini = LLMChain = PromptTemplate = None
+
+from app.services.ai.http_client import get_http_client
+from app.services.ai.providers import LOCAL_LLM_ENABLED, LocalMockProvider
+from app.services.ai.streaming import stream_gemini_content
+from app.services.ai.single_flight import single_flight
+from app.services.ai.provider_registry import provider_registry, provider_key
+from app.services.ai.router import provider_router, ProviderRouterError
+from app.services.ai.rate_limiter import rate_limiter, estimate_tokens
+from app.services.ai.usage import GenerationResult
+
+logger = logging.getLogger(__name__)
+
+# Providers tried after Gemini for chat and agent calls, e.g. "mistral,deepseek"
+GEMINI_FALLBACK_PROVIDERS = [p.strip() for p in os.getenv("GEMINI_FALLBACK_PROVIDERS", "").split(",") if p.strip()]
+# Completion budget reserved with the rate limiter per call; Gemini calls set no max_tokens
+GEMINI_RESPONSE_TOKENS = 1024
+
 class GeminiService:
     """
     Service for interacting with Gemini Flash 2.0
     """
+    EMBEDDING_BATCH_SIZE = 100  # batchEmbedContents limit
+    # generate/generate_response take their own rate limiter slots; callers must not hold one around them
+    schedules_own_calls = True
+    
     def __init__(self):
         # In a real implementation, you would use the actual Gemini API
         # For now, we'll create a mock implementation
         self.api_key = os.getenv("GEMINI_API_KEY", "mock_key")
-        self.model = self._initialize_model()
+        # With LOCAL_LLM_ENABLED all generation is served offline by the local mock model
+        self.local = LocalMockProvider() if LOCAL_LLM_ENABLED else None
+        self.model = None if self.local else self._initialize_model()
     
     def _initialize_model(self):
         # This is a placeholder for the actual Gemini model initialization
         # In a real implementation, you would use the Gemini API
+        if Gemini is None:
+            raise ImportError("langchain is required for the Gemini model; set LOCAL_LLM_ENABLED=true to run offline")
         return Gemini(api_key=self.api_key, model_name="gemini-flash-2.0")
     
-    async def generate_response(self, prompt: str, system_instructions: str = None) -> str:
+    async def generate_response(self, prompt: str, system_instructions: str = None,
+                                client: str = "default", priority: str = "interactive") -> str:
         """
         Generate a response from Gemini
+        
+        Returns the text, or an "Error: ..." string when neither Gemini nor any fallback answered,
+        like the other providers' generate_response. See generate for routing and scheduling.
         """
+        result = await self.generate(prompt, system_instructions, client, priority)
+        return result.response
+    
+    async def generate(self, prompt: str, system_instructions: str = None,
+                       client: str = "default", priority: str = "interactive") -> GenerationResult:
+        """
+        Generate a response from Gemini as a GenerationResult; failures set `error` instead of raising.
+        
+        The call goes through the provider router: Gemini's circuit breaker and health stats
+        apply, and GEMINI_FALLBACK_PROVIDERS are tried in order when Gemini fails. Each attempt
+        is scheduled by the provider rate limiter in the given priority class, queued fairly
+        per `client` (a user or session id).
+        """
+        system_instructions = system_instructions or "You are a helpful AI assistant."
+        messages = [{"role": "user", "content": prompt}]
+        
+        async def attempt(provider_name: str) -> GenerationResult:
+            if provider_name == "gemini":
+                async with self._slot(prompt, system_instructions, client, priority) as grant:
+                    result = await self._generate(prompt, system_instructions)
+                    grant.record(result)
+                    return result
+            provider = provider_registry.get(provider_name)
+            async with self._slot(prompt, system_instructions, client, priority, provider_name,
+                                  getattr(provider, "api_key", None)) as grant:
+                result = await provider.generate(messages, system_instructions)
+                grant.record(result)
+                return result
+        
+        # Identical concurrent prompts share one call
+        key = json.dumps([provider_key("gemini", self.api_key), system_instructions, prompt])
+        try:
+            _, result = await single_flight.do(
+                key, lambda: provider_router.call(attempt, ["gemini"] + GEMINI_FALLBACK_PROVIDERS)
+            )
+        except ProviderRouterError as e:
+            logger.error(f"Error generating Gemini response: {e}")
+            return GenerationResult.failed("gemini", "gemini-flash-2.0", str(e), messages, system_instructions)
+        return result
+    
+    async def _generate(self, prompt: str, system_instructions: str) -> GenerationResult:
+        messages = [{"role": "user", "content": prompt}]
+        if self.local:
+            return await self.local.generate(messages, system_instructions)
+        
         # Create a prompt template
         template = """
         {system_instructions}
@@ -40,20 +119,108 @@ class GeminiService:
         
         # Create a chain
         chain = LLMChain(llm=self.model, prompt=prompt_template)
+        started = time.monotonic()
+        text = await chain.arun(prompt=prompt, system_instructions=system_instructions)
+        return GenerationResult.estimate("gemini", "gemini-flash-2.0", text, messages, system_instructions,
+                                         time.monotonic() - started)
+    
+    def _slot(self, prompt: str, system_instructions: str, client: str, priority: str = "interactive",
+              provider_name: str = None, api_key: str = None):
+        """Rate limiter slot for one call; Gemini's own limits apply unless another provider is named."""
+        if provider_name is None:
+            # The offline model has its own (LOCAL_*) limits
+            provider_name, api_key = ("local", None) if self.local else ("gemini", self.api_key)
+        tokens = estimate_tokens([{"content": prompt}], system_instructions, GEMINI_RESPONSE_TOKENS)
+        return rate_limiter.slot(provider_name, api_key, tokens=tokens, priority=priority, client=client,
+                                 prompt_tokens=tokens - GEMINI_RESPONSE_TOKENS)
+    
+    async def stream_response(self, prompt: str, system_instructions: str = None,
+                              client: str = "default") -> AsyncIterator[str]:
+        """
+        Stream a response from Gemini as text deltas using streamGenerateContent.
+        Falls back to a single routed response if Gemini's circuit is open or the stream fails
+        before producing text; stream outcomes count towards Gemini's health. The stream holds
+        a rate limiter slot for `client` until it completes.
+        """
+        health = provider_router.provider_health("gemini")
+        if not health.allow():
+            yield await self.generate_response(prompt, system_instructions, client)
+            return
         
-        # Generate response
-        response = await chain.arun(
-            prompt=prompt,
-            system_instructions=system_instructions or "You are a helpful AI assistant."
-        )
+        system_instructions = system_instructions or "You are a helpful AI assistant."
+        started = time.monotonic()
+        parts: List[str] = []
+        try:
+            async with self._slot(prompt, system_instructions, client) as grant:
+                try:
+                    async for delta in self._stream(prompt, system_instructions):
+                        parts.append(delta)
+                        yield delta
+                finally:
+                    grant.record("".join(parts))
+            health.record(True, time.monotonic() - started)
+        except Exception as e:
+            health.record(False, time.monotonic() - started)
+            if parts:
+                raise
+            logger.warning(f"Gemini streaming unavailable, falling back to a full response: {e}")
+            yield await self.generate_response(prompt, system_instructions, client)
+    
+    async def _stream(self, prompt: str, system_instructions: str) -> AsyncIterator[str]:
+        if self.local:
+            async for delta in self.local.stream_response([{"role": "user", "content": prompt}], system_instructions):
+                yield delta
+            return
         
-        return response
+        payload = {
+            "contents": [{"role": "user", "parts": [{"text": prompt}]}],
+            "systemInstruction": {
+                "parts": [{"text": system_instructions}]
+            }
+        }
+        async for delta in stream_gemini_content(
+            "https://generativelanguage.googleapis.com/v1beta/models/gemini-flash-2.0:streamGenerateContent",
+            payload,
+            params={"key": self.api_key}
+        ):
+            yield delta
     
-    async def apply_agent_persona(self, prompt: str, agent: Dict[str, Any]) -> str:
+    async def embed_texts(self, texts: List[str], model: str = "text-embedding-004") -> List[List[float]]:
+        """
+        Embed a batch of texts with a single batchEmbedContents call
+        """
+        response = await get_http_client("gemini").post(
+            f"https://generativelanguage.googleapis.com/v1beta/models/{model}:batchEmbedContents",
+            params={"key": self.api_key},
+            json={
+                "requests": [
+                    {"model": f"models/{model}", "content": {"parts": [{"text": text}]}}
+                    for text in texts
+                ]
+            }
+        )
+        response.raise_for_status()
+        return [embedding.get("values", []) for embedding in response.json().get("embeddings", [])]
+    
+    async def apply_agent_persona(self, prompt: str, agent: Dict[str, Any], client: str = "default") -> str:
         """
         Generate a response with an agent's persona
         """
-        system_instructions = f"""
+        response = await self.generate_response(prompt, self._persona_instructions(agent), client)
+        
+        # Format the response with the agent's name and role
+        return f"{agent['name']} ({agent['role']}): {response}"
+    
+    async def stream_agent_persona(self, prompt: str, agent: Dict[str, Any],
+                                   client: str = "default") -> AsyncIterator[str]:
+        """
+        Stream a response with an agent's persona as text deltas
+        """
+        async for delta in self.stream_response(prompt, self._persona_instructions(agent), client):
+            yield delta
+    
+    def _persona_instructions(self, agent: Dict[str, Any]) -> str:
+        return f"""
         You are an AI assistant with the following characteristics:
         Name: {agent['name']}
         Role: {agent['role']}
@@ -63,11 +230,18 @@ class GeminiService:
         
         Respond in character, maintaining the personality and role described above.
         """
-        
-        response = await self.generate_response(prompt, system_instructions)
-        
-        # Format the response with the agent's name and role
-        return f"{agent['name']} ({agent['role']}): {response}"
+
+_gemini_service: Optional[GeminiService] = None
+
+def get_gemini_service() -> GeminiService:
+    """
+    Shared GeminiService, created on first use. Use as a route dependency instead of
+    constructing a service (and its LangChain model) per request.
+    """
+    global _gemini_service
+    if _gemini_service is None:
+        _gemini_service = GeminiService()
+    return _gemini_service
 
 class LangChainService:
     """
@@ -76,7 +250,8 @@ class LangChainService:
     def __init__(self, gemini_service: GeminiService):
         self.gemini_service = gemini_service
     
-    async def run_manager_workflow(self, user_message: str, available_agents: List[Dict[str, Any]]) -> Dict[str, Any]:
+    async def run_manager_workflow(self, user_message: str, available_agents: List[Dict[str, Any]],
+                                   client: str = "default") -> Dict[str, Any]:
         """
         Run the manager agent workflow to delegate tasks
         """
@@ -107,7 +282,7 @@ class LangChainService:
         """
         
         # Generate response
-        response = await self.gemini_service.generate_response(user_message, system_instructions)
+        response = await self.gemini_service.generate_response(user_message, system_instructions, client)
         
         try:
             # Parse the response as JSON
@@ -120,13 +295,21 @@ class LangChainService:
                 "assigned_agents": []
             }
     
-    async def run_agent_workflow(self, agent: Dict[str, Any], task: str) -> str:
+    async def run_agent_workflow(self, agent: Dict[str, Any], task: str, client: str = "default") -> str:
         """
         Run an agent workflow for a specific task
         """
-        return await self.gemini_service.apply_agent_persona(task, agent)
+        return await self.gemini_service.apply_agent_persona(task, agent, client)
+    
+    async def stream_agent_workflow(self, agent: Dict[str, Any], task: str,
+                                    client: str = "default") -> AsyncIterator[str]:
+        """
+        Run an agent workflow for a specific task, yielding the response as it is generated
+        """
+        async for delta in self.gemini_service.stream_agent_persona(task, agent, client):
+            yield delta
     
-    async def resolve_conflicts(self, responses: List[Dict[str, Any]]) -> Dict[str, Any]:
+    async def resolve_conflicts(self, responses: List[Dict[str, Any]], client: str = "default") -> Dict[str, Any]:
         """
         Resolve conflicts between agent responses
         """
@@ -155,7 +338,9 @@ class LangChainService:
         """
         
         # Generate response
-        response = await self.gemini_service.generate_response("Resolve the conflicts between these agent responses.", system_instructions)
+        response = await self.gemini_service.generate_response(
+            "Resolve the conflicts between these agent responses.", system_instructions, client
+        )
         
         try:
             # Parse the response as JSON
@@ -0,0 +1,73 @@
+"""
+Shared async HTTP transport for the AI providers.
+
+Each provider gets one pooled httpx.AsyncClient that is reused for every request, so calls
+keep their TCP/TLS connections alive (over HTTP/2 when the h2 package is installed) and never
+block the event loop. Timeouts are set per provider and can be overridden with
+<PROVIDER>_HTTP_TIMEOUT, e.g. HUGGINGFACE_HTTP_TIMEOUT=180.
+"""
+
+import os
+import logging
+from typing import Dict
+
+import httpx
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_TIMEOUT = float(os.getenv("AI_HTTP_TIMEOUT", "60"))
+CONNECT_TIMEOUT = float(os.getenv("AI_HTTP_CONNECT_TIMEOUT", "5"))
+MAX_CONNECTIONS = int(os.getenv("AI_HTTP_MAX_CONNECTIONS", "100"))
+MAX_KEEPALIVE_CONNECTIONS = int(os.getenv("AI_HTTP_MAX_KEEPALIVE", "20"))
+KEEPALIVE_EXPIRY = float(os.getenv("AI_HTTP_KEEPALIVE_EXPIRY", "30"))
+
+# Read timeouts for providers whose responses are routinely slower than the default
+PROVIDER_TIMEOUTS = {
+    "huggingface": 120.0,  # cold models are loaded on first request
+    "perplexity": 90.0,    # online models search before answering
+}
+
+try:
+    import h2  # noqa: F401
+    HTTP2_AVAILABLE = True
+except ImportError:
+    HTTP2_AVAILABLE = False
+
+HTTP2_ENABLED = HTTP2_AVAILABLE and os.getenv("AI_HTTP2", "true").lower() == "true"
+
+_clients: Dict[str, httpx.AsyncClient] = {}
+
+
+def provider_timeout(provider: str) -> httpx.Timeout:
+    """Timeout for a provider: connect fails fast, reads wait for the model."""
+    override = os.getenv(f"{provider.upper()}_HTTP_TIMEOUT")
+    read = float(override) if override else PROVIDER_TIMEOUTS.get(provider, DEFAULT_TIMEOUT)
+    return httpx.Timeout(read, connect=CONNECT_TIMEOUT)
+
+
+def get_http_client(provider: str) -> httpx.AsyncClient:
+    """The shared client for a provider, created on first use."""
+    client = _clients.get(provider)
+    if client is None or client.is_closed:
+        client = httpx.AsyncClient(
+            http2=HTTP2_ENABLED,
+            timeout=provider_timeout(provider),
+            limits=httpx.Limits(
+                max_connections=MAX_CONNECTIONS,
+                max_keepalive_connections=MAX_KEEPALIVE_CONNECTIONS,
+                keepalive_expiry=KEEPALIVE_EXPIRY,
+            ),
+        )
+        _clients[provider] = client
+    return client
+
+
+async def close_http_clients() -> None:
+    """Close every provider client; call on application shutdown."""
+    clients = list(_clients.values())
+    _clients.clear()
+    for client in clients:
+        try:
+            await client.aclose()
+        except Exception as e:
+            logger.error(f"Error closing AI provider HTTP client: {e}")
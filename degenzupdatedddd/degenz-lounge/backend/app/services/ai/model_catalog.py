@@ -0,0 +1,88 @@
+"""
+Cached model catalogs for the AI providers.
+
+Model lists are served from memory. An entry is fresh for MODEL_CATALOG_TTL seconds; after
+that it is still served (stale-while-revalidate) for up to MODEL_CATALOG_STALE_TTL seconds
+while a single background task refreshes it. Concurrent misses for the same key share one fetch.
+"""
+
+import os
+import time
+import asyncio
+import logging
+from typing import Any, Awaitable, Callable, Dict, List, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+MODEL_CATALOG_TTL = float(os.getenv("MODEL_CATALOG_TTL", "3600"))
+MODEL_CATALOG_STALE_TTL = float(os.getenv("MODEL_CATALOG_STALE_TTL", "86400"))
+
+Fetch = Callable[[], Awaitable[List[Dict[str, Any]]]]
+
+
+class ModelCatalog:
+    """Per-key model lists with TTL, stale-while-revalidate and shared in-flight refreshes."""
+
+    def __init__(self, ttl: float = None, stale_ttl: float = None):
+        self.ttl = MODEL_CATALOG_TTL if ttl is None else ttl
+        self.stale_ttl = max(MODEL_CATALOG_STALE_TTL if stale_ttl is None else stale_ttl, self.ttl)
+        self._entries: Dict[str, Tuple[List[Dict[str, Any]], float]] = {}
+        self._refreshing: Dict[str, asyncio.Task] = {}
+
+    async def get(self, key: str, fetch: Fetch) -> List[Dict[str, Any]]:
+        """Model list for `key`, fetched with `fetch` when missing or too old."""
+        entry = self._entries.get(key)
+        if entry is not None:
+            models, fetched_at = entry
+            age = time.monotonic() - fetched_at
+            if age < self.ttl:
+                return models
+            if age < self.stale_ttl:
+                self._refresh(key, fetch)
+                return models
+        return await asyncio.shield(self._refresh(key, fetch))
+
+    async def get_many(self, fetches: Dict[str, Fetch]) -> Dict[str, List[Dict[str, Any]]]:
+        """Model lists for several keys, refreshing the missing ones concurrently."""
+        keys = list(fetches)
+        results = await asyncio.gather(*(self.get(key, fetches[key]) for key in keys), return_exceptions=True)
+        catalogs = {}
+        for key, result in zip(keys, results):
+            if isinstance(result, Exception):
+                logger.error(f"Error loading model catalog for {key}: {result}")
+                result = []
+            catalogs[key] = result
+        return catalogs
+
+    def invalidate(self, key: Optional[str] = None) -> None:
+        if key is None:
+            self._entries.clear()
+        else:
+            self._entries.pop(key, None)
+
+    def _refresh(self, key: str, fetch: Fetch) -> asyncio.Task:
+        """Start (or join) the refresh for `key`."""
+        task = self._refreshing.get(key)
+        if task is None:
+            task = asyncio.create_task(self._load(key, fetch))
+            self._refreshing[key] = task
+            task.add_done_callback(lambda _: self._refreshing.pop(key, None))
+        return task
+
+    async def _load(self, key: str, fetch: Fetch) -> List[Dict[str, Any]]:
+        try:
+            models = await fetch()
+        except Exception as e:
+            logger.error(f"Error refreshing model catalog for {key}: {e}")
+            entry = self._entries.get(key)
+            return entry[0] if entry else []
+        # Empty lists usually mean the provider call failed; keep serving the previous catalog
+        if models:
+            self._entries[key] = (models, time.monotonic())
+            return models
+        entry = self._entries.get(key)
+        return entry[0] if entry else models
+
+
+# Shared catalog used by the AI services
+model_catalog = ModelCatalog()
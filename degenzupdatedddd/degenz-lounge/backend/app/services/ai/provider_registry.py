@@ -0,0 +1,62 @@
+"""
+Registry of live AI provider instances.
+
+Request paths borrow providers from here instead of constructing one per request. Instances
+are keyed by provider name and a hash of the API key (the key itself is never stored in the
+registry key), kept in an LRU, and dropped after PROVIDER_REGISTRY_IDLE_TTL seconds without use.
+"""
+
+import os
+import hashlib
+import logging
+from typing import Callable, Optional
+
+from app.services.ai.providers import AIProvider, get_provider
+from app.utils.cache import LRUCache
+
+logger = logging.getLogger(__name__)
+
+PROVIDER_REGISTRY_SIZE = int(os.getenv("PROVIDER_REGISTRY_SIZE", "256"))
+PROVIDER_REGISTRY_IDLE_TTL = float(os.getenv("PROVIDER_REGISTRY_IDLE_TTL", "900"))
+
+
+def provider_key(provider_name: str, api_key: Optional[str] = None) -> str:
+    """Cache key for a provider and API key; the key itself is only represented by its hash."""
+    key_hash = hashlib.sha256(api_key.encode("utf-8")).hexdigest()[:32] if api_key else "env"
+    return f"{provider_name.lower()}:{key_hash}"
+
+
+class ProviderRegistry:
+    """Provider instances keyed by (provider, api key hash) with LRU and idle eviction."""
+
+    def __init__(self, factory: Callable[[str, Optional[str]], AIProvider] = get_provider,
+                 max_size: int = None, idle_ttl: float = None):
+        self.factory = factory
+        self.instances = LRUCache(
+            max_size=max_size or PROVIDER_REGISTRY_SIZE,
+            ttl=idle_ttl or PROVIDER_REGISTRY_IDLE_TTL
+        )
+
+    def get(self, provider_name: str, api_key: Optional[str] = None) -> AIProvider:
+        """Borrow the provider for this key, creating it on first use. Raises like get_provider."""
+        key = provider_key(provider_name, api_key)
+        provider = self.instances.get(key)
+        if provider is None:
+            provider = self.factory(provider_name, api_key)
+            logger.info(f"Created {provider_name} provider instance")
+        # Re-setting restarts the idle timer
+        self.instances.set(key, provider)
+        return provider
+
+    def evict(self, provider_name: str, api_key: Optional[str] = None) -> None:
+        self.instances.delete(provider_key(provider_name, api_key))
+
+    def clear(self) -> None:
+        self.instances.clear()
+
+    def __len__(self) -> int:
+        return len(self.instances)
+
+
+# Shared registry used by the AI services
+provider_registry = ProviderRegistry()
@@ -9,25 +9,39 @@ This module implements integration with various AI providers:
 - Perplexity
 - Hugging Face
 - Mistral
+- Local mock (offline, for development and load testing)
 """
 
 import os
+import re
 import json
-import requests
+import time
+import math
+import random
+import asyncio
+import hashlib
 import logging
-from typing import Dict, List, Any, Optional, Union
+from typing import AsyncIterator, Dict, List, Any, Optional, Union
 from abc import ABC, abstractmethod
 
+from app.services.ai.http_client import get_http_client
+from app.services.ai.streaming import stream_chat_completions, stream_gemini_content
+from app.services.ai.usage import GenerationResult
+from app.utils.tokens import count_tokens, token_spans
+
 logger = logging.getLogger(__name__)
 
+# Opt-in offline provider; see LocalMockProvider
+LOCAL_LLM_ENABLED = os.getenv("LOCAL_LLM_ENABLED", "false").lower() == "true"
+
 class AIProvider(ABC):
     """Base abstract class for all AI providers"""
     
     @abstractmethod
-    def generate_response(self, messages: List[Dict[str, str]], system_prompt: str = None, 
-                         temperature: float = 0.7, max_tokens: int = 1024) -> str:
+    async def generate(self, messages: List[Dict[str, str]], system_prompt: str = None,
+                       temperature: float = 0.7, max_tokens: int = 1024) -> GenerationResult:
         """
-        Generate a response from the AI provider
+        Generate a response from the AI provider together with its token usage
         
         Args:
             messages: List of message dictionaries with 'role' and 'content' keys
@@ -36,12 +50,32 @@ class AIProvider(ABC):
             max_tokens: Maximum number of tokens to generate
             
         Returns:
-            Generated text response
+            GenerationResult with the text, token counts, latency, model and finish reason
         """
         pass
     
+    async def generate_response(self, messages: List[Dict[str, str]], system_prompt: str = None, 
+                               temperature: float = 0.7, max_tokens: int = 1024, **kwargs) -> str:
+        """
+        Generate a response from the AI provider
+        
+        Returns:
+            Generated text response, or "Error: ..." if the call failed
+        """
+        result = await self.generate(messages, system_prompt, temperature, max_tokens, **kwargs)
+        return result.response
+    
+    async def stream_response(self, messages: List[Dict[str, str]], system_prompt: str = None,
+                              temperature: float = 0.7, max_tokens: int = 1024, **kwargs) -> AsyncIterator[str]:
+        """
+        Stream a response from the AI provider as text deltas
+        
+        Providers without a streaming API yield the complete response as a single delta.
+        """
+        yield await self.generate_response(messages, system_prompt, temperature, max_tokens, **kwargs)
+    
     @abstractmethod
-    def get_available_models(self) -> List[Dict[str, str]]:
+    async def get_available_models(self) -> List[Dict[str, str]]:
         """
         Get list of available models from this provider
         
@@ -59,13 +93,37 @@ class GeminiProvider(AIProvider):
             raise ValueError("Gemini API key is required")
         self.base_url = "https://generativelanguage.googleapis.com/v1beta"
         
-    def generate_response(self, messages: List[Dict[str, str]], system_prompt: str = None,
-                         temperature: float = 0.7, max_tokens: int = 1024) -> str:
+    async def generate(self, messages: List[Dict[str, str]], system_prompt: str = None,
+                       temperature: float = 0.7, max_tokens: int = 1024) -> GenerationResult:
         """Generate a response using Gemini Flash 2.0"""
         
         model = "models/gemini-flash-2.0"
         url = f"{self.base_url}/{model}:generateContent?key={self.api_key}"
+        payload = self._build_payload(messages, system_prompt, temperature, max_tokens)
         
+        started = time.monotonic()
+        try:
+            response = await get_http_client("gemini").post(url, json=payload)
+            response.raise_for_status()
+            return GenerationResult.from_gemini("gemini-flash-2.0", response.json(), messages, system_prompt,
+                                                time.monotonic() - started)
+        
+        except Exception as e:
+            logger.error(f"Error generating response from Gemini: {str(e)}")
+            return GenerationResult.failed("gemini", "gemini-flash-2.0", str(e), messages, system_prompt,
+                                           time.monotonic() - started)
+    
+    async def stream_response(self, messages: List[Dict[str, str]], system_prompt: str = None,
+                              temperature: float = 0.7, max_tokens: int = 1024) -> AsyncIterator[str]:
+        """Stream a response from Gemini Flash 2.0 with streamGenerateContent"""
+        url = f"{self.base_url}/models/gemini-flash-2.0:streamGenerateContent"
+        payload = self._build_payload(messages, system_prompt, temperature, max_tokens)
+        async for delta in stream_gemini_content(url, payload, params={"key": self.api_key}):
+            yield delta
+    
+    def _build_payload(self, messages: List[Dict[str, str]], system_prompt: str,
+                       temperature: float, max_tokens: int) -> Dict[str, Any]:
+        """Build a generateContent request body"""
         # Format messages for Gemini
         formatted_messages = []
         
@@ -93,25 +151,9 @@ class GeminiProvider(AIProvider):
                 "topK": 40
             }
         }
-        
-        try:
-            response = requests.post(url, json=payload)
-            response.raise_for_status()
-            result = response.json()
-            
-            # Extract the generated text
-            if "candidates" in result and len(result["candidates"]) > 0:
-                candidate = result["candidates"][0]
-                if "content" in candidate and "parts" in candidate["content"]:
-                    return candidate["content"]["parts"][0]["text"]
-            
-            return "No response generated"
-        
-        except Exception as e:
-            logger.error(f"Error generating response from Gemini: {str(e)}")
-            return f"Error: {str(e)}"
+        return payload
     
-    def get_available_models(self) -> List[Dict[str, str]]:
+    async def get_available_models(self) -> List[Dict[str, str]]:
         """Get available Gemini models"""
         return [
             {"id": "gemini-flash-2.0", "name": "Gemini Flash 2.0"},
@@ -128,9 +170,9 @@ class OpenRouterProvider(AIProvider):
             raise ValueError("OpenRouter API key is required")
         self.base_url = "https://openrouter.ai/api/v1"
         
-    def generate_response(self, messages: List[Dict[str, str]], system_prompt: str = None,
-                         temperature: float = 0.7, max_tokens: int = 1024, 
-                         model: str = "anthropic/claude-3-opus") -> str:
+    async def generate(self, messages: List[Dict[str, str]], system_prompt: str = None,
+                       temperature: float = 0.7, max_tokens: int = 1024,
+                       model: str = "anthropic/claude-3-opus") -> GenerationResult:
         """Generate a response using OpenRouter"""
         
         url = f"{self.base_url}/chat/completions"
@@ -160,21 +202,41 @@ class OpenRouterProvider(AIProvider):
             "max_tokens": max_tokens
         }
         
+        started = time.monotonic()
         try:
-            response = requests.post(url, headers=headers, json=payload)
+            response = await get_http_client("openrouter").post(url, headers=headers, json=payload)
             response.raise_for_status()
-            result = response.json()
-            
-            if "choices" in result and len(result["choices"]) > 0:
-                return result["choices"][0]["message"]["content"]
-            
-            return "No response generated"
+            return GenerationResult.from_chat_completion("openrouter", payload["model"], response.json(),
+                                                         messages, system_prompt, time.monotonic() - started)
         
         except Exception as e:
             logger.error(f"Error generating response from OpenRouter: {str(e)}")
-            return f"Error: {str(e)}"
+            return GenerationResult.failed("openrouter", payload["model"], str(e), messages, system_prompt,
+                                           time.monotonic() - started)
     
-    def get_available_models(self) -> List[Dict[str, str]]:
+    async def stream_response(self, messages: List[Dict[str, str]], system_prompt: str = None,
+                              temperature: float = 0.7, max_tokens: int = 1024,
+                              model: str = "anthropic/claude-3-opus") -> AsyncIterator[str]:
+        """Stream a response from OpenRouter as content deltas"""
+        formatted_messages = [{"role": "system", "content": system_prompt}] if system_prompt else []
+        formatted_messages.extend(messages)
+        
+        headers = {
+            "Authorization": f"Bearer {self.api_key}",
+            "Content-Type": "application/json"
+        }
+        
+        payload = {
+            "model": model,
+            "messages": formatted_messages,
+            "temperature": temperature,
+            "max_tokens": max_tokens
+        }
+        
+        async for delta in stream_chat_completions("openrouter", f"{self.base_url}/chat/completions", headers, payload):
+            yield delta
+    
+    async def get_available_models(self) -> List[Dict[str, str]]:
         """Get available models through OpenRouter"""
         url = f"{self.base_url}/models"
         
@@ -184,7 +246,7 @@ class OpenRouterProvider(AIProvider):
         }
         
         try:
-            response = requests.get(url, headers=headers)
+            response = await get_http_client("openrouter").get(url, headers=headers)
             response.raise_for_status()
             result = response.json()
             
@@ -217,8 +279,8 @@ class GrokProvider(AIProvider):
             raise ValueError("Grok API key is required")
         self.base_url = "https://api.grok.ai/v1"
         
-    def generate_response(self, messages: List[Dict[str, str]], system_prompt: str = None,
-                         temperature: float = 0.7, max_tokens: int = 1024) -> str:
+    async def generate(self, messages: List[Dict[str, str]], system_prompt: str = None,
+                       temperature: float = 0.7, max_tokens: int = 1024) -> GenerationResult:
         """Generate a response using Grok"""
         
         url = f"{self.base_url}/chat/completions"
@@ -248,21 +310,40 @@ class GrokProvider(AIProvider):
             "max_tokens": max_tokens
         }
         
+        started = time.monotonic()
         try:
-            response = requests.post(url, headers=headers, json=payload)
+            response = await get_http_client("grok").post(url, headers=headers, json=payload)
             response.raise_for_status()
-            result = response.json()
-            
-            if "choices" in result and len(result["choices"]) > 0:
-                return result["choices"][0]["message"]["content"]
-            
-            return "No response generated"
+            return GenerationResult.from_chat_completion("grok", payload["model"], response.json(),
+                                                         messages, system_prompt, time.monotonic() - started)
         
         except Exception as e:
             logger.error(f"Error generating response from Grok: {str(e)}")
-            return f"Error: {str(e)}"
+            return GenerationResult.failed("grok", payload["model"], str(e), messages, system_prompt,
+                                           time.monotonic() - started)
+    
+    async def stream_response(self, messages: List[Dict[str, str]], system_prompt: str = None,
+                              temperature: float = 0.7, max_tokens: int = 1024) -> AsyncIterator[str]:
+        """Stream a response from Grok as content deltas"""
+        formatted_messages = [{"role": "system", "content": system_prompt}] if system_prompt else []
+        formatted_messages.extend(messages)
+        
+        headers = {
+            "Authorization": f"Bearer {self.api_key}",
+            "Content-Type": "application/json"
+        }
+        
+        payload = {
+            "model": "grok-2",
+            "messages": formatted_messages,
+            "temperature": temperature,
+            "max_tokens": max_tokens
+        }
+        
+        async for delta in stream_chat_completions("grok", f"{self.base_url}/chat/completions", headers, payload):
+            yield delta
     
-    def get_available_models(self) -> List[Dict[str, str]]:
+    async def get_available_models(self) -> List[Dict[str, str]]:
         """Get available Grok models"""
         return [
             {"id": "grok-2", "name": "Grok-2"},
@@ -278,8 +359,8 @@ class DeepSeekProvider(AIProvider):
             raise ValueError("DeepSeek API key is required")
         self.base_url = "https://api.deepseek.com/v1"
         
-    def generate_response(self, messages: List[Dict[str, str]], system_prompt: str = None,
-                         temperature: float = 0.7, max_tokens: int = 1024) -> str:
+    async def generate(self, messages: List[Dict[str, str]], system_prompt: str = None,
+                       temperature: float = 0.7, max_tokens: int = 1024) -> GenerationResult:
         """Generate a response using DeepSeek"""
         
         url = f"{self.base_url}/chat/completions"
@@ -309,21 +390,40 @@ class DeepSeekProvider(AIProvider):
             "max_tokens": max_tokens
         }
         
+        started = time.monotonic()
         try:
-            response = requests.post(url, headers=headers, json=payload)
+            response = await get_http_client("deepseek").post(url, headers=headers, json=payload)
             response.raise_for_status()
-            result = response.json()
-            
-            if "choices" in result and len(result["choices"]) > 0:
-                return result["choices"][0]["message"]["content"]
-            
-            return "No response generated"
+            return GenerationResult.from_chat_completion("deepseek", payload["model"], response.json(),
+                                                         messages, system_prompt, time.monotonic() - started)
         
         except Exception as e:
             logger.error(f"Error generating response from DeepSeek: {str(e)}")
-            return f"Error: {str(e)}"
+            return GenerationResult.failed("deepseek", payload["model"], str(e), messages, system_prompt,
+                                           time.monotonic() - started)
+    
+    async def stream_response(self, messages: List[Dict[str, str]], system_prompt: str = None,
+                              temperature: float = 0.7, max_tokens: int = 1024) -> AsyncIterator[str]:
+        """Stream a response from DeepSeek as content deltas"""
+        formatted_messages = [{"role": "system", "content": system_prompt}] if system_prompt else []
+        formatted_messages.extend(messages)
+        
+        headers = {
+            "Authorization": f"Bearer {self.api_key}",
+            "Content-Type": "application/json"
+        }
+        
+        payload = {
+            "model": "deepseek-chat",
+            "messages": formatted_messages,
+            "temperature": temperature,
+            "max_tokens": max_tokens
+        }
+        
+        async for delta in stream_chat_completions("deepseek", f"{self.base_url}/chat/completions", headers, payload):
+            yield delta
     
-    def get_available_models(self) -> List[Dict[str, str]]:
+    async def get_available_models(self) -> List[Dict[str, str]]:
         """Get available DeepSeek models"""
         return [
             {"id": "deepseek-chat", "name": "DeepSeek Chat"},
@@ -339,8 +439,8 @@ class PerplexityProvider(AIProvider):
             raise ValueError("Perplexity API key is required")
         self.base_url = "https://api.perplexity.ai"
         
-    def generate_response(self, messages: List[Dict[str, str]], system_prompt: str = None,
-                         temperature: float = 0.7, max_tokens: int = 1024) -> str:
+    async def generate(self, messages: List[Dict[str, str]], system_prompt: str = None,
+                       temperature: float = 0.7, max_tokens: int = 1024) -> GenerationResult:
         """Generate a response using Perplexity"""
         
         url = f"{self.base_url}/chat/completions"
@@ -370,21 +470,40 @@ class PerplexityProvider(AIProvider):
             "max_tokens": max_tokens
         }
         
+        started = time.monotonic()
         try:
-            response = requests.post(url, headers=headers, json=payload)
+            response = await get_http_client("perplexity").post(url, headers=headers, json=payload)
             response.raise_for_status()
-            result = response.json()
-            
-            if "choices" in result and len(result["choices"]) > 0:
-                return result["choices"][0]["message"]["content"]
-            
-            return "No response generated"
+            return GenerationResult.from_chat_completion("perplexity", payload["model"], response.json(),
+                                                         messages, system_prompt, time.monotonic() - started)
         
         except Exception as e:
             logger.error(f"Error generating response from Perplexity: {str(e)}")
-            return f"Error: {str(e)}"
+            return GenerationResult.failed("perplexity", payload["model"], str(e), messages, system_prompt,
+                                           time.monotonic() - started)
     
-    def get_available_models(self) -> List[Dict[str, str]]:
+    async def stream_response(self, messages: List[Dict[str, str]], system_prompt: str = None,
+                              temperature: float = 0.7, max_tokens: int = 1024) -> AsyncIterator[str]:
+        """Stream a response from Perplexity as content deltas"""
+        formatted_messages = [{"role": "system", "content": system_prompt}] if system_prompt else []
+        formatted_messages.extend(messages)
+        
+        headers = {
+            "Authorization": f"Bearer {self.api_key}",
+            "Content-Type": "application/json"
+        }
+        
+        payload = {
+            "model": "sonar-medium-online",
+            "messages": formatted_messages,
+            "temperature": temperature,
+            "max_tokens": max_tokens
+        }
+        
+        async for delta in stream_chat_completions("perplexity", f"{self.base_url}/chat/completions", headers, payload):
+            yield delta
+    
+    async def get_available_models(self) -> List[Dict[str, str]]:
         """Get available Perplexity models"""
         return [
             {"id": "sonar-medium-online", "name": "Sonar Medium (Online)"},
@@ -402,9 +521,9 @@ class HuggingFaceProvider(AIProvider):
             raise ValueError("Hugging Face API key is required")
         self.base_url = "https://api-inference.huggingface.co/models"
         
-    def generate_response(self, messages: List[Dict[str, str]], system_prompt: str = None,
-                         temperature: float = 0.7, max_tokens: int = 1024, 
-                         model: str = "mistralai/Mixtral-8x7B-Instruct-v0.1") -> str:
+    async def generate(self, messages: List[Dict[str, str]], system_prompt: str = None,
+                       temperature: float = 0.7, max_tokens: int = 1024,
+                       model: str = "mistralai/Mixtral-8x7B-Instruct-v0.1") -> GenerationResult:
         """Generate a response using Hugging Face Inference API"""
         
         url = f"{self.base_url}/{model}"
@@ -438,21 +557,26 @@ class HuggingFaceProvider(AIProvider):
             }
         }
         
+        started = time.monotonic()
         try:
-            response = requests.post(url, headers=headers, json=payload)
+            response = await get_http_client("huggingface").post(url, headers=headers, json=payload)
             response.raise_for_status()
             result = response.json()
             
+            text = "No response generated"
             if isinstance(result, list) and len(result) > 0:
-                return result[0].get("generated_text", "No response generated")
+                text = result[0].get("generated_text", "No response generated")
             
-            return "No response generated"
+            # The Inference API does not report usage; count the rendered prompt locally
+            return GenerationResult.estimate("huggingface", model, text, [{"content": prompt}],
+                                             latency=time.monotonic() - started, raw=result)
         
         except Exception as e:
             logger.error(f"Error generating response from Hugging Face: {str(e)}")
-            return f"Error: {str(e)}"
+            return GenerationResult.failed("huggingface", model, str(e), [{"content": prompt}],
+                                           latency=time.monotonic() - started)
     
-    def get_available_models(self) -> List[Dict[str, str]]:
+    async def get_available_models(self) -> List[Dict[str, str]]:
         """Get popular Hugging Face models"""
         return [
             {"id": "mistralai/Mixtral-8x7B-Instruct-v0.1", "name": "Mixtral 8x7B"},
@@ -471,8 +595,8 @@ class MistralProvider(AIProvider):
             raise ValueError("Mistral API key is required")
         self.base_url = "https://api.mistral.ai/v1"
         
-    def generate_response(self, messages: List[Dict[str, str]], system_prompt: str = None,
-                         temperature: float = 0.7, max_tokens: int = 1024) -> str:
+    async def generate(self, messages: List[Dict[str, str]], system_prompt: str = None,
+                       temperature: float = 0.7, max_tokens: int = 1024) -> GenerationResult:
         """Generate a response using Mistral AI"""
         
         url = f"{self.base_url}/chat/completions"
@@ -502,21 +626,40 @@ class MistralProvider(AIProvider):
             "max_tokens": max_tokens
         }
         
+        started = time.monotonic()
         try:
-            response = requests.post(url, headers=headers, json=payload)
+            response = await get_http_client("mistral").post(url, headers=headers, json=payload)
             response.raise_for_status()
-            result = response.json()
-            
-            if "choices" in result and len(result["choices"]) > 0:
-                return result["choices"][0]["message"]["content"]
-            
-            return "No response generated"
+            return GenerationResult.from_chat_completion("mistral", payload["model"], response.json(),
+                                                         messages, system_prompt, time.monotonic() - started)
         
         except Exception as e:
             logger.error(f"Error generating response from Mistral: {str(e)}")
-            return f"Error: {str(e)}"
+            return GenerationResult.failed("mistral", payload["model"], str(e), messages, system_prompt,
+                                           time.monotonic() - started)
     
-    def get_available_models(self) -> List[Dict[str, str]]:
+    async def stream_response(self, messages: List[Dict[str, str]], system_prompt: str = None,
+                              temperature: float = 0.7, max_tokens: int = 1024) -> AsyncIterator[str]:
+        """Stream a response from Mistral AI as content deltas"""
+        formatted_messages = [{"role": "system", "content": system_prompt}] if system_prompt else []
+        formatted_messages.extend(messages)
+        
+        headers = {
+            "Authorization": f"Bearer {self.api_key}",
+            "Content-Type": "application/json"
+        }
+        
+        payload = {
+            "model": "mistral-large-latest",
+            "messages": formatted_messages,
+            "temperature": temperature,
+            "max_tokens": max_tokens
+        }
+        
+        async for delta in stream_chat_completions("mistral", f"{self.base_url}/chat/completions", headers, payload):
+            yield delta
+    
+    async def get_available_models(self) -> List[Dict[str, str]]:
         """Get available Mistral models"""
         return [
             {"id": "mistral-large-latest", "name": "Mistral Large"},
@@ -525,6 +668,130 @@ class MistralProvider(AIProvider):
             {"id": "open-mistral-7b", "name": "Open Mistral 7B"}
         ]
 
+class LocalMockProvider(AIProvider):
+    """
+    Deterministic offline provider for development and load testing
+    
+    The text is derived from a hash of the request, so equal requests get equal responses, and
+    token counts come from the local tokenizer. Latency is drawn from a configurable distribution
+    (fixed, uniform, normal or lognormal around LOCAL_LLM_LATENCY_MS), streams are paced at
+    LOCAL_LLM_TOKENS_PER_SECOND, and a share of calls can be failed on purpose to exercise
+    failover, circuit breakers and rate limit backoff. Prompts asking for the manager or
+    conflict resolution JSON formats get a valid JSON reply so the orchestration paths run.
+    """
+    
+    WORDS = (
+        "agent", "task", "plan", "result", "context", "review", "draft", "summary", "step", "data",
+        "answer", "check", "update", "team", "goal", "detail", "option", "risk", "next", "report",
+        "the", "a", "and", "of", "to", "with", "for", "this", "that", "we", "can", "will", "should"
+    )
+    
+    def __init__(self, api_key: str = None, latency_ms: float = None, latency_spread_ms: float = None,
+                 latency_distribution: str = None, tokens_per_second: float = None,
+                 response_tokens: int = None, failure_rate: float = None, rate_limit_rate: float = None,
+                 seed: int = None):
+        self.api_key = api_key or "local"
+        self.latency_ms = float(os.getenv("LOCAL_LLM_LATENCY_MS", "200")) if latency_ms is None else latency_ms
+        self.latency_spread_ms = (float(os.getenv("LOCAL_LLM_LATENCY_SPREAD_MS", "50"))
+                                  if latency_spread_ms is None else latency_spread_ms)
+        self.latency_distribution = latency_distribution or os.getenv("LOCAL_LLM_LATENCY_DISTRIBUTION", "lognormal")
+        self.tokens_per_second = (float(os.getenv("LOCAL_LLM_TOKENS_PER_SECOND", "50"))
+                                  if tokens_per_second is None else tokens_per_second)
+        self.response_tokens = (int(os.getenv("LOCAL_LLM_RESPONSE_TOKENS", "64"))
+                                if response_tokens is None else response_tokens)
+        self.failure_rate = float(os.getenv("LOCAL_LLM_FAILURE_RATE", "0")) if failure_rate is None else failure_rate
+        self.rate_limit_rate = (float(os.getenv("LOCAL_LLM_RATE_LIMIT_RATE", "0"))
+                                if rate_limit_rate is None else rate_limit_rate)
+        seed = seed if seed is not None else os.getenv("LOCAL_LLM_SEED")
+        self.random = random.Random(int(seed) if seed is not None else None)
+    
+    def sample_latency(self) -> float:
+        """Seconds until the first token, drawn from the configured distribution"""
+        median = self.latency_ms
+        spread = self.latency_spread_ms
+        if self.latency_distribution == "uniform":
+            value = self.random.uniform(median - spread, median + spread)
+        elif self.latency_distribution == "normal":
+            value = self.random.gauss(median, spread)
+        elif self.latency_distribution == "lognormal" and median > 0:
+            # Long right tail; the spread sets sigma relative to the median
+            value = median * math.exp(self.random.gauss(0, spread / median))
+        else:
+            value = median
+        return max(0.0, value) / 1000
+    
+    def _injected_error(self) -> Optional[str]:
+        roll = self.random.random()
+        if roll < self.rate_limit_rate:
+            return "429 Too Many Requests (injected by local provider)"
+        if roll < self.rate_limit_rate + self.failure_rate:
+            return "503 Service Unavailable (injected by local provider)"
+        return None
+    
+    def _reply(self, messages: List[Dict[str, str]], system_prompt: Optional[str], max_tokens: int) -> str:
+        system_prompt = system_prompt or ""
+        prompt = messages[-1].get("content", "") if messages else ""
+        if '"assigned_agents"' in system_prompt:
+            # Manager workflow: delegate the message to every listed agent
+            agent_ids = re.findall(r"ID: ([^,\s]+),", system_prompt)
+            return json.dumps({
+                "thought": "Delegating to all available agents",
+                "assigned_agents": [{"agent_id": agent_id, "task": prompt} for agent_id in agent_ids]
+            })
+        
+        digest = hashlib.sha256(json.dumps([system_prompt, messages], sort_keys=True).encode("utf-8")).hexdigest()
+        rng = random.Random(digest)
+        length = max(1, min(max_tokens, rng.randint(self.response_tokens // 2 + 1, self.response_tokens + 1)))
+        text = " ".join(rng.choice(self.WORDS) for _ in range(length)).capitalize() + "."
+        if '"result"' in system_prompt:
+            # Conflict resolution format
+            return json.dumps({"thought": "Combined the agent responses", "result": text})
+        return text
+    
+    async def generate(self, messages: List[Dict[str, str]], system_prompt: str = None,
+                       temperature: float = 0.7, max_tokens: int = 1024,
+                       model: str = "local-mock") -> GenerationResult:
+        """Generate a deterministic response after a simulated latency"""
+        started = time.monotonic()
+        await asyncio.sleep(self.sample_latency())
+        
+        error = self._injected_error()
+        if error:
+            return GenerationResult.failed("local", model, error, messages, system_prompt, time.monotonic() - started)
+        
+        text = self._reply(messages, system_prompt, max_tokens)
+        return GenerationResult(
+            text=text,
+            provider="local",
+            model=model,
+            prompt_tokens=sum(count_tokens(m.get("content", "")) for m in messages) + count_tokens(system_prompt or ""),
+            completion_tokens=count_tokens(text),
+            latency=time.monotonic() - started,
+            finish_reason="stop"
+        )
+    
+    async def stream_response(self, messages: List[Dict[str, str]], system_prompt: str = None,
+                              temperature: float = 0.7, max_tokens: int = 1024,
+                              model: str = "local-mock") -> AsyncIterator[str]:
+        """Stream the deterministic response token by token at the configured rate"""
+        await asyncio.sleep(self.sample_latency())
+        error = self._injected_error()
+        if error:
+            raise RuntimeError(error)
+        
+        text = self._reply(messages, system_prompt, max_tokens)
+        delay = 1 / self.tokens_per_second if self.tokens_per_second > 0 else 0
+        starts = [start for start, _ in token_spans(text)] + [len(text)]
+        # Each delta runs up to the next token so whitespace is preserved
+        for start, end in zip([0] + starts[1:-1], starts[1:]):
+            if delay:
+                await asyncio.sleep(delay)
+            yield text[start:end]
+    
+    async def get_available_models(self) -> List[Dict[str, str]]:
+        """Get the local mock model"""
+        return [{"id": "local-mock", "name": "Local Mock"}]
+
 def get_provider(provider_name: str, api_key: str = None) -> AIProvider:
     """
     Factory function to get the appropriate AI provider
@@ -543,7 +810,8 @@ def get_provider(provider_name: str, api_key: str = None) -> AIProvider:
         "deepseek": DeepSeekProvider,
         "perplexity": PerplexityProvider,
         "huggingface": HuggingFaceProvider,
-        "mistral": MistralProvider
+        "mistral": MistralProvider,
+        "local": LocalMockProvider
     }
     
     if provider_name.lower() not in providers:
@@ -558,7 +826,7 @@ def get_all_providers() -> Dict[str, Dict[str, Any]]:
     Returns:
         Dictionary mapping provider names to their information
     """
-    return {
+    providers = {
         "gemini": {
             "name": "Gemini Flash 2.0",
             "description": "Google's advanced AI model with strong reasoning capabilities",
@@ -609,3 +877,14 @@ def get_all_providers() -> Dict[str, Dict[str, Any]]:
             "default": False
         }
     }
+    
+    if LOCAL_LLM_ENABLED:
+        providers["local"] = {
+            "name": "Local Mock",
+            "description": "Deterministic offline model for development and load testing",
+            "requires_api_key": False,
+            "env_var": "LOCAL_LLM_ENABLED",
+            "default": False
+        }
+    
+    return providers
@@ -0,0 +1,242 @@
+"""
+Client-side rate limiting for AI provider calls.
+
+Every provider/API key pair gets a scheduler with a requests-per-minute bucket, a
+tokens-per-minute bucket and a concurrency cap. Calls wait in a queue ordered by priority class
+(interactive chat before background jobs) and, within a class, by start-time fair queueing so
+one busy session cannot starve the others. Token budgets are reserved up front from an estimate
+(prompt + max_tokens) and corrected once the response is known.
+
+Limits come from <PROVIDER>_RPM, <PROVIDER>_TPM and <PROVIDER>_MAX_CONCURRENCY, falling back to
+the AI_DEFAULT_* values; 0 disables a limit.
+"""
+
+import os
+import time
+import heapq
+import asyncio
+import itertools
+import logging
+from contextlib import asynccontextmanager
+from typing import Any, AsyncIterator, Dict, List, Optional
+
+from app.services.ai.provider_registry import provider_key
+from app.services.ai.usage import GenerationResult, response_error
+from app.utils.tokens import count_tokens
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_RPM = int(os.getenv("AI_DEFAULT_RPM", "60"))
+DEFAULT_TPM = int(os.getenv("AI_DEFAULT_TPM", "100000"))
+DEFAULT_MAX_CONCURRENCY = int(os.getenv("AI_DEFAULT_MAX_CONCURRENCY", "8"))
+MAX_QUEUE_WAIT = float(os.getenv("AI_RATE_LIMIT_MAX_WAIT", "60"))
+# Pause after a provider answers 429 Too Many Requests
+RATE_LIMITED_BACKOFF = float(os.getenv("AI_RATE_LIMIT_BACKOFF", "10"))
+
+PRIORITIES = {
+    "interactive": 0,
+    "default": 1,
+    "background": 2,
+}
+
+
+class RateLimitExceeded(Exception):
+    """Raised when a call could not be scheduled within the maximum queue wait."""
+
+
+def estimate_tokens(messages: List[Dict[str, str]], system_prompt: Optional[str], max_tokens: int) -> int:
+    """Upper-bound token cost of a chat call: the prompt plus the completion budget."""
+    prompt = sum(count_tokens(m.get("content", "")) for m in messages) + count_tokens(system_prompt or "")
+    return prompt + max_tokens
+
+
+def _limit(provider: str, name: str, default: int) -> int:
+    value = os.getenv(f"{provider.upper()}_{name}")
+    return int(value) if value else default
+
+
+class TokenBucket:
+    """Refills continuously at `per_minute`; may go negative so oversized requests still pass, later."""
+
+    def __init__(self, per_minute: float):
+        self.rate = per_minute / 60.0
+        self.capacity = float(per_minute)
+        self.level = self.capacity
+        self.updated = time.monotonic()
+
+    def _refill(self) -> None:
+        now = time.monotonic()
+        self.level = min(self.capacity, self.level + (now - self.updated) * self.rate)
+        self.updated = now
+
+    def time_until(self, amount: float) -> float:
+        """Seconds until `amount` (capped at the capacity) can be taken."""
+        self._refill()
+        deficit = min(amount, self.capacity) - self.level
+        return deficit / self.rate if deficit > 0 else 0.0
+
+    def consume(self, amount: float) -> None:
+        self._refill()
+        self.level -= amount
+
+    def refund(self, amount: float) -> None:
+        self._refill()
+        self.level = min(self.capacity, self.level + amount)
+
+
+class ProviderLimiter:
+    """Scheduler for one provider/API key: RPM and TPM buckets, a concurrency cap and a fair queue."""
+
+    def __init__(self, name: str, rpm: int, tpm: int, max_concurrency: int):
+        self.name = name
+        self.requests = TokenBucket(rpm) if rpm else None
+        self.tokens = TokenBucket(tpm) if tpm else None
+        self.max_concurrency = max_concurrency
+        self.active = 0
+        self.paused_until = 0.0
+        self.granted = 0
+        self.queued = 0
+        self.rejected = 0
+        self._waiters: List[list] = []
+        self._sequence = itertools.count()
+        self._virtual_time = 0.0
+        self._client_finish: Dict[str, float] = {}
+        self._timer: Optional[asyncio.TimerHandle] = None
+
+    async def acquire(self, tokens: int, priority: int, client: str, timeout: float) -> None:
+        future = asyncio.get_running_loop().create_future()
+        # Start-time fair queueing: a client's requests start after its previous ones finish
+        start = max(self._virtual_time, self._client_finish.get(client, 0.0))
+        self._client_finish[client] = start + max(tokens, 1)
+        heapq.heappush(self._waiters, [priority, start, next(self._sequence), tokens, future])
+        self._dispatch()
+        if not future.done():
+            self.queued += 1
+        try:
+            await asyncio.wait_for(future, timeout)
+        except asyncio.TimeoutError:
+            self.rejected += 1
+            raise RateLimitExceeded(f"{self.name} rate limit: no capacity within {timeout:.0f}s")
+        except asyncio.CancelledError:
+            # Cancelled just after being granted: hand the slot back
+            if future.done() and not future.cancelled():
+                self.release(tokens)
+            raise
+
+    def release(self, reserved: int, used: Optional[int] = None) -> None:
+        self.active -= 1
+        if self.tokens is not None and used is not None:
+            self.tokens.refund(reserved - used)
+        self._dispatch()
+
+    def backoff(self, seconds: float) -> None:
+        """Stop granting calls for `seconds`, e.g. after the provider answered 429."""
+        self.paused_until = max(self.paused_until, time.monotonic() + seconds)
+        logger.warning(f"{self.name} rate limited by the provider, pausing for {seconds:.0f}s")
+
+    def _dispatch(self) -> None:
+        if self._timer is not None:
+            self._timer.cancel()
+            self._timer = None
+        while self._waiters:
+            priority, start, _, tokens, future = self._waiters[0]
+            if future.done():
+                # Timed out or cancelled while queued
+                heapq.heappop(self._waiters)
+                continue
+            if self.max_concurrency and self.active >= self.max_concurrency:
+                return  # release() dispatches again
+            wait = max(
+                self.paused_until - time.monotonic(),
+                self.requests.time_until(1) if self.requests else 0.0,
+                self.tokens.time_until(tokens) if self.tokens else 0.0,
+            )
+            if wait > 0:
+                self._timer = asyncio.get_running_loop().call_later(wait, self._dispatch)
+                return
+            heapq.heappop(self._waiters)
+            if self.requests:
+                self.requests.consume(1)
+            if self.tokens:
+                self.tokens.consume(tokens)
+            self.active += 1
+            self.granted += 1
+            self._virtual_time = max(self._virtual_time, start)
+            future.set_result(None)
+        # Forget clients whose queued work has all been served
+        self._client_finish = {c: f for c, f in self._client_finish.items() if f > self._virtual_time}
+
+    def snapshot(self) -> Dict[str, Any]:
+        return {
+            "active": self.active,
+            "waiting": sum(1 for waiter in self._waiters if not waiter[4].done()),
+            "granted": self.granted,
+            "queued": self.queued,
+            "rejected": self.rejected,
+            "paused": self.paused_until > time.monotonic(),
+        }
+
+
+class Grant:
+    """A scheduled call; report the response so the token reservation and 429s are accounted for."""
+
+    def __init__(self, limiter: ProviderLimiter, reserved: int, prompt_tokens: int = 0):
+        self.limiter = limiter
+        self.reserved = reserved
+        self.prompt_tokens = prompt_tokens
+        self.used_tokens: Optional[int] = None
+
+    def record(self, response: Any) -> None:
+        error = response_error(response)
+
+        if error is not None:
+            if "429" in error or "Too Many Requests" in error:
+                self.limiter.backoff(RATE_LIMITED_BACKOFF)
+            # Failed calls are not billed for completion tokens
+            self.used_tokens = self.prompt_tokens
+        elif isinstance(response, GenerationResult):
+            self.used_tokens = response.total_tokens
+        elif isinstance(response, str):
+            self.used_tokens = self.prompt_tokens + count_tokens(response)
+        elif isinstance(response, dict) and isinstance(response.get("usage"), dict):
+            # OpenAI-compatible responses report their own usage
+            self.used_tokens = response["usage"].get("total_tokens")
+
+
+class RateLimiter:
+    """Per provider/API key schedulers."""
+
+    def __init__(self):
+        self.limiters: Dict[str, ProviderLimiter] = {}
+
+    def limiter(self, provider: str, api_key: Optional[str] = None) -> ProviderLimiter:
+        key = provider_key(provider, api_key)
+        if key not in self.limiters:
+            self.limiters[key] = ProviderLimiter(
+                key,
+                rpm=_limit(provider, "RPM", DEFAULT_RPM),
+                tpm=_limit(provider, "TPM", DEFAULT_TPM),
+                max_concurrency=_limit(provider, "MAX_CONCURRENCY", DEFAULT_MAX_CONCURRENCY)
+            )
+        return self.limiters[key]
+
+    @asynccontextmanager
+    async def slot(self, provider: str, api_key: Optional[str] = None, tokens: int = 0,
+                   priority: str = "interactive", client: str = "default",
+                   prompt_tokens: int = 0, timeout: float = None) -> AsyncIterator[Grant]:
+        """Wait for capacity, run the call inside the block, then release the slot."""
+        limiter = self.limiter(provider, api_key)
+        await limiter.acquire(tokens, PRIORITIES.get(priority, PRIORITIES["default"]), client,
+                              MAX_QUEUE_WAIT if timeout is None else timeout)
+        grant = Grant(limiter, tokens, prompt_tokens)
+        try:
+            yield grant
+        finally:
+            limiter.release(tokens, grant.used_tokens)
+
+    def stats(self) -> Dict[str, Any]:
+        return {key: limiter.snapshot() for key, limiter in self.limiters.items()}
+
+
+# Shared limiter used by the AI services
+rate_limiter = RateLimiter()
@@ -0,0 +1,223 @@
+"""
+Health-aware routing across AI providers.
+
+The router tracks per-provider health over a rolling window of calls (error rate, p95 latency)
+and trips a circuit breaker for providers that keep failing, so calls fail over immediately
+instead of waiting for a timeout. Providers are tried in priority order; optionally a hedged
+request is sent to the next provider when the current one has not answered within a latency
+threshold, and the first successful response wins.
+"""
+
+import os
+import time
+import asyncio
+import logging
+from collections import deque
+from typing import Any, Awaitable, Callable, Dict, List, Optional, Tuple
+
+from app.services.ai.rate_limiter import RateLimitExceeded
+from app.services.ai.usage import response_error
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_PRIORITY = "gemini,openrouter,mistral,deepseek,grok,perplexity,huggingface"
+AI_PROVIDER_PRIORITY = [p.strip() for p in os.getenv("AI_PROVIDER_PRIORITY", DEFAULT_PRIORITY).split(",") if p.strip()]
+# 0 disables hedging
+AI_HEDGE_AFTER_MS = float(os.getenv("AI_HEDGE_AFTER_MS", "0"))
+HEALTH_WINDOW = int(os.getenv("AI_HEALTH_WINDOW", "50"))
+CIRCUIT_MIN_CALLS = int(os.getenv("AI_CIRCUIT_MIN_CALLS", "10"))
+CIRCUIT_ERROR_RATE = float(os.getenv("AI_CIRCUIT_ERROR_RATE", "0.5"))
+CIRCUIT_CONSECUTIVE_FAILURES = int(os.getenv("AI_CIRCUIT_CONSECUTIVE_FAILURES", "5"))
+CIRCUIT_COOLDOWN = float(os.getenv("AI_CIRCUIT_COOLDOWN", "30"))
+
+
+class ProviderRouterError(Exception):
+    """Raised when no provider produced a successful response."""
+
+
+def is_error_response(response: Any) -> bool:
+    """Whether a provider response reports a failure (see response_error)."""
+    return response_error(response) is not None
+
+
+class ProviderHealth:
+    """
+    Rolling health of one provider with a circuit breaker.
+
+    closed: calls pass. open: calls are rejected until the cooldown ends. half_open: one trial
+    call is let through; its outcome closes or re-opens the circuit.
+    """
+
+    def __init__(self, name: str, window: int = None):
+        self.name = name
+        self.calls: deque = deque(maxlen=window or HEALTH_WINDOW)
+        self.consecutive_failures = 0
+        self.state = "closed"
+        self.opened_at = 0.0
+        self.trial_started: Optional[float] = None
+
+    def allow(self) -> bool:
+        now = time.monotonic()
+        if self.state == "open" and now - self.opened_at >= CIRCUIT_COOLDOWN:
+            self.state = "half_open"
+            self.trial_started = None
+        if self.state == "closed":
+            return True
+        if self.state == "half_open":
+            # A trial that never reported back (e.g. a cancelled hedge) expires after the cooldown
+            if self.trial_started is None or now - self.trial_started >= CIRCUIT_COOLDOWN:
+                self.trial_started = now
+                return True
+        return False
+
+    def record(self, success: bool, latency: float) -> None:
+        self.calls.append((success, latency))
+        if success:
+            self.consecutive_failures = 0
+            if self.state != "closed":
+                logger.info(f"Circuit for {self.name} closed")
+            self.state = "closed"
+            self.trial_started = None
+            return
+
+        self.consecutive_failures += 1
+        if self.state == "half_open" or self._should_trip():
+            if self.state != "open":
+                logger.warning(f"Circuit for {self.name} opened (error rate {self.error_rate:.0%}, "
+                               f"{self.consecutive_failures} consecutive failures)")
+            self.state = "open"
+            self.opened_at = time.monotonic()
+            self.trial_started = None
+
+    def _should_trip(self) -> bool:
+        if self.consecutive_failures >= CIRCUIT_CONSECUTIVE_FAILURES:
+            return True
+        return len(self.calls) >= CIRCUIT_MIN_CALLS and self.error_rate >= CIRCUIT_ERROR_RATE
+
+    @property
+    def error_rate(self) -> float:
+        if not self.calls:
+            return 0.0
+        return sum(1 for success, _ in self.calls if not success) / len(self.calls)
+
+    @property
+    def p95_latency(self) -> Optional[float]:
+        latencies = sorted(latency for success, latency in self.calls if success)
+        if not latencies:
+            return None
+        return latencies[min(len(latencies) - 1, int(0.95 * len(latencies)))]
+
+    def snapshot(self) -> Dict[str, Any]:
+        p95 = self.p95_latency
+        return {
+            "state": self.state,
+            "calls": len(self.calls),
+            "error_rate": self.error_rate,
+            "p95_latency_ms": round(p95 * 1000, 1) if p95 is not None else None,
+            "consecutive_failures": self.consecutive_failures
+        }
+
+
+class ProviderRouter:
+    """Routes a call across providers in priority order with circuit breaking, hedging and failover."""
+
+    def __init__(self, priority: List[str] = None, hedge_after_ms: float = None):
+        self.priority = priority or AI_PROVIDER_PRIORITY
+        self.hedge_after_ms = AI_HEDGE_AFTER_MS if hedge_after_ms is None else hedge_after_ms
+        self.health: Dict[str, ProviderHealth] = {}
+        self.hedges = 0
+        self.failovers = 0
+
+    def provider_health(self, provider: str) -> ProviderHealth:
+        if provider not in self.health:
+            self.health[provider] = ProviderHealth(provider)
+        return self.health[provider]
+
+    def order(self, available: List[str]) -> List[str]:
+        """Sort provider names by the configured priority; unknown providers go last."""
+        rank = {name: i for i, name in enumerate(self.priority)}
+        return sorted(available, key=lambda name: rank.get(name, len(rank)))
+
+    async def call(self, fn: Callable[[str], Awaitable[Any]], providers: List[str],
+                   hedge_after_ms: float = None) -> Tuple[str, Any]:
+        """
+        Run `fn(provider)` against `providers` (in the given order) until one succeeds.
+        Returns (provider, response); raises ProviderRouterError when all fail or are tripped.
+        """
+        hedge_after_ms = self.hedge_after_ms if hedge_after_ms is None else hedge_after_ms
+        queue = deque(providers)
+        pending: Dict[asyncio.Task, str] = {}
+        errors = []
+        try:
+            while queue or pending:
+                if not pending:
+                    if not self._launch(queue, fn, pending, errors):
+                        continue
+
+                # Hedge only while a single request is in flight and a backup remains
+                timeout = hedge_after_ms / 1000 if hedge_after_ms and queue and len(pending) == 1 else None
+                done, _ = await asyncio.wait(pending, timeout=timeout, return_when=asyncio.FIRST_COMPLETED)
+                if not done:
+                    if self._launch(queue, fn, pending, errors):
+                        self.hedges += 1
+                    continue
+
+                for task in done:
+                    provider = pending.pop(task)
+                    success, response, error = task.result()
+                    if success:
+                        return provider, response
+                    errors.append(f"{provider}: {error}")
+                    if queue or pending:
+                        self.failovers += 1
+                        logger.warning(f"Provider {provider} failed, failing over: {error}")
+        finally:
+            for task in pending:
+                task.cancel()
+
+        raise ProviderRouterError("; ".join(errors) or "No provider available")
+
+    def _launch(self, queue: deque, fn: Callable[[str], Awaitable[Any]],
+                pending: Dict[asyncio.Task, str], errors: List[str]) -> bool:
+        """Start the next provider whose circuit allows a call; False if none is left."""
+        while queue:
+            provider = queue.popleft()
+            if self.provider_health(provider).allow():
+                pending[asyncio.create_task(self._attempt(provider, fn))] = provider
+                return True
+            errors.append(f"{provider}: circuit open")
+        return False
+
+    async def _attempt(self, provider: str, fn: Callable[[str], Awaitable[Any]]) -> Tuple[bool, Any, Optional[str]]:
+        health = self.provider_health(provider)
+        started = time.monotonic()
+        try:
+            response = await fn(provider)
+        except asyncio.CancelledError:
+            raise
+        except RateLimitExceeded as e:
+            # Our own queue was full; says nothing about the provider's health
+            return False, None, str(e)
+        except Exception as e:
+            health.record(False, time.monotonic() - started)
+            return False, None, str(e)
+        latency = time.monotonic() - started
+        error = response_error(response)
+        if error is not None:
+            health.record(False, latency)
+            return False, None, error
+        health.record(True, latency)
+        return True, response, None
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "priority": self.priority,
+            "hedge_after_ms": self.hedge_after_ms,
+            "hedges": self.hedges,
+            "failovers": self.failovers,
+            "providers": {name: health.snapshot() for name, health in self.health.items()}
+        }
+
+
+# Shared router used by the AI services
+provider_router = ProviderRouter()
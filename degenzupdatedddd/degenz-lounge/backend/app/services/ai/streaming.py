@@ -0,0 +1,71 @@
+"""
+Streaming completions for the AI providers.
+
+Providers send tokens as server-sent events: OpenAI-compatible APIs with `"stream": true`
+and Gemini with `streamGenerateContent?alt=sse`. These helpers read the event stream over the
+shared provider client and yield text deltas as they arrive.
+"""
+
+import json
+import logging
+from typing import Any, AsyncIterator, Dict, List, Optional
+
+import httpx
+
+from app.services.ai.http_client import get_http_client
+
+logger = logging.getLogger(__name__)
+
+
+async def iter_sse_data(response: httpx.Response) -> AsyncIterator[str]:
+    """Yield the data payload of each server-sent event, joining multi-line events."""
+    data_lines: List[str] = []
+    async for line in response.aiter_lines():
+        if not line:
+            if data_lines:
+                yield "\n".join(data_lines)
+                data_lines = []
+            continue
+        if line.startswith("data:"):
+            data_lines.append(line[5:].lstrip())
+    if data_lines:
+        yield "\n".join(data_lines)
+
+
+async def stream_chat_completions(provider: str, url: str, headers: Dict[str, str],
+                                  payload: Dict[str, Any]) -> AsyncIterator[str]:
+    """Stream an OpenAI-compatible chat completion, yielding content deltas."""
+    payload = dict(payload, stream=True)
+    async with get_http_client(provider).stream("POST", url, headers=headers, json=payload) as response:
+        response.raise_for_status()
+        async for data in iter_sse_data(response):
+            if data == "[DONE]":
+                return
+            try:
+                event = json.loads(data)
+            except json.JSONDecodeError:
+                logger.warning(f"Skipping malformed stream event from {provider}: {data[:200]}")
+                continue
+            for choice in event.get("choices", []):
+                delta = (choice.get("delta") or {}).get("content")
+                if delta:
+                    yield delta
+
+
+async def stream_gemini_content(url: str, payload: Dict[str, Any],
+                                params: Optional[Dict[str, str]] = None) -> AsyncIterator[str]:
+    """Stream a Gemini streamGenerateContent call, yielding the text of each chunk."""
+    params = dict(params or {}, alt="sse")
+    async with get_http_client("gemini").stream("POST", url, params=params, json=payload) as response:
+        response.raise_for_status()
+        async for data in iter_sse_data(response):
+            try:
+                event = json.loads(data)
+            except json.JSONDecodeError:
+                logger.warning(f"Skipping malformed stream event from gemini: {data[:200]}")
+                continue
+            for candidate in event.get("candidates", [])[:1]:
+                for part in (candidate.get("content") or {}).get("parts", []):
+                    text = part.get("text")
+                    if text:
+                        yield text
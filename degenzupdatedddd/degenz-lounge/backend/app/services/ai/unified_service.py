@@ -4,10 +4,13 @@ This module integrates all AI providers into a unified service.
 """
 
 import os
+import time
+import asyncio
+import inspect
 import logging
 from typing import Dict, List, Any, Optional, Union
 
-from .gemini_service import GeminiService
+from .gemini_service import GeminiService, get_gemini_service
 from .additional_providers import (
     OpenRouterService,
     GrokService,
@@ -17,12 +20,41 @@ from .additional_providers import (
     MistralService,
     AIProviderFactory
 )
+from .completion_cache import completion_cache
+from .model_catalog import model_catalog
+from .provider_registry import provider_key
+from .router import provider_router, ProviderRouterError
+from .rate_limiter import rate_limiter, estimate_tokens
+from .single_flight import single_flight
+from .providers import LOCAL_LLM_ENABLED
+from .usage import GenerationResult
+from app.utils.tokens import count_tokens
 
 logger = logging.getLogger(__name__)
 
 class UnifiedAIService:
     """Unified service for interacting with multiple AI providers."""
     
+    # Default embedding models for providers that support embeddings
+    DEFAULT_EMBEDDING_MODELS = {
+        'gemini': 'text-embedding-004',
+        'mistral': 'mistral-embed',
+        'huggingface': 'sentence-transformers/all-mpnet-base-v2',
+    }
+    
+    # Model name prefixes used to pick a provider when only a model is given
+    MODEL_PROVIDERS = {
+        'gemini': 'gemini',
+        'gpt': 'openai',
+        'grok': 'grok',
+        'deepseek': 'deepseek',
+        'pplx': 'perplexity',
+        'sonar': 'perplexity',
+        'mistral': 'mistral',
+        'open-mistral': 'mistral',
+        'local': 'local',
+    }
+    
     def __init__(self):
         """Initialize the unified AI service with all providers."""
         self.providers = {}
@@ -31,7 +63,7 @@ class UnifiedAIService:
     def _initialize_providers(self):
         """Initialize all available AI providers."""
         # Initialize default Gemini service
-        self.providers['gemini'] = GeminiService()
+        self.providers['gemini'] = get_gemini_service()
         
         # Initialize additional providers if API keys are available
         provider_keys = {
@@ -50,6 +82,10 @@ class UnifiedAIService:
         except (ImportError, Exception) as e:
             logger.warning(f"Could not initialize OpenAI service: {e}")
         
+        # Offline local mock model for development and load testing
+        if LOCAL_LLM_ENABLED:
+            self.providers['local'] = AIProviderFactory.get_provider('local')
+        
         # Initialize additional providers
         for provider_name, api_key in provider_keys.items():
             if api_key:
@@ -59,9 +95,14 @@ class UnifiedAIService:
                 except Exception as e:
                     logger.error(f"Failed to initialize {provider_name} provider: {e}")
     
+    def _catalog_key(self, provider_name: str) -> str:
+        provider = self.providers.get(provider_name)
+        return "unified:" + provider_key(provider_name, getattr(provider, 'api_key', None))
+    
     def add_provider(self, provider_name: str, api_key: str) -> bool:
         """Add or update an AI provider with the given API key."""
         try:
+            model_catalog.invalidate(self._catalog_key(provider_name))
             self.providers[provider_name] = AIProviderFactory.get_provider(provider_name, api_key)
             logger.info(f"Added/updated {provider_name} provider")
             return True
@@ -73,6 +114,7 @@ class UnifiedAIService:
         """Remove an AI provider."""
         if provider_name in self.providers:
             try:
+                model_catalog.invalidate(self._catalog_key(provider_name))
                 del self.providers[provider_name]
                 logger.info(f"Removed {provider_name} provider")
                 return True
@@ -85,8 +127,8 @@ class UnifiedAIService:
         """List all available AI providers."""
         return list(self.providers.keys())
     
-    def list_models(self, provider_name: str) -> List[Dict[str, Any]]:
-        """List available models for the specified provider."""
+    async def list_models(self, provider_name: str) -> List[Dict[str, Any]]:
+        """List available models for the specified provider, served from the model catalog cache."""
         provider = self.providers.get(provider_name)
         if not provider:
             logger.error(f"Provider {provider_name} not found")
@@ -95,7 +137,7 @@ class UnifiedAIService:
         try:
             # Check if the provider has a list_models method
             if hasattr(provider, 'list_models') and callable(getattr(provider, 'list_models')):
-                return provider.list_models()
+                return await model_catalog.get(self._catalog_key(provider_name), provider.list_models)
             else:
                 logger.warning(f"Provider {provider_name} does not support listing models")
                 return []
@@ -103,14 +145,34 @@ class UnifiedAIService:
             logger.error(f"Error listing models for {provider_name}: {e}")
             return []
     
-    def generate_response(self, 
-                         provider_name: str,
-                         prompt: str, 
-                         model: Optional[str] = None,
-                         system_prompt: Optional[str] = None,
-                         temperature: float = 0.7,
-                         max_tokens: int = 1024) -> Dict[str, Any]:
-        """Generate a response using the specified AI provider and model."""
+    @staticmethod
+    def _generate_kwargs(provider: Any, **kwargs) -> Dict[str, Any]:
+        """
+        Adapt generation arguments to the provider's generate_response signature.
+        GeminiService takes `system_instructions` and no sampling parameters; GrokService takes no model.
+        """
+        params = inspect.signature(provider.generate_response).parameters
+        if "system_prompt" not in params and "system_instructions" in params:
+            kwargs["system_instructions"] = kwargs.pop("system_prompt")
+        return {name: value for name, value in kwargs.items() if name in params}
+    
+    async def generate_response(self, 
+                               provider_name: str,
+                               prompt: str, 
+                               model: Optional[str] = None,
+                               system_prompt: Optional[str] = None,
+                               temperature: float = 0.7,
+                               max_tokens: int = 1024,
+                               cache: Optional[bool] = None,
+                               priority: str = "interactive",
+                               client: str = "default") -> Dict[str, Any]:
+        """
+        Generate a response using the specified AI provider and model.
+        Temperature-0 requests are served from the completion cache; pass cache=True to cache
+        other requests or cache=False to always call the provider. Calls are scheduled by the
+        provider rate limiter in the given priority class, queued fairly per `client`
+        (a user or session id).
+        """
         provider = self.providers.get(provider_name)
         if not provider:
             logger.error(f"Provider {provider_name} not found")
@@ -127,44 +189,201 @@ class UnifiedAIService:
                 'perplexity': 'pplx-7b-online',
                 'huggingface': 'meta-llama/Llama-2-70b-chat-hf',
                 'mistral': 'mistral-medium',
+                'local': 'local-mock',
             }
             
             # Use default model if not specified
             if not model:
                 model = default_models.get(provider_name)
             
-            # Generate response
-            return provider.generate_response(
-                prompt=prompt,
-                model=model,
-                system_prompt=system_prompt,
-                temperature=temperature,
-                max_tokens=max_tokens
+            messages = [{"role": "user", "content": prompt}]
+            request_key = completion_cache.request_key(
+                provider_name, model, system_prompt, messages, temperature, max_tokens
             )
+            
+            use_cache = completion_cache.should_cache(temperature, cache)
+            if use_cache:
+                cached = completion_cache.get(request_key)
+                if cached is not None:
+                    return cached
+            
+            async def generate() -> Union[str, Dict[str, Any]]:
+                kwargs = self._generate_kwargs(
+                    provider,
+                    prompt=prompt,
+                    model=model,
+                    system_prompt=system_prompt,
+                    temperature=temperature,
+                    max_tokens=max_tokens,
+                    client=client,
+                    priority=priority
+                )
+                if getattr(provider, 'schedules_own_calls', False):
+                    # The provider takes its own rate limiter slot; holding one here would count
+                    # the call twice and can deadlock once every slot is held by an outer call.
+                    # Its generate takes the generate_response arguments and returns a GenerationResult
+                    result = await provider.generate(**kwargs)
+                    response = {"error": result.error} if result.error is not None else result.text
+                else:
+                    tokens = estimate_tokens(messages, system_prompt, max_tokens)
+                    async with rate_limiter.slot(provider_name, getattr(provider, 'api_key', None), tokens=tokens,
+                                                 priority=priority, client=client,
+                                                 prompt_tokens=tokens - max_tokens) as grant:
+                        response = await provider.generate_response(**kwargs)
+                        grant.record(response)
+                if use_cache:
+                    completion_cache.set(request_key, response)
+                return response
+            
+            # Identical concurrent requests share one upstream call
+            flight_key = completion_cache.request_key(
+                provider_name, model, system_prompt, messages, temperature, max_tokens,
+                api_key=provider_key(provider_name, getattr(provider, 'api_key', None))
+            )
+            return await single_flight.do(flight_key, generate)
         except Exception as e:
             logger.error(f"Error generating response from {provider_name}: {e}")
             return {"error": str(e)}
     
-    def get_provider_info(self) -> List[Dict[str, Any]]:
-        """Get information about all available providers."""
-        provider_info = []
+    async def generate_routed_response(self,
+                                       prompt: str,
+                                       system_prompt: Optional[str] = None,
+                                       temperature: float = 0.7,
+                                       max_tokens: int = 1024,
+                                       providers: Optional[List[str]] = None,
+                                       hedge_after_ms: Optional[float] = None,
+                                       cache: Optional[bool] = None,
+                                       priority: str = "interactive",
+                                       client: str = "default") -> Dict[str, Any]:
+        """
+        Generate a response from the healthiest available provider.
+        Providers are tried in priority order (AI_PROVIDER_PRIORITY unless `providers` is given),
+        skipping tripped circuits and failing over on errors. The response includes the provider used.
+        """
+        candidates = providers or provider_router.order(list(self.providers))
+        
+        async def attempt(provider_name: str) -> Dict[str, Any]:
+            return await self.generate_response(
+                provider_name, prompt,
+                system_prompt=system_prompt,
+                temperature=temperature,
+                max_tokens=max_tokens,
+                cache=cache,
+                priority=priority,
+                client=client
+            )
+        
+        try:
+            provider_name, response = await provider_router.call(attempt, candidates, hedge_after_ms)
+        except ProviderRouterError as e:
+            logger.error(f"All providers failed: {e}")
+            return {"error": f"All providers failed: {e}"}
         
-        for provider_name, provider in self.providers.items():
-            info = {
+        if isinstance(response, dict):
+            return dict(response, provider=provider_name)
+        return {"provider": provider_name, "response": response}
+    
+    def _provider_for_model(self, model: Optional[str]) -> str:
+        """Provider serving `model`: matched by name prefix, "org/model" ids go to OpenRouter."""
+        if model:
+            name = model.lower()
+            for prefix, provider_name in self.MODEL_PROVIDERS.items():
+                if name.startswith(prefix) and provider_name in self.providers:
+                    return provider_name
+            if "/" in name and 'openrouter' in self.providers:
+                return 'openrouter'
+        return 'local' if LOCAL_LLM_ENABLED else 'gemini'
+    
+    async def generate_text(self,
+                            prompt: str,
+                            model: Optional[str] = None,
+                            provider: Optional[str] = None,
+                            system_prompt: Optional[str] = None,
+                            temperature: float = 0.7,
+                            max_tokens: int = 1024,
+                            cache: Optional[bool] = None,
+                            priority: str = "interactive",
+                            client: str = "default",
+                            **kwargs) -> GenerationResult:
+        """
+        Generate a response and return it as a GenerationResult with token usage and latency.
+        The provider defaults to the one serving `model`; usage the API does not report is
+        estimated with the local tokenizer.
+        """
+        provider_name = provider or self._provider_for_model(model)
+        messages = [{"role": "user", "content": prompt}]
+        started = time.monotonic()
+        response = await self.generate_response(
+            provider_name, prompt,
+            model=model,
+            system_prompt=system_prompt,
+            temperature=temperature,
+            max_tokens=max_tokens,
+            cache=cache,
+            priority=priority,
+            client=client
+        )
+        return GenerationResult.from_response(provider_name, model, response, messages, system_prompt,
+                                              time.monotonic() - started)
+    
+    async def generate_embeddings(self,
+                                  texts: List[str],
+                                  provider_name: str = 'gemini',
+                                  model: Optional[str] = None,
+                                  batch_size: Optional[int] = None,
+                                  max_concurrency: Optional[int] = None,
+                                  client: str = "default",
+                                  priority: str = "background") -> List[List[float]]:
+        """
+        Generate embeddings for many texts.
+        
+        Texts are split into provider-sized batches which run concurrently, bounded by
+        `max_concurrency`. The result is aligned with `texts`; texts whose batch failed
+        get an empty embedding. Pass priority="interactive" for embeddings a user is waiting on,
+        such as search queries, so they are scheduled ahead of bulk ingestion.
+        """
+        provider = self.providers.get(provider_name)
+        if not provider or not hasattr(provider, 'embed_texts'):
+            logger.error(f"Provider {provider_name} does not support embeddings")
+            return [[] for _ in texts]
+        
+        model = model or self.DEFAULT_EMBEDDING_MODELS.get(provider_name)
+        batch_size = batch_size or getattr(provider, 'EMBEDDING_BATCH_SIZE', 32)
+        max_concurrency = max_concurrency or int(os.environ.get('EMBEDDING_MAX_CONCURRENCY', '4'))
+        semaphore = asyncio.Semaphore(max_concurrency)
+        
+        async def embed_batch(batch: List[str]) -> List[List[float]]:
+            async with semaphore:
+                try:
+                    tokens = sum(count_tokens(text) for text in batch)
+                    async with rate_limiter.slot(provider_name, getattr(provider, 'api_key', None),
+                                                 tokens=tokens, priority=priority, client=client):
+                        return await provider.embed_texts(batch, model)
+                except Exception as e:
+                    logger.error(f"Error generating embeddings from {provider_name}: {e}")
+                    return [[] for _ in batch]
+        
+        batches = [texts[i:i + batch_size] for i in range(0, len(texts), batch_size)]
+        results = await asyncio.gather(*(embed_batch(batch) for batch in batches))
+        return [embedding for batch in results for embedding in batch]
+    
+    async def get_provider_info(self) -> List[Dict[str, Any]]:
+        """Get information about all available providers, loading their model catalogs concurrently."""
+        fetches = {
+            provider_name: provider.list_models
+            for provider_name, provider in self.providers.items()
+            if hasattr(provider, 'list_models') and callable(getattr(provider, 'list_models'))
+        }
+        catalogs = await model_catalog.get_many({
+            self._catalog_key(provider_name): fetch for provider_name, fetch in fetches.items()
+        })
+        
+        provider_info = []
+        for provider_name in self.providers:
+            provider_info.append({
                 "name": provider_name,
                 "available": True,
-                "models": []
-            }
-            
-            # Try to get models if the provider supports it
-            try:
-                if hasattr(provider, 'list_models') and callable(getattr(provider, 'list_models')):
-                    models = provider.list_models()
-                    if models:
-                        info["models"] = models
-            except Exception:
-                pass
-            
-            provider_info.append(info)
+                "models": catalogs.get(self._catalog_key(provider_name)) or []
+            })
         
         return provider_info
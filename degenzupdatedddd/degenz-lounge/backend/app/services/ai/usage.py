@@ -0,0 +1,172 @@
+"""
+Normalized generation results with token usage.
+
+Providers report usage in different shapes (OpenAI-compatible `usage`, Gemini `usageMetadata`)
+or not at all. GenerationResult carries the text together with prompt/completion token counts,
+latency, model and finish reason; when the API omits usage the counts are estimated with the
+local tokenizer and `estimated` is set.
+"""
+
+from dataclasses import dataclass, field
+from typing import Any, Dict, List, Optional
+
+from app.utils.tokens import count_tokens
+
+
+def _prompt_tokens(messages: List[Dict[str, str]], system_prompt: Optional[str] = None) -> int:
+    return sum(count_tokens(m.get("content", "")) for m in messages) + count_tokens(system_prompt or "")
+
+
+@dataclass
+class GenerationResult:
+    """Text of a completion plus its token usage and timing."""
+
+    text: str
+    provider: str
+    model: Optional[str] = None
+    prompt_tokens: int = 0
+    completion_tokens: int = 0
+    latency: float = 0.0
+    finish_reason: Optional[str] = None
+    estimated: bool = False
+    error: Optional[str] = None
+    raw: Any = field(default=None, repr=False)
+
+    @property
+    def total_tokens(self) -> int:
+        return self.prompt_tokens + self.completion_tokens
+
+    @property
+    def response(self) -> str:
+        """The text, or an "Error: ..." string as returned by generate_response."""
+        return f"Error: {self.error}" if self.error is not None else self.text
+
+    def to_dict(self) -> Dict[str, Any]:
+        result = {
+            "text": self.text,
+            "provider": self.provider,
+            "model": self.model,
+            "usage": {
+                "prompt_tokens": self.prompt_tokens,
+                "completion_tokens": self.completion_tokens,
+                "total_tokens": self.total_tokens,
+                "estimated": self.estimated
+            },
+            "latency_ms": round(self.latency * 1000, 1),
+            "finish_reason": self.finish_reason
+        }
+        if self.error is not None:
+            result["error"] = self.error
+        return result
+
+    @classmethod
+    def estimate(cls, provider: str, model: Optional[str], text: str, messages: List[Dict[str, str]],
+                 system_prompt: Optional[str] = None, latency: float = 0.0, **kwargs) -> "GenerationResult":
+        """Build a result whose usage is counted locally because the API did not report it."""
+        return cls(
+            text=text,
+            provider=provider,
+            model=model,
+            prompt_tokens=_prompt_tokens(messages, system_prompt),
+            completion_tokens=count_tokens(text),
+            latency=latency,
+            estimated=True,
+            **kwargs
+        )
+
+    @classmethod
+    def failed(cls, provider: str, model: Optional[str], error: str, messages: List[Dict[str, str]],
+               system_prompt: Optional[str] = None, latency: float = 0.0) -> "GenerationResult":
+        """A failed call; only the prompt is counted."""
+        return cls(
+            text="",
+            provider=provider,
+            model=model,
+            prompt_tokens=_prompt_tokens(messages, system_prompt),
+            latency=latency,
+            estimated=True,
+            error=error
+        )
+
+    @classmethod
+    def from_chat_completion(cls, provider: str, model: Optional[str], result: Dict[str, Any],
+                             messages: List[Dict[str, str]], system_prompt: Optional[str] = None,
+                             latency: float = 0.0) -> "GenerationResult":
+        """Parse an OpenAI-compatible chat completion body."""
+        choices = result.get("choices") or []
+        text = "No response generated"
+        finish_reason = None
+        if choices:
+            text = (choices[0].get("message") or {}).get("content") or ""
+            finish_reason = choices[0].get("finish_reason")
+        model = result.get("model") or model
+
+        usage = result.get("usage")
+        if not isinstance(usage, dict) or usage.get("prompt_tokens") is None:
+            return cls.estimate(provider, model, text, messages, system_prompt, latency,
+                                finish_reason=finish_reason, raw=result)
+        return cls(
+            text=text,
+            provider=provider,
+            model=model,
+            prompt_tokens=usage.get("prompt_tokens") or 0,
+            completion_tokens=usage.get("completion_tokens") or 0,
+            latency=latency,
+            finish_reason=finish_reason,
+            raw=result
+        )
+
+    @classmethod
+    def from_gemini(cls, model: Optional[str], result: Dict[str, Any], messages: List[Dict[str, str]],
+                    system_prompt: Optional[str] = None, latency: float = 0.0) -> "GenerationResult":
+        """Parse a Gemini generateContent body."""
+        text = "No response generated"
+        finish_reason = None
+        candidates = result.get("candidates") or []
+        if candidates:
+            candidate = candidates[0]
+            finish_reason = candidate.get("finishReason")
+            parts = (candidate.get("content") or {}).get("parts") or []
+            if parts:
+                text = parts[0].get("text", "")
+
+        usage = result.get("usageMetadata")
+        if not isinstance(usage, dict) or usage.get("promptTokenCount") is None:
+            return cls.estimate("gemini", model, text, messages, system_prompt, latency,
+                                finish_reason=finish_reason, raw=result)
+        return cls(
+            text=text,
+            provider="gemini",
+            model=model,
+            prompt_tokens=usage.get("promptTokenCount") or 0,
+            completion_tokens=usage.get("candidatesTokenCount") or 0,
+            latency=latency,
+            finish_reason=finish_reason,
+            raw=result
+        )
+
+    @classmethod
+    def from_response(cls, provider: str, model: Optional[str], response: Any, messages: List[Dict[str, str]],
+                      system_prompt: Optional[str] = None, latency: float = 0.0) -> "GenerationResult":
+        """Normalize whatever a provider service returned: text, a chat completion or an error."""
+        if isinstance(response, GenerationResult):
+            return response
+        if isinstance(response, dict):
+            if "error" in response:
+                return cls.failed(provider, model, str(response["error"]), messages, system_prompt, latency)
+            return cls.from_chat_completion(provider, model, response, messages, system_prompt, latency)
+        text = response if isinstance(response, str) else str(response or "")
+        return cls.estimate(provider, model, text, messages, system_prompt, latency)
+
+
+def response_error(response: Any) -> Optional[str]:
+    """
+    The error a provider reported, or None for a successful response.
+    Failures are raised or returned as {"error": ...} dicts or GenerationResults with `error` set;
+    text is never inspected, so a completion that starts with "Error" is still a completion.
+    """
+    if isinstance(response, GenerationResult):
+        return response.error
+    if isinstance(response, dict):
+        return str(response["error"]) if "error" in response else None
+    return "empty response" if response is None else None
@@ -0,0 +1,87 @@
+"""
+Document chunking for the knowledge base.
+Splits extracted text into token-bounded, overlapping chunks that are embedded and stored individually.
+"""
+
+import os
+from typing import Iterable, Iterator, List, Tuple
+
+from app.utils.tokens import token_spans
+
+DEFAULT_CHUNK_TOKENS = int(os.getenv("KNOWLEDGE_CHUNK_TOKENS", "512"))
+DEFAULT_CHUNK_OVERLAP = int(os.getenv("KNOWLEDGE_CHUNK_OVERLAP", "64"))
+
+SENTENCE_ENDINGS = (".", "!", "?")
+
+
+class TextChunker:
+    """
+    Token-aware text splitter.
+
+    Each chunk holds at most `chunk_tokens` tokens and repeats the last `overlap_tokens`
+    tokens of the previous chunk, so content near a boundary is retrievable from either side.
+    Chunks prefer to end on a paragraph or sentence break in their last quarter.
+    """
+
+    def __init__(self, chunk_tokens: int = None, overlap_tokens: int = None):
+        self.chunk_tokens = chunk_tokens or DEFAULT_CHUNK_TOKENS
+        self.overlap_tokens = DEFAULT_CHUNK_OVERLAP if overlap_tokens is None else overlap_tokens
+        if self.chunk_tokens < 1:
+            raise ValueError("chunk_tokens must be positive")
+        if not 0 <= self.overlap_tokens < self.chunk_tokens:
+            raise ValueError("overlap_tokens must be between 0 and chunk_tokens - 1")
+
+    def split(self, text: str) -> List[str]:
+        """Split text into chunks, in document order."""
+        chunks, _ = self.split_partial(text, final=True)
+        return chunks
+
+    def split_stream(self, segments: Iterable[str]) -> Iterator[str]:
+        """Chunk text that arrives in segments (pages, row batches...) while buffering at most one chunk."""
+        remainder = ""
+        for segment in segments:
+            chunks, remainder = self.split_partial(remainder + segment)
+            yield from chunks
+        chunks, _ = self.split_partial(remainder, final=True)
+        yield from chunks
+
+    def split_partial(self, text: str, final: bool = False) -> Tuple[List[str], str]:
+        """
+        Split off every complete chunk of `text` and return (chunks, remainder).
+        Unless `final`, the trailing tokens are kept in the remainder (together with the overlap)
+        because the next segment may extend them; prepend the remainder to the next segment.
+        """
+        spans = token_spans(text)
+        chunks = []
+        start = 0
+        while start < len(spans):
+            # Without the rest of the stream, only chunks followed by at least one token are final
+            if not final and start + self.chunk_tokens >= len(spans):
+                break
+            end = min(start + self.chunk_tokens, len(spans))
+            if end < len(spans):
+                end = self._break_point(text, spans, start, end)
+
+            chunk = text[spans[start][0]:spans[end - 1][1]].strip()
+            if chunk:
+                chunks.append(chunk)
+            if end >= len(spans):
+                start = len(spans)
+                break
+            # Step back by the overlap, but always make progress
+            start = max(end - self.overlap_tokens, start + 1)
+
+        remainder = text[spans[start][0]:] if start < len(spans) else ""
+        return chunks, remainder
+
+    def _break_point(self, text: str, spans: List[Tuple[int, int]], start: int, end: int) -> int:
+        """Move `end` back to just after a paragraph or sentence break, if one is close."""
+        floor = start + max(1, (end - start) * 3 // 4)
+        sentence_end = None
+        for i in range(end - 1, floor - 1, -1):
+            gap = text[spans[i][1]:spans[i + 1][0]]
+            if "\n\n" in gap:
+                return i + 1
+            if sentence_end is None and text[spans[i][0]:spans[i][1]].rstrip().endswith(SENTENCE_ENDINGS):
+                sentence_end = i + 1
+        return sentence_end or end
@@ -0,0 +1,388 @@
+"""
+Background processing queue for uploaded documents.
+
+Documents are processed by a fixed number of asyncio workers, so uploads return immediately
+and the event loop stays responsive. Jobs live in an in-process asyncio.Queue by default;
+set DOCUMENT_QUEUE_BACKEND=redis (with REDIS_URL) to share the queue between API instances.
+CPU-heavy text extraction runs in a process pool.
+
+Interrupted jobs are recovered by a single process, the holder of a Postgres advisory lock:
+with Redis it requeues the unacknowledged jobs of instances that stopped heartbeating. With the
+in-process queue every process refreshes Document.processing_heartbeat_at for the jobs it holds,
+and the owner requeues queued or processing documents whose lease (DOCUMENT_QUEUE_LEASE) expired,
+so documents held by live processes are left alone.
+"""
+
+import os
+import uuid
+import asyncio
+import logging
+from collections import Counter
+from concurrent.futures import ProcessPoolExecutor
+from datetime import datetime, timedelta, timezone
+from typing import Any, Callable, Iterable, List, Optional
+
+from sqlalchemy import func, or_, text
+
+from app.database import SessionLocal, engine
+
+logger = logging.getLogger(__name__)
+
+_process_pool: Optional[ProcessPoolExecutor] = None
+
+# Advisory lock key held by the process that owns job recovery
+RECOVERY_LOCK_KEY = 0x6465677A
+
+
+def get_process_pool() -> ProcessPoolExecutor:
+    """Shared process pool for CPU-bound extraction work, created on first use."""
+    global _process_pool
+    if _process_pool is None:
+        workers = int(os.getenv("DOCUMENT_EXTRACTION_PROCESSES", "0")) or None
+        _process_pool = ProcessPoolExecutor(max_workers=workers)
+    return _process_pool
+
+
+async def run_in_process(fn: Callable, *args) -> Any:
+    """Run a picklable top-level function in the process pool without blocking the event loop."""
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(get_process_pool(), fn, *args)
+
+
+def shutdown_process_pool() -> None:
+    global _process_pool
+    if _process_pool is not None:
+        _process_pool.shutdown(wait=False, cancel_futures=True)
+        _process_pool = None
+
+
+class MemoryJobQueue:
+    """In-process FIFO of document ids. Tracks the jobs put but not yet acknowledged."""
+
+    def __init__(self):
+        self._queue: asyncio.Queue = asyncio.Queue()
+        self._held: Counter = Counter()
+
+    @property
+    def held(self) -> List[int]:
+        """Documents queued, being processed or waiting for a retry in this process."""
+        return list(self._held)
+
+    async def put(self, document_id: int) -> None:
+        self._held[document_id] += 1
+        await self._queue.put(document_id)
+
+    async def get(self, timeout: float) -> Optional[int]:
+        try:
+            return await asyncio.wait_for(self._queue.get(), timeout)
+        except asyncio.TimeoutError:
+            return None
+
+    async def ack(self, document_id: int) -> None:
+        self._held[document_id] -= 1
+        if self._held[document_id] <= 0:
+            del self._held[document_id]
+
+    async def heartbeat(self) -> None:
+        if self._held:
+            await asyncio.to_thread(_touch_documents, self.held)
+
+    async def requeue_abandoned(self) -> int:
+        return 0
+
+    async def close(self) -> None:
+        pass
+
+
+def _touch_documents(document_ids: Iterable[int]) -> None:
+    """Refresh the processing lease of documents held by this process."""
+    from app.models.knowledge_models import Document
+    db = SessionLocal()
+    try:
+        db.query(Document).filter(Document.id.in_(list(document_ids))).update(
+            {Document.processing_heartbeat_at: func.now()}, synchronize_session=False
+        )
+        db.commit()
+    finally:
+        db.close()
+
+
+class RedisJobQueue:
+    """
+    Redis list of document ids, shared by every API instance pointing at the same REDIS_URL.
+
+    Jobs are moved atomically into a processing list owned by this consumer and removed from it
+    by `ack` once handled, so a crash leaves them there instead of losing them. Consumers refresh
+    a heartbeat key; `requeue_abandoned` returns the jobs of consumers whose heartbeat expired.
+    """
+
+    KEY = "degenz:document_jobs"
+    CONSUMERS_KEY = "degenz:document_jobs:consumers"
+    PROCESSING_KEY = "degenz:document_jobs:processing:{}"
+    HEARTBEAT_KEY = "degenz:document_jobs:alive:{}"
+    HEARTBEAT_TTL = 30
+
+    def __init__(self, url: str):
+        import redis.asyncio as redis
+        self.client = redis.Redis.from_url(url)
+        self.consumer = uuid.uuid4().hex
+        self.processing = self.PROCESSING_KEY.format(self.consumer)
+
+    async def put(self, document_id: int) -> None:
+        await self.client.rpush(self.KEY, document_id)
+
+    async def get(self, timeout: float) -> Optional[int]:
+        item = await self.client.blmove(self.KEY, self.processing, max(1, int(timeout)), "LEFT", "RIGHT")
+        return int(item) if item is not None else None
+
+    async def ack(self, document_id: int) -> None:
+        await self.client.lrem(self.processing, 1, document_id)
+
+    async def heartbeat(self) -> None:
+        async with self.client.pipeline(transaction=True) as pipeline:
+            pipeline.sadd(self.CONSUMERS_KEY, self.consumer)
+            pipeline.set(self.HEARTBEAT_KEY.format(self.consumer), 1, ex=self.HEARTBEAT_TTL)
+            await pipeline.execute()
+
+    async def requeue_abandoned(self) -> int:
+        requeued = 0
+        for consumer in await self.client.smembers(self.CONSUMERS_KEY):
+            consumer = consumer.decode()
+            if consumer == self.consumer or await self.client.exists(self.HEARTBEAT_KEY.format(consumer)):
+                continue
+            requeued += await self._requeue(self.PROCESSING_KEY.format(consumer))
+            await self.client.srem(self.CONSUMERS_KEY, consumer)
+        return requeued
+
+    async def _requeue(self, processing: str) -> int:
+        """Move every job of a processing list back to the front of the queue."""
+        moved = 0
+        while await self.client.lmove(processing, self.KEY, "RIGHT", "LEFT") is not None:
+            moved += 1
+        return moved
+
+    async def close(self) -> None:
+        # Jobs cancelled by the shutdown go back to the queue for the other instances
+        try:
+            await self._requeue(self.processing)
+            await self.client.srem(self.CONSUMERS_KEY, self.consumer)
+            await self.client.delete(self.HEARTBEAT_KEY.format(self.consumer))
+        finally:
+            await self.client.close()
+
+
+class DocumentQueue:
+    """
+    Runs DocumentService.process_document for queued document ids.
+
+    At most `concurrency` documents are processed at once. Failed jobs are retried with
+    exponential backoff until `max_attempts` is reached, after which the document is marked failed.
+    Progress is recorded on the Document row (processing_status, processing_attempts, processing_error).
+    A job is acknowledged once it completes, fails for good or has been put back for its retry.
+    """
+
+    POLL_INTERVAL = 1.0
+
+    def __init__(self, concurrency: int = None, max_attempts: int = None, backend: str = None):
+        self.concurrency = concurrency or int(os.getenv("DOCUMENT_QUEUE_CONCURRENCY", "2"))
+        self.max_attempts = max_attempts or int(os.getenv("DOCUMENT_QUEUE_MAX_ATTEMPTS", "3"))
+        self.retry_delay = float(os.getenv("DOCUMENT_QUEUE_RETRY_DELAY", "5"))
+        self.lease = float(os.getenv("DOCUMENT_QUEUE_LEASE", "60"))
+        self.backend = backend or os.getenv("DOCUMENT_QUEUE_BACKEND", "memory")
+        self._jobs = None
+        self._workers = []
+        self._pending_retries = set()
+        self._maintenance = None
+        self._owns_recovery = False
+        self._recovery_connection = None
+
+    @property
+    def running(self) -> bool:
+        return bool(self._workers)
+
+    def _create_jobs(self):
+        if self.backend == "redis":
+            url = os.getenv("REDIS_URL")
+            if url:
+                return RedisJobQueue(url)
+            logger.warning("DOCUMENT_QUEUE_BACKEND=redis but REDIS_URL is not set, using the in-process queue")
+        return MemoryJobQueue()
+
+    async def start(self) -> None:
+        """Start the workers; the recovery owner requeues documents interrupted by a previous shutdown."""
+        if self.running:
+            return
+        self._jobs = self._create_jobs()
+        await self._jobs.heartbeat()
+        self._workers = [asyncio.create_task(self._worker(n)) for n in range(self.concurrency)]
+        logger.info(f"Document queue started with {self.concurrency} workers ({type(self._jobs).__name__})")
+        if await asyncio.to_thread(self._claim_recovery):
+            await self._recover()
+        self._maintenance = asyncio.create_task(self._maintain())
+
+    async def stop(self) -> None:
+        tasks = list(self._workers) + list(self._pending_retries) + ([self._maintenance] if self._maintenance else [])
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+        self._workers = []
+        self._pending_retries.clear()
+        self._maintenance = None
+        if self._jobs is not None:
+            await self._jobs.close()
+            self._jobs = None
+        self._release_recovery()
+        shutdown_process_pool()
+
+    async def enqueue(self, document_id: int) -> None:
+        """Queue a document for processing; starts the workers if they are not running yet."""
+        if not self.running:
+            await self.start()
+        await self._jobs.put(document_id)
+
+    def _claim_recovery(self) -> bool:
+        """
+        Try to become the single process that recovers interrupted jobs. Ownership is a Postgres
+        session advisory lock on a dedicated connection, so it passes on when the owner exits.
+        Other databases run a single process and always own recovery.
+        """
+        if self._owns_recovery:
+            return True
+        if engine.dialect.name != "postgresql":
+            self._owns_recovery = True
+            return True
+        connection = engine.connect()
+        try:
+            claimed = connection.execute(text("SELECT pg_try_advisory_lock(:key)"), {"key": RECOVERY_LOCK_KEY}).scalar()
+        except Exception:
+            connection.close()
+            raise
+        if not claimed:
+            connection.close()
+            return False
+        self._recovery_connection = connection
+        self._owns_recovery = True
+        return True
+
+    def _release_recovery(self) -> None:
+        connection, self._recovery_connection = self._recovery_connection, None
+        self._owns_recovery = False
+        if connection is None:
+            return
+        try:
+            connection.execute(text("SELECT pg_advisory_unlock(:key)"), {"key": RECOVERY_LOCK_KEY})
+        finally:
+            connection.close()
+
+    async def _recover(self) -> None:
+        if isinstance(self._jobs, MemoryJobQueue):
+            interrupted = await asyncio.to_thread(self._interrupted_documents, self.lease)
+            for document_id in interrupted:
+                await self._jobs.put(document_id)
+            # Claim the leases before another maintenance round could see them as abandoned
+            await self._jobs.heartbeat()
+            requeued = len(interrupted)
+        else:
+            requeued = await self._jobs.requeue_abandoned()
+        if requeued:
+            logger.info(f"Requeued {requeued} interrupted documents")
+
+    @staticmethod
+    def _interrupted_documents(lease: float) -> List[int]:
+        """Queued or processing documents whose holder has not refreshed the lease in time."""
+        from app.models.knowledge_models import Document
+        expired = datetime.now(timezone.utc) - timedelta(seconds=lease)
+        db = SessionLocal()
+        try:
+            # A document just (re)queued has a fresh updated_at even if an old heartbeat remains
+            return [
+                row.id for row in db.query(Document.id).filter(
+                    Document.processing_status.in_(["queued", "processing"]),
+                    or_(Document.processing_heartbeat_at.is_(None), Document.processing_heartbeat_at < expired),
+                    func.coalesce(Document.updated_at, Document.created_at) < expired
+                )
+            ]
+        finally:
+            db.close()
+
+    async def _maintain(self) -> None:
+        """Refresh this instance's heartbeats and leases; a later owner takes over recovery if the current one exits."""
+        interval = min(RedisJobQueue.HEARTBEAT_TTL, self.lease) / 3
+        while True:
+            await asyncio.sleep(interval)
+            try:
+                await self._jobs.heartbeat()
+                if await asyncio.to_thread(self._claim_recovery):
+                    await self._recover()
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logger.error(f"Document queue maintenance failed: {e}")
+
+    async def _worker(self, worker_id: int) -> None:
+        while True:
+            try:
+                document_id = await self._jobs.get(self.POLL_INTERVAL)
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logger.error(f"Document worker {worker_id} could not read the queue: {e}")
+                await asyncio.sleep(self.POLL_INTERVAL)
+                continue
+            if document_id is None:
+                continue
+            retry_delay = await self._run(document_id)
+            try:
+                if retry_delay is None:
+                    await self._jobs.ack(document_id)
+                else:
+                    self._schedule_retry(document_id, retry_delay)
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logger.error(f"Document worker {worker_id} could not acknowledge document {document_id}: {e}")
+
+    async def _run(self, document_id: int) -> Optional[float]:
+        """Process one document; returns the delay before a retry, or None when the job is done."""
+        from app.models.knowledge_models import Document
+        from app.services.knowledge.knowledge_service import DocumentService
+
+        db = SessionLocal()
+        try:
+            await DocumentService.process_document(db, document_id)
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            db.rollback()
+            document = db.query(Document).filter(Document.id == document_id).first()
+            if document is None:
+                return None
+            document.processing_error = str(e)[:2000]
+            attempts = document.processing_attempts or 0
+            if attempts < self.max_attempts:
+                document.processing_status = "queued"
+                db.commit()
+                delay = self.retry_delay * 2 ** (attempts - 1)
+                logger.warning(f"Document {document_id} failed (attempt {attempts}), retrying in {delay:.0f}s: {e}")
+                return delay
+            document.processing_status = "failed"
+            db.commit()
+            logger.error(f"Document {document_id} failed after {attempts} attempts: {e}")
+        finally:
+            db.close()
+        return None
+
+    def _schedule_retry(self, document_id: int, delay: float) -> None:
+        # The job stays unacknowledged until it is back in the queue, so a crash meanwhile does not lose it
+        async def retry():
+            await asyncio.sleep(delay)
+            await self._jobs.put(document_id)
+            await self._jobs.ack(document_id)
+
+        task = asyncio.create_task(retry())
+        self._pending_retries.add(task)
+        task.add_done_callback(self._pending_retries.discard)
+
+
+# Shared queue used by the knowledge routes
+document_queue = DocumentQueue()
@@ -0,0 +1,180 @@
+"""
+Streaming text extraction for uploaded documents.
+
+Each extractor is a generator that yields the document text in bounded segments (pages, row
+batches, paragraph groups or fixed-size blocks), so extraction and chunking never hold a whole
+file in memory. DOCX bodies are parsed incrementally from the archive. JSON is the exception:
+the standard library has no incremental parser, so documents are decoded whole and capped at
+DOCUMENT_JSON_MAX_MB. PDF pages are extracted in parallel across the document process pool.
+"""
+
+import os
+import csv
+import json
+import asyncio
+import logging
+import zipfile
+from collections import deque
+from typing import AsyncIterator, Iterator
+from xml.etree import ElementTree
+
+from app.services.knowledge.document_queue import run_in_process
+
+logger = logging.getLogger(__name__)
+
+TEXT_BLOCK_SIZE = 64 * 1024
+CSV_ROWS_PER_SEGMENT = int(os.getenv("DOCUMENT_CSV_ROWS_PER_SEGMENT", "1000"))
+DOCX_PARAGRAPHS_PER_SEGMENT = 50
+JSON_MAX_BYTES = int(os.getenv("DOCUMENT_JSON_MAX_MB", "20")) * 1024 * 1024
+WORD_NAMESPACE = "{http://schemas.openxmlformats.org/wordprocessingml/2006/main}"
+PDF_PAGES_PER_TASK = int(os.getenv("DOCUMENT_PDF_PAGES_PER_TASK", "8"))
+PDF_TASKS_IN_FLIGHT = int(os.getenv("DOCUMENT_PDF_TASKS_IN_FLIGHT", "4"))
+
+
+def iter_plain_text(file_path: str) -> Iterator[str]:
+    with open(file_path, 'r', encoding='utf-8') as f:
+        while True:
+            block = f.read(TEXT_BLOCK_SIZE)
+            if not block:
+                return
+            yield block
+
+
+def iter_csv_rows(file_path: str) -> Iterator[str]:
+    with open(file_path, 'r', encoding='utf-8', newline='') as f:
+        rows = []
+        for row in csv.reader(f):
+            rows.append(",".join(row))
+            if len(rows) >= CSV_ROWS_PER_SEGMENT:
+                yield "\n".join(rows) + "\n"
+                rows = []
+        if rows:
+            yield "\n".join(rows) + "\n"
+
+
+def iter_json(file_path: str) -> Iterator[str]:
+    """Pretty-printed JSON in blocks. The document is decoded whole, so its size is capped."""
+    if os.path.getsize(file_path) > JSON_MAX_BYTES:
+        raise ValueError(f"JSON documents over {JSON_MAX_BYTES // (1024 * 1024)} MB cannot be extracted")
+    with open(file_path, 'r', encoding='utf-8') as f:
+        data = json.load(f)
+    pieces = []
+    size = 0
+    for piece in json.JSONEncoder(indent=2).iterencode(data):
+        pieces.append(piece)
+        size += len(piece)
+        if size >= TEXT_BLOCK_SIZE:
+            yield "".join(pieces)
+            pieces = []
+            size = 0
+    if pieces:
+        yield "".join(pieces)
+
+
+def _paragraph_text(paragraph: ElementTree.Element) -> str:
+    parts = []
+    for node in paragraph.iter():
+        if node.tag == WORD_NAMESPACE + "t":
+            parts.append(node.text or "")
+        elif node.tag == WORD_NAMESPACE + "tab":
+            parts.append("\t")
+        elif node.tag in (WORD_NAMESPACE + "br", WORD_NAMESPACE + "cr"):
+            parts.append("\n")
+    return "".join(parts)
+
+
+def iter_docx_paragraphs(file_path: str) -> Iterator[str]:
+    """
+    Paragraphs of word/document.xml, including those in tables. The XML is parsed incrementally
+    and each block is dropped once its text is taken, so memory is bounded by the largest block.
+    """
+    paragraphs = []
+    body = None
+    depth = 0
+    with zipfile.ZipFile(file_path) as archive, archive.open("word/document.xml") as document:
+        for event, elem in ElementTree.iterparse(document, events=("start", "end")):
+            if event == "start":
+                depth += 1
+                if depth == 2:
+                    body = elem
+                continue
+            depth -= 1
+            if elem.tag == WORD_NAMESPACE + "p":
+                paragraphs.append(_paragraph_text(elem))
+                # Nested paragraphs (text boxes) are cleared before their parent, so none is read twice
+                elem.clear()
+            if depth == 2:
+                body.remove(elem)
+            if len(paragraphs) >= DOCX_PARAGRAPHS_PER_SEGMENT:
+                yield "\n\n".join(paragraphs) + "\n\n"
+                paragraphs = []
+    if paragraphs:
+        yield "\n\n".join(paragraphs) + "\n\n"
+
+
+def pdf_page_count(file_path: str) -> int:
+    try:
+        import PyPDF2
+    except ImportError:
+        raise RuntimeError("PDF extraction requires PyPDF2 library. Please install it.")
+    with open(file_path, 'rb') as f:
+        return len(PyPDF2.PdfReader(f).pages)
+
+
+def extract_pdf_pages(file_path: str, start: int, end: int) -> str:
+    """Extract pages [start, end) of a PDF. Runs in a worker process."""
+    import PyPDF2
+    with open(file_path, 'rb') as f:
+        pages = PyPDF2.PdfReader(f).pages
+        return "".join((pages[page_num].extract_text() or "") + "\n\n" for page_num in range(start, end))
+
+
+SYNC_EXTRACTORS = {
+    'txt': iter_plain_text,
+    'md': iter_plain_text,
+    'csv': iter_csv_rows,
+    'json': iter_json,
+    'docx': iter_docx_paragraphs,
+}
+
+
+async def iter_pdf_pages(file_path: str) -> AsyncIterator[str]:
+    """
+    Yield PDF text in page-range segments, in order. Up to PDF_TASKS_IN_FLIGHT ranges are
+    extracted concurrently in the process pool, which bounds how much text is buffered.
+    """
+    page_count = await run_in_process(pdf_page_count, file_path)
+    ranges = deque((start, min(start + PDF_PAGES_PER_TASK, page_count)) for start in range(0, page_count, PDF_PAGES_PER_TASK))
+    in_flight: deque = deque()
+    try:
+        while ranges or in_flight:
+            while ranges and len(in_flight) < PDF_TASKS_IN_FLIGHT:
+                start, end = ranges.popleft()
+                in_flight.append(asyncio.ensure_future(run_in_process(extract_pdf_pages, file_path, start, end)))
+            yield await in_flight.popleft()
+    finally:
+        for task in in_flight:
+            task.cancel()
+
+
+async def iter_document_text(file_path: str, file_type: str) -> AsyncIterator[str]:
+    """Yield a document's text in bounded segments without blocking the event loop."""
+    if file_type == 'pdf':
+        async for segment in iter_pdf_pages(file_path):
+            yield segment
+        return
+
+    extractor = SYNC_EXTRACTORS.get(file_type)
+    if extractor is None:
+        raise ValueError(f"Unsupported file type: {file_type}")
+
+    # Pull each segment on a worker thread; the generators only do file I/O and light parsing
+    segments = extractor(file_path)
+    try:
+        while True:
+            segment = await asyncio.to_thread(next, segments, None)
+            if segment is None:
+                return
+            yield segment
+    finally:
+        segments.close()
@@ -0,0 +1,376 @@
+"""
+In-memory adjacency cache for the knowledge graph.
+
+Each repository's graph is held as a CSR (compressed sparse row) adjacency over integer arrays:
+for every item, the rows of its incident connections are a contiguous slice of one array.
+Writes are applied incrementally: new connections go to a small pending list that is merged
+into the CSR arrays once it grows past COMPACT_THRESHOLD, and deletions flip an alive mask.
+
+Graphs are built from SQL on first use and rebuilt after KNOWLEDGE_GRAPH_CACHE_TTL seconds,
+which bounds staleness when several API processes write to the same database.
+"""
+
+import os
+import json
+import time
+import hashlib
+import logging
+import itertools
+import threading
+from typing import Any, Callable, Dict, Iterable, Iterator, List, Optional, Tuple
+
+import numpy as np
+from sqlalchemy import or_, select
+from sqlalchemy.sql import Select
+from sqlalchemy.orm import Session
+
+logger = logging.getLogger(__name__)
+
+# (connection id, source id, target id, relationship type, strength)
+Edge = Tuple[int, int, int, str, float]
+
+_versions = itertools.count(1)
+
+
+def node_payload(item_id: int, title: str, content_type: str, importance: float, tags: List[str]) -> Dict[str, Any]:
+    """A graph node in the shape returned by /knowledge/graph."""
+    return {
+        "id": item_id,
+        "label": title,
+        "type": content_type,
+        "importance": importance,
+        "tags": tags
+    }
+
+
+def edge_payload(edge: Edge) -> Dict[str, Any]:
+    _, source, target, relationship_type, strength = edge
+    return {
+        "source": source,
+        "target": target,
+        "type": relationship_type,
+        "strength": strength
+    }
+
+
+class RepositoryGraph:
+    """
+    Adjacency of one repository: its items, and every connection touching at least one of them.
+    Connections to items in other repositories are kept so multi-repository views can join them.
+    """
+
+    COMPACT_THRESHOLD = 1024
+
+    def __init__(self, repository_id: int):
+        self.repository_id = repository_id
+        self.nodes: Dict[int, Dict[str, Any]] = {}
+        self.version = next(_versions)
+        self.built_at = time.monotonic()
+        self._lock = threading.RLock()
+
+        # Edge table, one row per connection
+        self._edge_ids = np.empty(0, dtype=np.int64)
+        self._sources = np.empty(0, dtype=np.int64)
+        self._targets = np.empty(0, dtype=np.int64)
+        self._strengths = np.empty(0, dtype=np.float64)
+        self._types: List[str] = []
+        self._alive = np.empty(0, dtype=bool)
+
+        # CSR: edges incident to _node_ids[i] are _incident[_indptr[i]:_indptr[i + 1]]
+        self._node_ids = np.empty(0, dtype=np.int64)
+        self._indptr = np.zeros(1, dtype=np.int64)
+        self._incident = np.empty(0, dtype=np.int64)
+
+        # Connections added since the last compaction, indexed by endpoint
+        self._pending: Dict[int, List[Edge]] = {}
+        self._pending_count = 0
+
+    @property
+    def edge_count(self) -> int:
+        return int(self._alive.sum()) + self._pending_count
+
+    def load(self, nodes: Iterable[Dict[str, Any]], edges: Iterable[Edge]) -> None:
+        """Replace the graph contents in one pass."""
+        with self._lock:
+            self.nodes = {node["id"]: node for node in nodes}
+            self._pending = {}
+            self._pending_count = 0
+            self._set_edges(list(edges))
+            self._touch()
+
+    def add_node(self, node: Dict[str, Any]) -> None:
+        with self._lock:
+            self.nodes[node["id"]] = node
+            self._touch()
+
+    def remove_node(self, item_id: int) -> bool:
+        """Remove an item and every connection touching it. Returns whether anything changed."""
+        with self._lock:
+            changed = self.nodes.pop(item_id, None) is not None
+
+            rows = self._csr_rows(item_id)
+            if len(rows) and self._alive[rows].any():
+                self._alive[rows] = False
+                changed = True
+
+            removed = self._pending.pop(item_id, [])
+            for edge in removed:
+                _, source, target, _, _ = edge
+                other = target if source == item_id else source
+                if other != item_id:
+                    self._pending[other] = [e for e in self._pending.get(other, []) if e[0] != edge[0]]
+            if removed:
+                self._pending_count -= len(removed)
+                changed = True
+
+            if changed:
+                self._touch()
+            return changed
+
+    def add_edge(self, edge: Edge) -> None:
+        with self._lock:
+            _, source, target, _, _ = edge
+            self._pending.setdefault(source, []).append(edge)
+            if target != source:
+                self._pending.setdefault(target, []).append(edge)
+            self._pending_count += 1
+            if self._pending_count >= self.COMPACT_THRESHOLD:
+                self.compact()
+            self._touch()
+
+    def incident_edges(self, item_id: int) -> List[Edge]:
+        """Connections touching an item, from the CSR slice plus pending additions."""
+        with self._lock:
+            rows = self._csr_rows(item_id)
+            rows = rows[self._alive[rows]]
+            edges = [self._edge(row) for row in rows.tolist()]
+            edges.extend(self._pending.get(item_id, []))
+            return edges
+
+    def edges(self) -> List[Edge]:
+        """Every live connection in the graph."""
+        with self._lock:
+            edges = [self._edge(row) for row in np.flatnonzero(self._alive).tolist()]
+            pending = {edge[0]: edge for edges in self._pending.values() for edge in edges}
+            return edges + list(pending.values())
+
+    def compact(self) -> None:
+        """Merge pending connections and drop deleted ones, rebuilding the CSR arrays."""
+        with self._lock:
+            self._set_edges(self.edges())
+            self._pending = {}
+            self._pending_count = 0
+
+    def _touch(self) -> None:
+        self.version = next(_versions)
+
+    def _edge(self, row: int) -> Edge:
+        return (
+            int(self._edge_ids[row]),
+            int(self._sources[row]),
+            int(self._targets[row]),
+            self._types[row],
+            float(self._strengths[row])
+        )
+
+    def _csr_rows(self, item_id: int) -> np.ndarray:
+        position = int(np.searchsorted(self._node_ids, item_id))
+        if position >= len(self._node_ids) or self._node_ids[position] != item_id:
+            return np.empty(0, dtype=np.int64)
+        return self._incident[self._indptr[position]:self._indptr[position + 1]]
+
+    def _set_edges(self, edges: List[Edge]) -> None:
+        count = len(edges)
+        self._edge_ids = np.fromiter((e[0] for e in edges), dtype=np.int64, count=count)
+        self._sources = np.fromiter((e[1] for e in edges), dtype=np.int64, count=count)
+        self._targets = np.fromiter((e[2] for e in edges), dtype=np.int64, count=count)
+        self._strengths = np.fromiter((e[4] if e[4] is not None else 0.0 for e in edges), dtype=np.float64, count=count)
+        self._types = [e[3] for e in edges]
+        self._alive = np.ones(count, dtype=bool)
+
+        # Each connection is listed under both endpoints (once for self-loops)
+        rows = np.arange(count, dtype=np.int64)
+        loops = self._sources == self._targets
+        endpoints = np.concatenate([self._sources, self._targets[~loops]])
+        edge_rows = np.concatenate([rows, rows[~loops]])
+        order = np.argsort(endpoints, kind="stable")
+        self._node_ids, counts = np.unique(endpoints[order], return_counts=True)
+        self._indptr = np.concatenate([[0], np.cumsum(counts)]).astype(np.int64)
+        self._incident = edge_rows[order]
+
+
+class KnowledgeGraphCache:
+    """Per-repository RepositoryGraph instances, built lazily and kept in sync by the knowledge services."""
+
+    def __init__(self, ttl: Optional[float] = None):
+        self.ttl = float(os.getenv("KNOWLEDGE_GRAPH_CACHE_TTL", "300")) if ttl is None else ttl
+        self._graphs: Dict[int, RepositoryGraph] = {}
+        self._lock = threading.Lock()
+
+    def get(self, db: Session, repository_id: int) -> RepositoryGraph:
+        graph = self._graphs.get(repository_id)
+        if graph is None or (self.ttl and time.monotonic() - graph.built_at > self.ttl):
+            graph = self.build(db, repository_id)
+        return graph
+
+    def build(self, db: Session, repository_id: int) -> RepositoryGraph:
+        """Load a repository's items, tags and connections with three column-only queries."""
+        from app.models.knowledge_models import KnowledgeItem, KnowledgeTag, KnowledgeConnection, knowledge_item_tags
+
+        tags: Dict[int, List[str]] = {}
+        tag_rows = db.query(knowledge_item_tags.c.knowledge_item_id, KnowledgeTag.name).join(
+            KnowledgeTag, KnowledgeTag.id == knowledge_item_tags.c.tag_id
+        ).join(
+            KnowledgeItem, KnowledgeItem.id == knowledge_item_tags.c.knowledge_item_id
+        ).filter(KnowledgeItem.repository_id == repository_id)
+        for item_id, name in tag_rows:
+            tags.setdefault(item_id, []).append(name)
+
+        items = db.query(
+            KnowledgeItem.id, KnowledgeItem.title, KnowledgeItem.content_type, KnowledgeItem.importance
+        ).filter(KnowledgeItem.repository_id == repository_id)
+        nodes = [
+            node_payload(item_id, title, content_type, importance, tags.get(item_id, []))
+            for item_id, title, content_type, importance in items
+        ]
+
+        repository_items = select(KnowledgeItem.id).where(KnowledgeItem.repository_id == repository_id)
+        edges = db.query(
+            KnowledgeConnection.id,
+            KnowledgeConnection.source_id,
+            KnowledgeConnection.target_id,
+            KnowledgeConnection.relationship_type,
+            KnowledgeConnection.strength
+        ).filter(or_(
+            KnowledgeConnection.source_id.in_(repository_items),
+            KnowledgeConnection.target_id.in_(repository_items)
+        ))
+
+        graph = RepositoryGraph(repository_id)
+        graph.load(nodes, (tuple(row) for row in edges))
+        with self._lock:
+            self._graphs[repository_id] = graph
+        logger.info(f"Built knowledge graph for repository {repository_id}: {len(graph.nodes)} nodes, {graph.edge_count} edges")
+        return graph
+
+    def add_item(self, repository_id: int, node: Dict[str, Any]) -> None:
+        graph = self._graphs.get(repository_id)
+        if graph is not None:
+            graph.add_node(node)
+
+    def remove_items(self, item_ids: Iterable[int]) -> None:
+        """Remove items from their repository and their connections from every loaded graph."""
+        item_ids = list(item_ids)
+        for graph in list(self._graphs.values()):
+            for item_id in item_ids:
+                graph.remove_node(item_id)
+
+    def add_connection(self, edge: Edge, repository_ids: Iterable[int]) -> None:
+        """Record a connection in the graphs of the repositories holding its endpoints."""
+        for repository_id in set(repository_ids):
+            graph = self._graphs.get(repository_id)
+            if graph is not None:
+                graph.add_edge(edge)
+
+    def invalidate(self, repository_id: int) -> None:
+        with self._lock:
+            self._graphs.pop(repository_id, None)
+
+    @staticmethod
+    def etag(graphs: List[RepositoryGraph], *params: Any) -> str:
+        """Weak ETag over the graph versions and the request parameters."""
+        versions = ",".join(f"{graph.repository_id}:{graph.version}" for graph in graphs)
+        digest = hashlib.sha1(f"{versions}|{params!r}".encode("utf-8")).hexdigest()
+        return f'W/"{digest}"'
+
+
+def full_graph(graphs: List[RepositoryGraph]) -> Dict[str, Any]:
+    """Every node in the given repositories and the connections between them."""
+    nodes = [node for graph in graphs for node in graph.nodes.values()]
+    node_ids = {node["id"] for node in nodes}
+    edges = {}
+    for graph in graphs:
+        for edge in graph.edges():
+            if edge[1] in node_ids and edge[2] in node_ids:
+                edges[edge[0]] = edge
+    return {
+        "nodes": nodes,
+        "edges": [edge_payload(edge) for edge in edges.values()]
+    }
+
+
+def neighbourhood(graphs: List[RepositoryGraph], central_item_id: int, depth: int, max_nodes: int) -> Dict[str, Any]:
+    """
+    Breadth-first neighbourhood of an item across the given repositories. Neighbours are admitted
+    strongest connection first until `max_nodes` is reached; same result as the SQL traversal.
+    """
+    def find_node(item_id):
+        for graph in graphs:
+            node = graph.nodes.get(item_id)
+            if node is not None:
+                return graph, node
+        return None, None
+
+    owner, central = find_node(central_item_id)
+    if central is None:
+        return {"nodes": [], "edges": []}
+
+    nodes = {central_item_id: central}
+    owners = {central_item_id: owner}
+    edges: Dict[int, Edge] = {}
+
+    current_level = [central_item_id]
+    for _ in range(depth):
+        if not current_level or len(nodes) >= max_nodes:
+            break
+
+        level_edges = {}
+        for item_id in current_level:
+            for edge in owners[item_id].incident_edges(item_id):
+                level_edges[edge[0]] = edge
+        ordered = sorted(level_edges.values(), key=lambda edge: edge[4] or 0.0, reverse=True)
+        edges.update(level_edges)
+
+        next_level = []
+        for _, source, target, _, _ in ordered:
+            for neighbour_id in (source, target):
+                if neighbour_id in nodes or len(nodes) >= max_nodes:
+                    continue
+                graph, node = find_node(neighbour_id)
+                if node is not None:
+                    nodes[neighbour_id] = node
+                    owners[neighbour_id] = graph
+                    next_level.append(neighbour_id)
+        current_level = next_level
+
+    return {
+        "nodes": list(nodes.values()),
+        "edges": [edge_payload(edge) for edge in edges.values() if edge[1] in nodes and edge[2] in nodes]
+    }
+
+
+def export_lines(
+    db: Session,
+    nodes: Select,
+    edges: Select,
+    tag_names: Callable[[List[int]], Dict[int, List[str]]],
+    batch_size: int
+) -> Iterator[str]:
+    """
+    NDJSON lines of a graph export: one {"type": "node", "node": {...}} line per row of `nodes`
+    (id, title, content_type, importance), then one {"type": "edge", "edge": {...}} line per row of
+    `edges` (id, source, target, relationship type, strength). The payloads have the shape returned
+    by /knowledge/graph. Both are read `batch_size` rows at a time and tags are looked up once per
+    batch of nodes.
+    """
+    rows = db.execute(nodes.execution_options(yield_per=batch_size))
+    for partition in rows.partitions():
+        tags = tag_names([row[0] for row in partition])
+        for item_id, title, content_type, importance in partition:
+            node = node_payload(item_id, title, content_type, importance, tags.get(item_id, []))
+            yield json.dumps({"type": "node", "node": node}) + "\n"
+
+    rows = db.execute(edges.execution_options(yield_per=batch_size))
+    for partition in rows.partitions():
+        for edge in partition:
+            yield json.dumps({"type": "edge", "edge": edge_payload(tuple(edge))}) + "\n"
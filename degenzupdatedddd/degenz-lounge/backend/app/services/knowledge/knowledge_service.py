@@ -4,14 +4,19 @@ This module provides services for managing knowledge repositories, items, and re
 """
 
 import os
+import re
+import json
+import asyncio
+import hashlib
 import logging
 import tempfile
-from typing import List, Dict, Any, Optional
-from datetime import datetime
-from sqlalchemy.orm import Session
+from typing import List, Dict, Any, Iterator, Optional, Tuple
+from sqlalchemy import text, or_, func, case, select
+from sqlalchemy.orm import Session, selectinload, aliased
 from fastapi import UploadFile, HTTPException
 import numpy as np
 
+from app.database import SessionLocal
 from app.models.knowledge_models import (
     KnowledgeRepository, 
     KnowledgeItem, 
@@ -19,9 +24,26 @@ from app.models.knowledge_models import (
     KnowledgeConnection,
     Document,
     Citation,
-    WebSearchResult
+    WebSearchResult,
+    document_knowledge_items,
+    knowledge_item_tags,
+    knowledge_item_agents,
+    knowledge_repo_users,
+    search_document,
+    fts_config,
+    EMBEDDING_DIMENSIONS,
+    PGVECTOR_ENABLED,
+    PGVECTOR_INDEX_TYPE
 )
 from app.services.ai.unified_service import UnifiedAIService
+from app.services.knowledge.vector_index import VectorIndexManager, cosine_top_k
+from app.services.knowledge.chunking import TextChunker
+from app.services.knowledge.document_queue import document_queue
+from app.services.knowledge.graph_cache import (
+    KnowledgeGraphCache, node_payload, edge_payload, full_graph, neighbourhood, export_lines
+)
+from app.services.knowledge.extraction import iter_document_text
+from app.utils.cache import TieredCache, LRUCache
 
 # Initialize logging
 logger = logging.getLogger(__name__)
@@ -29,6 +51,42 @@ logger = logging.getLogger(__name__)
 # Initialize AI service for embeddings and processing
 ai_service = UnifiedAIService()
 
+# Per-repository approximate nearest neighbour indexes for semantic search
+vector_indexes = VectorIndexManager()
+
+# Embeddings are cached by (provider, model, sha256(text)) so repeated queries and
+# duplicate documents skip the provider round-trip
+EMBEDDING_PROVIDER = os.getenv("EMBEDDING_PROVIDER", "gemini")
+EMBEDDING_MODEL = os.getenv("EMBEDDING_MODEL", "text-embedding-004")
+embedding_cache = TieredCache(
+    namespace="embeddings",
+    max_size=int(os.getenv("EMBEDDING_CACHE_SIZE", "10000")),
+    ttl=float(os.getenv("EMBEDDING_CACHE_TTL", "604800"))
+)
+
+# user_id -> frozenset of accessible repository ids (owned, shared and public).
+# Invalidated on create/share/delete; the TTL bounds staleness across API processes
+repository_access = LRUCache(
+    max_size=int(os.getenv("KNOWLEDGE_ACCESS_CACHE_SIZE", "10000")),
+    ttl=float(os.getenv("KNOWLEDGE_ACCESS_CACHE_TTL", "60"))
+)
+
+# Retrieval: "vector", "lexical" (full-text) or "hybrid" (both, fused with reciprocal rank fusion)
+SEARCH_MODE = os.getenv("KNOWLEDGE_SEARCH_MODE", "hybrid")
+HYBRID_CANDIDATES_PER_RESULT = int(os.getenv("KNOWLEDGE_HYBRID_CANDIDATES", "4"))
+RRF_K = 60
+IMPORTANCE_WEIGHT = float(os.getenv("KNOWLEDGE_IMPORTANCE_WEIGHT", "0.5"))
+
+# Upper bound on nodes returned by a graph traversal around a central item
+GRAPH_MAX_NODES = int(os.getenv("KNOWLEDGE_GRAPH_MAX_NODES", "2000"))
+
+# Rows fetched per round trip when streaming a graph export
+GRAPH_EXPORT_BATCH_SIZE = int(os.getenv("KNOWLEDGE_GRAPH_EXPORT_BATCH_SIZE", "1000"))
+
+# In-memory CSR adjacency per repository, serving /knowledge/graph without SQL round-trips
+GRAPH_CACHE_ENABLED = os.getenv("KNOWLEDGE_GRAPH_CACHE", "true").lower() == "true"
+graph_cache = KnowledgeGraphCache()
+
 class KnowledgeService:
     """Service for managing knowledge repositories and items."""
     
@@ -44,8 +102,60 @@ class KnowledgeService:
         db.add(repository)
         db.commit()
         db.refresh(repository)
+        
+        # A public repository is visible to everyone; a private one only to its owner
+        if is_public:
+            repository_access.clear()
+        else:
+            repository_access.delete(str(owner_id))
         return repository
     
+    @staticmethod
+    async def delete_repository(db: Session, repository_id: int, owner_id: int) -> None:
+        """Delete a repository with all of its items and their links."""
+        repository = db.query(KnowledgeRepository).filter(
+            KnowledgeRepository.id == repository_id,
+            KnowledgeRepository.owner_id == owner_id
+        ).first()
+        
+        if not repository:
+            raise HTTPException(status_code=404, detail="Repository not found or you don't have permission")
+        
+        item_ids = select(KnowledgeItem.id).where(KnowledgeItem.repository_id == repository_id)
+        deleted_ids = [row.id for row in db.query(KnowledgeItem.id).filter(KnowledgeItem.repository_id == repository_id)]
+        
+        db.query(KnowledgeConnection).filter(or_(
+            KnowledgeConnection.source_id.in_(item_ids),
+            KnowledgeConnection.target_id.in_(item_ids)
+        )).delete(synchronize_session=False)
+        db.query(Citation).filter(Citation.knowledge_item_id.in_(item_ids)).delete(synchronize_session=False)
+        for association in (knowledge_item_tags, knowledge_item_agents, document_knowledge_items):
+            db.execute(association.delete().where(association.c.knowledge_item_id.in_(item_ids)))
+        db.query(KnowledgeItem).filter(KnowledgeItem.repository_id == repository_id).delete(synchronize_session=False)
+        db.execute(knowledge_repo_users.delete().where(knowledge_repo_users.c.repository_id == repository_id))
+        db.delete(repository)
+        db.commit()
+        
+        vector_indexes.drop(repository_id)
+        graph_cache.invalidate(repository_id)
+        graph_cache.remove_items(deleted_ids)
+        repository_access.clear()
+    
+    @staticmethod
+    def get_accessible_repository_ids(db: Session, user_id: int) -> frozenset:
+        """Ids of every repository the user owns, was shared or is public; cached per user."""
+        key = str(user_id)
+        repo_ids = repository_access.get(key)
+        if repo_ids is None:
+            shared = select(knowledge_repo_users.c.repository_id).where(knowledge_repo_users.c.user_id == user_id)
+            repo_ids = frozenset(row.id for row in db.query(KnowledgeRepository.id).filter(or_(
+                KnowledgeRepository.owner_id == user_id,
+                KnowledgeRepository.is_public == True,
+                KnowledgeRepository.id.in_(shared)
+            )))
+            repository_access.set(key, repo_ids)
+        return repo_ids
+    
     @staticmethod
     async def get_repositories(db: Session, user_id: int, include_public: bool = True) -> List[KnowledgeRepository]:
         """Get all repositories accessible by a user."""
@@ -64,18 +174,11 @@ class KnowledgeService:
     @staticmethod
     async def get_repository(db: Session, repository_id: int, user_id: int) -> Optional[KnowledgeRepository]:
         """Get a specific repository if accessible by the user."""
-        repository = db.query(KnowledgeRepository).filter(KnowledgeRepository.id == repository_id).first()
-        
-        if not repository:
-            return None
-            
         # Check if user has access
-        if (repository.owner_id == user_id or 
-            repository.is_public or 
-            any(user.id == user_id for user in repository.shared_users)):
-            return repository
-            
-        return None
+        if repository_id not in KnowledgeService.get_accessible_repository_ids(db, user_id):
+            return None
+        
+        return db.query(KnowledgeRepository).filter(KnowledgeRepository.id == repository_id).first()
     
     @staticmethod
     async def share_repository(db: Session, repository_id: int, owner_id: int, user_ids: List[int]) -> KnowledgeRepository:
@@ -99,6 +202,9 @@ class KnowledgeService:
         
         db.commit()
         db.refresh(repository)
+        
+        for user in users:
+            repository_access.delete(str(user.id))
         return repository
     
     @staticmethod
@@ -122,7 +228,9 @@ class KnowledgeService:
             raise HTTPException(status_code=404, detail="Repository not found or you don't have permission")
         
         # Generate embedding for the content
-        embedding = await KnowledgeService._generate_embedding(content)
+        embedding = await KnowledgeService._generate_embedding(
+            content, client=f"user:{creator_id}", priority="interactive"
+        )
         
         # Create knowledge item
         knowledge_item = KnowledgeItem(
@@ -137,6 +245,8 @@ class KnowledgeService:
             repository_id=repository_id,
             creator_id=creator_id
         )
+        if PGVECTOR_ENABLED and len(embedding) == EMBEDDING_DIMENSIONS:
+            knowledge_item.embedding_vector = embedding
         
         db.add(knowledge_item)
         db.commit()
@@ -148,8 +258,118 @@ class KnowledgeService:
             db.commit()
             
         db.refresh(knowledge_item)
+        
+        # Keep the repository's vector index and graph in sync
+        if not KnowledgeService.uses_pgvector(db):
+            vector_indexes.add_item(db, repository_id, knowledge_item.id, embedding)
+        graph_cache.add_item(repository_id, node_payload(
+            knowledge_item.id, title, knowledge_item.content_type, knowledge_item.importance,
+            [tag.name for tag in knowledge_item.tags]
+        ))
         return knowledge_item
     
+    @staticmethod
+    async def create_knowledge_items(
+        db: Session,
+        items: List[Dict[str, Any]],
+        creator_id: int,
+        document_id: Optional[int] = None
+    ) -> List[int]:
+        """
+        Create many knowledge items with one embedding pass and one transaction.
+        Each item takes the same fields as create_knowledge_item. Returns the new ids in input order.
+        When `document_id` is given the items are linked to that document in the same transaction.
+        """
+        if not items:
+            return []
+        
+        # Check access once per repository
+        accessible_repo_ids = KnowledgeService.get_accessible_repository_ids(db, creator_id)
+        for repository_id in {item["repository_id"] for item in items}:
+            if repository_id not in accessible_repo_ids:
+                raise HTTPException(status_code=404, detail=f"Repository {repository_id} not found or you don't have permission")
+        
+        embeddings = await KnowledgeService._generate_embeddings(
+            [item["content"] or "" for item in items], client=f"user:{creator_id}", priority="background"
+        )
+        
+        # Load every referenced tag in one query
+        tag_ids = {tag_id for item in items for tag_id in (item.get("tag_ids") or [])}
+        tags_by_id = {tag.id: tag for tag in db.query(KnowledgeTag).filter(KnowledgeTag.id.in_(tag_ids)).all()} if tag_ids else {}
+        
+        knowledge_items = []
+        for item, embedding in zip(items, embeddings):
+            knowledge_item = KnowledgeItem(
+                title=item["title"],
+                content=item["content"],
+                content_type=item.get("content_type", "text"),
+                source_url=item.get("source_url"),
+                source_type=item.get("source_type", "user"),
+                importance=item.get("importance", 1.0),
+                metadata=item.get("metadata") or {},
+                embedding=embedding,
+                repository_id=item["repository_id"],
+                creator_id=creator_id
+            )
+            if PGVECTOR_ENABLED and len(embedding) == EMBEDDING_DIMENSIONS:
+                knowledge_item.embedding_vector = embedding
+            knowledge_item.tags = [tags_by_id[tag_id] for tag_id in (item.get("tag_ids") or []) if tag_id in tags_by_id]
+            knowledge_items.append(knowledge_item)
+        
+        db.add_all(knowledge_items)
+        db.flush()
+        item_ids = [knowledge_item.id for knowledge_item in knowledge_items]
+        if document_id is not None:
+            db.execute(document_knowledge_items.insert(), [
+                {"document_id": document_id, "knowledge_item_id": item_id} for item_id in item_ids
+            ])
+        db.commit()
+        
+        # Keep the repository vector indexes in sync
+        if not KnowledgeService.uses_pgvector(db):
+            by_repository: Dict[int, Tuple[List[int], List[List[float]]]] = {}
+            for item, item_id, embedding in zip(items, item_ids, embeddings):
+                ids, vectors = by_repository.setdefault(item["repository_id"], ([], []))
+                ids.append(item_id)
+                vectors.append(embedding)
+            for repository_id, (ids, vectors) in by_repository.items():
+                vector_indexes.add_items(db, repository_id, ids, vectors)
+        
+        for item, item_id in zip(items, item_ids):
+            graph_cache.add_item(item["repository_id"], node_payload(
+                item_id, item["title"], item.get("content_type", "text"), item.get("importance", 1.0),
+                [tags_by_id[tag_id].name for tag_id in (item.get("tag_ids") or []) if tag_id in tags_by_id]
+            ))
+        
+        return item_ids
+    
+    @staticmethod
+    async def delete_knowledge_item(db: Session, item_id: int, user_id: int) -> None:
+        """Delete a knowledge item with its connections, tag and document links and citations."""
+        item = db.query(KnowledgeItem).filter(KnowledgeItem.id == item_id).first()
+        if not item:
+            raise HTTPException(status_code=404, detail="Knowledge item not found")
+        
+        repository = db.query(KnowledgeRepository).filter(KnowledgeRepository.id == item.repository_id).first()
+        if item.creator_id != user_id and (not repository or repository.owner_id != user_id):
+            raise HTTPException(status_code=403, detail="Only the creator or the repository owner can delete this item")
+        
+        repository_id = item.repository_id
+        db.query(KnowledgeConnection).filter(or_(
+            KnowledgeConnection.source_id == item_id,
+            KnowledgeConnection.target_id == item_id
+        )).delete(synchronize_session=False)
+        db.query(Citation).filter(Citation.knowledge_item_id == item_id).delete(synchronize_session=False)
+        db.execute(document_knowledge_items.delete().where(document_knowledge_items.c.knowledge_item_id == item_id))
+        item.tags = []
+        item.related_agents = []
+        db.delete(item)
+        db.commit()
+        
+        if not KnowledgeService.uses_pgvector(db):
+            vector_indexes.remove_items(db, repository_id, [item_id])
+        graph_cache.remove_items([item_id])
+    
     @staticmethod
     async def search_knowledge(
         db: Session, 
@@ -157,81 +377,333 @@ class KnowledgeService:
         query: str, 
         repository_id: Optional[int] = None,
         tag_ids: Optional[List[int]] = None,
-        limit: int = 10
+        limit: int = 10,
+        nprobe: Optional[int] = None,
+        exact: bool = False,
+        mode: Optional[str] = None
     ) -> List[KnowledgeItem]:
-        """Search knowledge items using semantic search."""
+        """
+        Search knowledge items.
+        
+        `mode` is "vector" (semantic), "lexical" (full-text) or "hybrid", which fuses both
+        rankings with reciprocal rank fusion weighted by importance. Vector and hybrid searches
+        fall back to lexical when no query embedding can be generated.
+        `nprobe` is the number of index clusters probed per repository; higher values
+        improve recall at the cost of latency. `exact` bypasses the index and scores
+        every candidate embedding.
+        """
+        mode = mode or SEARCH_MODE
+        
         # Generate embedding for the query
-        query_embedding = await KnowledgeService._generate_embedding(query)
+        query_embedding = (
+            await KnowledgeService._generate_embedding(query, client=f"user:{user_id}", priority="interactive")
+            if mode != "lexical" else []
+        )
         
-        # Get accessible repositories
-        accessible_repos = await KnowledgeService.get_repositories(db, user_id)
-        accessible_repo_ids = [repo.id for repo in accessible_repos]
+        # Get accessible repositories, filtered by repository if specified
+        repo_ids = await KnowledgeService._resolve_repository_ids(db, user_id, repository_id)
         
-        if repository_id and repository_id not in accessible_repo_ids:
-            raise HTTPException(status_code=403, detail="You don't have access to this repository")
+        if not query_embedding and mode != "lexical":
+            logger.warning("No query embedding available, falling back to lexical search")
+            mode = "lexical"
         
-        # Filter by repository if specified
-        repo_filter = KnowledgeItem.repository_id.in_(accessible_repo_ids)
-        if repository_id:
-            repo_filter = KnowledgeItem.repository_id == repository_id
+        if mode == "lexical":
+            hits = KnowledgeService._lexical_hits(db, query, repo_ids, tag_ids, limit)
+        elif mode == "hybrid":
+            candidates = limit * HYBRID_CANDIDATES_PER_RESULT
+            hits = KnowledgeService._fuse_rankings(db, [
+                KnowledgeService._search_hits(db, query_embedding, repo_ids, tag_ids, candidates, nprobe, exact),
+                KnowledgeService._lexical_hits(db, query, repo_ids, tag_ids, candidates)
+            ], limit)
+        else:
+            hits = KnowledgeService._search_hits(db, query_embedding, repo_ids, tag_ids, limit, nprobe, exact)
+        top_ids = [item_id for item_id, score in hits]
+        if not top_ids:
+            return []
+        
+        # Load only the winning rows, preserving rank order
+        items_by_id = {
+            item.id: item
+            for item in db.query(KnowledgeItem).filter(KnowledgeItem.id.in_(top_ids)).all()
+        }
+        return [items_by_id[item_id] for item_id in top_ids if item_id in items_by_id]
+    
+    @staticmethod
+    async def search_documents(
+        db: Session,
+        user_id: int,
+        query: str,
+        repository_id: Optional[int] = None,
+        limit: int = 10,
+        chunks_per_document: int = 3,
+        nprobe: Optional[int] = None
+    ) -> List[Dict[str, Any]]:
+        """
+        Search document chunks and group the hits by document.
+        Documents are ranked by their best chunk; each carries up to `chunks_per_document` matching chunks.
+        """
+        query_embedding = await KnowledgeService._generate_embedding(
+            query, client=f"user:{user_id}", priority="interactive"
+        )
+        
+        repo_ids = await KnowledgeService._resolve_repository_ids(db, user_id, repository_id)
+        
+        if not query_embedding:
+            return []
+        
+        # Over-fetch chunks so a few long documents don't crowd out the rest
+        hits = KnowledgeService._search_hits(
+            db, query_embedding, repo_ids, None, limit * chunks_per_document * 2, nprobe, False
+        )
+        if not hits:
+            return []
+        scores = dict(hits)
+        
+        links = db.query(
+            document_knowledge_items.c.knowledge_item_id,
+            document_knowledge_items.c.document_id
+        ).filter(document_knowledge_items.c.knowledge_item_id.in_(list(scores))).all()
         
-        # Base query
-        knowledge_items = db.query(KnowledgeItem).filter(repo_filter)
+        # Group chunk ids by document, keeping rank order
+        document_of = dict(links)
+        grouped: Dict[int, List[int]] = {}
+        for item_id, score in hits:
+            document_id = document_of.get(item_id)
+            if document_id is None:
+                continue
+            chunk_ids = grouped.setdefault(document_id, [])
+            if len(chunk_ids) < chunks_per_document:
+                chunk_ids.append(item_id)
+        
+        document_ids = list(grouped)[:limit]
+        if not document_ids:
+            return []
+        
+        documents = {doc.id: doc for doc in db.query(Document).filter(Document.id.in_(document_ids)).all()}
+        chunk_ids = [item_id for document_id in document_ids for item_id in grouped[document_id]]
+        chunks = {item.id: item for item in db.query(KnowledgeItem).filter(KnowledgeItem.id.in_(chunk_ids)).all()}
+        
+        results = []
+        for document_id in document_ids:
+            document = documents.get(document_id)
+            if not document:
+                continue
+            results.append({
+                "document_id": document_id,
+                "filename": document.filename,
+                "file_type": document.file_type,
+                "score": scores[grouped[document_id][0]],
+                "chunks": [
+                    {
+                        "knowledge_item_id": item_id,
+                        "chunk_index": (chunks[item_id].metadata or {}).get("chunk_index"),
+                        "content": chunks[item_id].content,
+                        "score": scores[item_id]
+                    }
+                    for item_id in grouped[document_id] if item_id in chunks
+                ]
+            })
+        return results
+    
+    @staticmethod
+    def _search_hits(
+        db: Session,
+        query_embedding: List[float],
+        repo_ids: List[int],
+        tag_ids: Optional[List[int]],
+        limit: int,
+        nprobe: Optional[int],
+        exact: bool
+    ) -> List[Tuple[int, float]]:
+        """Return the top (item id, cosine similarity) pairs across the given repositories."""
+        if KnowledgeService.uses_pgvector(db) and not exact:
+            return KnowledgeService._search_pgvector(db, query_embedding, repo_ids, tag_ids, limit, nprobe)
         
-        # Filter by tags if specified
+        # Resolve tag filters to candidate ids so they are applied inside the index probe
+        candidate_ids = None
         if tag_ids:
+            candidates = db.query(KnowledgeItem.id).filter(KnowledgeItem.repository_id.in_(repo_ids))
             for tag_id in tag_ids:
-                knowledge_items = knowledge_items.filter(KnowledgeItem.tags.any(id=tag_id))
+                candidates = candidates.filter(KnowledgeItem.tags.any(id=tag_id))
+            candidate_ids = {row.id for row in candidates}
+            if not candidate_ids:
+                return []
         
-        # Get all items that match the filters
-        items = knowledge_items.all()
+        if exact:
+            # Score candidate embeddings directly, without hydrating ORM objects
+            rows = db.query(KnowledgeItem.id, KnowledgeItem.embedding).filter(
+                KnowledgeItem.repository_id.in_(repo_ids),
+                KnowledgeItem.embedding.isnot(None)
+            )
+            if candidate_ids is not None:
+                rows = rows.filter(KnowledgeItem.id.in_(candidate_ids))
+            return KnowledgeService._rank_by_similarity(query_embedding, rows.all(), limit)
         
-        # Calculate similarity scores
-        scored_items = []
-        for item in items:
-            if item.embedding:
-                similarity = KnowledgeService._calculate_similarity(query_embedding, item.embedding)
-                scored_items.append((item, similarity))
+        # Probe each repository index and merge the hits
+        hits = []
+        for repo_id in repo_ids:
+            index = vector_indexes.get_index(db, repo_id)
+            hits.extend(index.search(query_embedding, k=limit, nprobe=nprobe, candidate_ids=candidate_ids))
+        hits.sort(key=lambda hit: hit[1], reverse=True)
+        return hits[:limit]
+    
+    @staticmethod
+    def _lexical_hits(
+        db: Session,
+        query: str,
+        repo_ids: List[int],
+        tag_ids: Optional[List[int]],
+        limit: int
+    ) -> List[Tuple[int, float]]:
+        """
+        Rank items by full-text match on title and content. On Postgres this is a GIN-indexed
+        `@@` match ranked by ts_rank_cd; other databases fall back to counting matched terms with LIKE.
+        """
+        if not query.strip() or not repo_ids:
+            return []
         
-        # Sort by similarity and return top results
-        scored_items.sort(key=lambda x: x[1], reverse=True)
-        return [item for item, score in scored_items[:limit]]
+        if db.get_bind().dialect.name == "postgresql":
+            document = search_document(KnowledgeItem.title, KnowledgeItem.content)
+            ts_query = func.websearch_to_tsquery(fts_config(), query)
+            rank = func.ts_rank_cd(document, ts_query)
+            rows = db.query(KnowledgeItem.id, rank).filter(document.op("@@")(ts_query))
+        else:
+            terms = list(dict.fromkeys(re.findall(r"\w+", query.lower())))[:10]
+            if not terms:
+                return []
+            matches = [
+                or_(KnowledgeItem.title.ilike(f"%{term}%"), KnowledgeItem.content.ilike(f"%{term}%"))
+                for term in terms
+            ]
+            rank = sum(case((match, 1), else_=0) for match in matches)
+            rows = db.query(KnowledgeItem.id, rank).filter(or_(*matches))
+        
+        rows = rows.filter(KnowledgeItem.repository_id.in_(repo_ids))
+        for tag_id in tag_ids or []:
+            rows = rows.filter(KnowledgeItem.tags.any(id=tag_id))
+        return [(item_id, float(score)) for item_id, score in rows.order_by(rank.desc(), KnowledgeItem.id).limit(limit)]
     
     @staticmethod
-    async def _generate_embedding(text: str) -> List[float]:
-        """Generate embedding vector for text using AI service."""
-        try:
-            # Use the default AI provider for embeddings
-            response = ai_service.generate_embedding(text)
-            return response.get("embedding", [])
-        except Exception as e:
-            logger.error(f"Error generating embedding: {e}")
-            # Return empty embedding if failed
+    def _fuse_rankings(db: Session, rankings: List[List[Tuple[int, float]]], limit: int) -> List[Tuple[int, float]]:
+        """
+        Reciprocal rank fusion: each ranking contributes 1 / (RRF_K + rank) per item, and the
+        sum is scaled by importance ** IMPORTANCE_WEIGHT.
+        """
+        scores: Dict[int, float] = {}
+        for ranking in rankings:
+            for rank, (item_id, _) in enumerate(ranking, start=1):
+                scores[item_id] = scores.get(item_id, 0.0) + 1.0 / (RRF_K + rank)
+        if not scores:
             return []
+        
+        if IMPORTANCE_WEIGHT:
+            importance = dict(db.query(KnowledgeItem.id, KnowledgeItem.importance).filter(KnowledgeItem.id.in_(list(scores))))
+            for item_id in scores:
+                weight = importance.get(item_id)
+                weight = 1.0 if weight is None else max(weight, 0.01)
+                scores[item_id] *= weight ** IMPORTANCE_WEIGHT
+        
+        return sorted(scores.items(), key=lambda hit: hit[1], reverse=True)[:limit]
     
     @staticmethod
-    def _calculate_similarity(embedding1: List[float], embedding2: List[float]) -> float:
-        """Calculate cosine similarity between two embeddings."""
-        if not embedding1 or not embedding2:
-            return 0.0
-            
-        try:
-            # Convert to numpy arrays
-            vec1 = np.array(embedding1)
-            vec2 = np.array(embedding2)
-            
-            # Calculate cosine similarity
-            dot_product = np.dot(vec1, vec2)
-            norm1 = np.linalg.norm(vec1)
-            norm2 = np.linalg.norm(vec2)
+    def uses_pgvector(db: Session) -> bool:
+        """Whether similarity search runs inside Postgres (pgvector) rather than in-process."""
+        return PGVECTOR_ENABLED and db.get_bind().dialect.name == "postgresql"
+    
+    @staticmethod
+    def _search_pgvector(
+        db: Session,
+        query_embedding: List[float],
+        repo_ids: List[int],
+        tag_ids: Optional[List[int]],
+        limit: int,
+        nprobe: Optional[int]
+    ) -> List[Tuple[int, float]]:
+        """Rank items server-side with `ORDER BY embedding_vector <=> :query LIMIT :limit`."""
+        if len(query_embedding) != EMBEDDING_DIMENSIONS:
+            logger.warning(f"Query embedding has {len(query_embedding)} dimensions, expected {EMBEDDING_DIMENSIONS}")
+            return []
+        
+        # Map the recall knob onto the index's search parameter for this transaction
+        if nprobe:
+            if PGVECTOR_INDEX_TYPE == "ivfflat":
+                db.execute(text(f"SET LOCAL ivfflat.probes = {int(nprobe)}"))
+            else:
+                db.execute(text(f"SET LOCAL hnsw.ef_search = {max(int(nprobe), limit)}"))
+        
+        distance = KnowledgeItem.embedding_vector.cosine_distance(query_embedding)
+        rows = db.query(KnowledgeItem.id, distance).filter(
+            KnowledgeItem.repository_id.in_(repo_ids),
+            KnowledgeItem.embedding_vector.isnot(None)
+        )
+        for tag_id in tag_ids or []:
+            rows = rows.filter(KnowledgeItem.tags.any(id=tag_id))
+        
+        return [(item_id, 1.0 - float(item_distance)) for item_id, item_distance in rows.order_by(distance).limit(limit)]
+    
+    @staticmethod
+    def _embedding_cache_key(text: str) -> str:
+        """Cache key for an embedding: provider, model and a hash of the text."""
+        digest = hashlib.sha256(text.encode("utf-8")).hexdigest()
+        return f"{EMBEDDING_PROVIDER}:{EMBEDDING_MODEL}:{digest}"
+    
+    @staticmethod
+    async def _generate_embedding(text: str, client: str = "default", priority: str = "background") -> List[float]:
+        """Generate embedding vector for text using AI service."""
+        embeddings = await KnowledgeService._generate_embeddings([text], client, priority)
+        return embeddings[0]
+    
+    @staticmethod
+    async def _generate_embeddings(texts: List[str], client: str = "default",
+                                   priority: str = "background") -> List[List[float]]:
+        """
+        Generate embedding vectors for many texts, aligned with the input.
+        Cached texts are served from the embedding cache; the rest (deduplicated)
+        go to the provider in batches, queued fairly per `client` in the given rate limiter
+        priority class. Failed embeddings come back empty.
+        """
+        keys = [KnowledgeService._embedding_cache_key(text) for text in texts]
+        cached = embedding_cache.get_many(keys)
+        
+        # Embed each distinct uncached text once
+        missing = {}
+        for key, text in zip(keys, texts):
+            if key not in cached and key not in missing:
+                missing[key] = text
+        
+        if missing:
+            try:
+                # Use the configured AI provider for embeddings
+                generated = await ai_service.generate_embeddings(
+                    list(missing.values()),
+                    provider_name=EMBEDDING_PROVIDER,
+                    model=EMBEDDING_MODEL,
+                    client=client,
+                    priority=priority
+                )
+            except Exception as e:
+                logger.error(f"Error generating embeddings: {e}")
+                generated = [[] for _ in missing]
             
-            if norm1 == 0 or norm2 == 0:
-                return 0.0
-                
-            return dot_product / (norm1 * norm2)
-        except Exception as e:
-            logger.error(f"Error calculating similarity: {e}")
-            return 0.0
+            fresh = dict(zip(missing.keys(), generated))
+            # Failures are not cached so they are retried next time
+            embedding_cache.set_many({key: embedding for key, embedding in fresh.items() if embedding})
+            cached.update(fresh)
+        
+        return [list(cached.get(key) or []) for key in keys]
+    
+    @staticmethod
+    def _rank_by_similarity(query_embedding: List[float], rows: List[Tuple[int, List[float]]], limit: int) -> List[Tuple[int, float]]:
+        """Rank (id, embedding) rows by cosine similarity using one matrix-vector product."""
+        dimension = len(query_embedding)
+        rows = [(item_id, embedding) for item_id, embedding in rows if embedding and len(embedding) == dimension]
+        if not rows:
+            return []
+        
+        ids = np.fromiter((item_id for item_id, _ in rows), dtype=np.int64, count=len(rows))
+        matrix = np.asarray([embedding for _, embedding in rows], dtype=np.float32)
+        top, scores = cosine_top_k(query_embedding, matrix, np.linalg.norm(matrix, axis=1), limit)
+        return [(int(ids[i]), float(score)) for i, score in zip(top, scores)]
     
     @staticmethod
     async def create_connection(
@@ -260,6 +732,11 @@ class KnowledgeService:
         db.add(connection)
         db.commit()
         db.refresh(connection)
+        
+        graph_cache.add_connection(
+            (connection.id, source_id, target_id, relationship_type, strength),
+            [source.repository_id, target.repository_id]
+        )
         return connection
     
     @staticmethod
@@ -268,20 +745,27 @@ class KnowledgeService:
         user_id: int,
         repository_id: Optional[int] = None,
         central_item_id: Optional[int] = None,
-        depth: int = 2
+        depth: int = 2,
+        max_nodes: Optional[int] = None
     ) -> Dict[str, Any]:
-        """Get knowledge graph data for visualization."""
-        # Get accessible repositories
-        accessible_repos = await KnowledgeService.get_repositories(db, user_id)
-        accessible_repo_ids = [repo.id for repo in accessible_repos]
+        """
+        Get knowledge graph data for visualization.
+        Around a central item, traversal stops once `max_nodes` nodes have been collected.
+        """
+        # Get accessible repositories, filtered by repository if specified
+        repo_ids = await KnowledgeService._resolve_repository_ids(db, user_id, repository_id)
+        max_nodes = max_nodes or GRAPH_MAX_NODES
         
-        if repository_id and repository_id not in accessible_repo_ids:
-            raise HTTPException(status_code=403, detail="You don't have access to this repository")
+        # Serve from the in-memory adjacency cache when enabled
+        if GRAPH_CACHE_ENABLED:
+            graphs = [graph_cache.get(db, repo_id) for repo_id in repo_ids]
+            if not central_item_id:
+                return full_graph(graphs)
+            if not any(central_item_id in graph.nodes for graph in graphs):
+                raise HTTPException(status_code=404, detail="Central knowledge item not found or not accessible")
+            return neighbourhood(graphs, central_item_id, depth, max_nodes)
         
-        # Filter by repository if specified
-        repo_filter = KnowledgeItem.repository_id.in_(accessible_repo_ids)
-        if repository_id:
-            repo_filter = KnowledgeItem.repository_id == repository_id
+        repo_filter = KnowledgeItem.repository_id.in_(repo_ids)
         
         # Get all items and connections
         if central_item_id:
@@ -295,10 +779,10 @@ class KnowledgeService:
                 raise HTTPException(status_code=404, detail="Central knowledge item not found or not accessible")
             
             # Get connected items up to specified depth
-            items, connections = KnowledgeService._get_connected_items(db, central_item, depth)
+            items, connections = KnowledgeService._get_connected_items(db, central_item, depth, repo_ids, max_nodes)
         else:
             # Get all items in the repository/repositories
-            items = db.query(KnowledgeItem).filter(repo_filter).all()
+            items = db.query(KnowledgeItem).options(selectinload(KnowledgeItem.tags)).filter(repo_filter).all()
             
             # Get all connections between these items
             item_ids = [item.id for item in items]
@@ -333,48 +817,206 @@ class KnowledgeService:
         }
     
     @staticmethod
-    def _get_connected_items(db: Session, central_item: KnowledgeItem, depth: int) -> tuple:
-        """Get items connected to the central item up to specified depth."""
-        items = set([central_item])
-        connections = set()
+    async def get_graph_etag(
+        db: Session,
+        user_id: int,
+        repository_id: Optional[int] = None,
+        central_item_id: Optional[int] = None,
+        depth: int = 2,
+        max_nodes: Optional[int] = None
+    ) -> Optional[str]:
+        """
+        ETag for a get_knowledge_graph response, derived from the cached graph versions.
+        Returns None when the graph cache is disabled or the repository is not accessible.
+        """
+        if not GRAPH_CACHE_ENABLED:
+            return None
+        
+        accessible_repo_ids = KnowledgeService.get_accessible_repository_ids(db, user_id)
+        if repository_id and repository_id not in accessible_repo_ids:
+            return None
+        
+        repo_ids = [repository_id] if repository_id else sorted(accessible_repo_ids)
+        graphs = [graph_cache.get(db, repo_id) for repo_id in repo_ids]
+        return KnowledgeGraphCache.etag(graphs, central_item_id, depth, max_nodes or GRAPH_MAX_NODES)
+    
+    @staticmethod
+    async def export_knowledge_graph(db: Session, user_id: int, repository_id: Optional[int] = None) -> Iterator[str]:
+        """
+        Export a graph as NDJSON lines: every node ({"type": "node", "node": {...}}) then every
+        edge ({"type": "edge", "edge": {...}}).
+        Access is checked up front; the returned generator streams rows from its own session.
+        """
+        repo_ids = await KnowledgeService._resolve_repository_ids(db, user_id, repository_id)
+        return KnowledgeService._graph_export_lines(repo_ids)
+    
+    @staticmethod
+    def _graph_export_lines(repo_ids: List[int]) -> Iterator[str]:
+        db = SessionLocal()
+        try:
+            items = select(
+                KnowledgeItem.id, KnowledgeItem.title, KnowledgeItem.content_type, KnowledgeItem.importance
+            ).where(KnowledgeItem.repository_id.in_(repo_ids)).order_by(KnowledgeItem.id)
+            yield from export_lines(
+                db,
+                items,
+                KnowledgeService._graph_edges_query(db, repo_ids).statement,
+                lambda item_ids: KnowledgeService._tag_names(item_ids, db),
+                GRAPH_EXPORT_BATCH_SIZE
+            )
+        finally:
+            db.close()
+    
+    @staticmethod
+    async def get_graph_nodes_page(
+        db: Session,
+        user_id: int,
+        repository_id: Optional[int] = None,
+        cursor: Optional[int] = None,
+        limit: int = 1000
+    ) -> Dict[str, Any]:
+        """One page of graph nodes ordered by id. Pass `next_cursor` back as `cursor` for the next page."""
+        repo_ids = await KnowledgeService._resolve_repository_ids(db, user_id, repository_id)
+        items = db.query(
+            KnowledgeItem.id, KnowledgeItem.title, KnowledgeItem.content_type, KnowledgeItem.importance
+        ).filter(KnowledgeItem.repository_id.in_(repo_ids))
+        if cursor is not None:
+            items = items.filter(KnowledgeItem.id > cursor)
+        rows = items.order_by(KnowledgeItem.id).limit(limit).all()
+        
+        tags = KnowledgeService._tag_names([row.id for row in rows], db)
+        return {
+            "nodes": [
+                node_payload(item_id, title, content_type, importance, tags.get(item_id, []))
+                for item_id, title, content_type, importance in rows
+            ],
+            "next_cursor": rows[-1].id if len(rows) == limit else None
+        }
+    
+    @staticmethod
+    async def get_graph_edges_page(
+        db: Session,
+        user_id: int,
+        repository_id: Optional[int] = None,
+        cursor: Optional[int] = None,
+        limit: int = 1000
+    ) -> Dict[str, Any]:
+        """One page of graph edges ordered by connection id. Pass `next_cursor` back as `cursor` for the next page."""
+        repo_ids = await KnowledgeService._resolve_repository_ids(db, user_id, repository_id)
+        edges = KnowledgeService._graph_edges_query(db, repo_ids)
+        if cursor is not None:
+            edges = edges.filter(KnowledgeConnection.id > cursor)
+        rows = edges.limit(limit).all()
+        return {
+            "edges": [edge_payload(tuple(row)) for row in rows],
+            "next_cursor": rows[-1].id if len(rows) == limit else None
+        }
+    
+    @staticmethod
+    async def _resolve_repository_ids(db: Session, user_id: int, repository_id: Optional[int]) -> List[int]:
+        """The requested repository, or every accessible one; 403 if the requested one is not accessible."""
+        accessible_repo_ids = KnowledgeService.get_accessible_repository_ids(db, user_id)
+        if repository_id:
+            if repository_id not in accessible_repo_ids:
+                raise HTTPException(status_code=403, detail="You don't have access to this repository")
+            return [repository_id]
+        return sorted(accessible_repo_ids)
+    
+    @staticmethod
+    def _graph_edges_query(db: Session, repo_ids: List[int]):
+        """Connections whose endpoints both lie in the given repositories, ordered by id."""
+        source = aliased(KnowledgeItem)
+        target = aliased(KnowledgeItem)
+        return db.query(
+            KnowledgeConnection.id,
+            KnowledgeConnection.source_id,
+            KnowledgeConnection.target_id,
+            KnowledgeConnection.relationship_type,
+            KnowledgeConnection.strength
+        ).join(
+            source, source.id == KnowledgeConnection.source_id
+        ).join(
+            target, target.id == KnowledgeConnection.target_id
+        ).filter(
+            source.repository_id.in_(repo_ids),
+            target.repository_id.in_(repo_ids)
+        ).order_by(KnowledgeConnection.id)
+    
+    @staticmethod
+    def _tag_names(item_ids: List[int], db: Session) -> Dict[int, List[str]]:
+        """Tag names for a batch of items, in one query."""
+        tags: Dict[int, List[str]] = {}
+        if not item_ids:
+            return tags
+        rows = db.query(knowledge_item_tags.c.knowledge_item_id, KnowledgeTag.name).join(
+            KnowledgeTag, KnowledgeTag.id == knowledge_item_tags.c.tag_id
+        ).filter(knowledge_item_tags.c.knowledge_item_id.in_(item_ids))
+        for item_id, name in rows:
+            tags.setdefault(item_id, []).append(name)
+        return tags
+    
+    @staticmethod
+    def _get_connected_items(
+        db: Session,
+        central_item: KnowledgeItem,
+        depth: int,
+        repo_ids: List[int],
+        max_nodes: int
+    ) -> tuple:
+        """
+        Get items connected to the central item up to specified depth.
+        Breadth-first, one connection query and one item query per level. Neighbours outside
+        `repo_ids` are skipped, and at most `max_nodes` items are returned (strongest edges first).
+        """
+        items = {central_item.id: central_item}
+        connections = {}
         
         # Process items level by level
         current_level = {central_item.id}
         for _ in range(depth):
-            next_level = set()
+            if not current_level or len(items) >= max_nodes:
+                break
             
-            # Get all connections from current level
-            for item_id in current_level:
-                # Outgoing connections
-                outgoing = db.query(KnowledgeConnection).filter(
-                    KnowledgeConnection.source_id == item_id
-                ).all()
-                
-                for conn in outgoing:
-                    connections.add(conn)
-                    target = db.query(KnowledgeItem).filter(KnowledgeItem.id == conn.target_id).first()
-                    if target:
-                        items.add(target)
-                        next_level.add(target.id)
-                
-                # Incoming connections
-                incoming = db.query(KnowledgeConnection).filter(
-                    KnowledgeConnection.target_id == item_id
-                ).all()
-                
-                for conn in incoming:
-                    connections.add(conn)
-                    source = db.query(KnowledgeItem).filter(KnowledgeItem.id == conn.source_id).first()
-                    if source:
-                        items.add(source)
-                        next_level.add(source.id)
+            # Outgoing and incoming connections of the whole level at once
+            level_connections = db.query(KnowledgeConnection).filter(or_(
+                KnowledgeConnection.source_id.in_(current_level),
+                KnowledgeConnection.target_id.in_(current_level)
+            )).all()
+            level_connections.sort(key=lambda conn: conn.strength or 0.0, reverse=True)
             
-            # Update current level for next iteration
-            current_level = next_level
-            if not current_level:
+            candidates = []
+            seen = set(items)
+            for conn in level_connections:
+                connections[conn.id] = conn
+                for neighbour_id in (conn.source_id, conn.target_id):
+                    if neighbour_id not in seen:
+                        seen.add(neighbour_id)
+                        candidates.append(neighbour_id)
+            if not candidates:
                 break
+            
+            # Load the level's items (and their tags) in bulk, keeping the strongest within the cap
+            loaded = {
+                item.id: item
+                for item in db.query(KnowledgeItem).options(selectinload(KnowledgeItem.tags)).filter(
+                    KnowledgeItem.id.in_(candidates),
+                    KnowledgeItem.repository_id.in_(repo_ids)
+                )
+            }
+            current_level = set()
+            for item_id in candidates:
+                if len(items) >= max_nodes:
+                    break
+                if item_id in loaded:
+                    items[item_id] = loaded[item_id]
+                    current_level.add(item_id)
         
-        return list(items), list(connections)
+        # Only keep edges between returned nodes
+        edges = [
+            conn for conn in connections.values()
+            if conn.source_id in items and conn.target_id in items
+        ]
+        return list(items.values()), edges
 
 
 class DocumentService:
@@ -382,6 +1024,10 @@ class DocumentService:
     
     ALLOWED_EXTENSIONS = {'pdf', 'docx', 'txt', 'md', 'csv', 'json'}
     UPLOAD_DIR = "uploads/documents"
+    MAX_UPLOAD_BYTES = int(os.getenv("DOCUMENT_MAX_UPLOAD_MB", "50")) * 1024 * 1024
+    UPLOAD_CHUNK_SIZE = 1024 * 1024
+    # Chunks embedded and committed per round trip
+    CHUNK_BATCH_SIZE = int(os.getenv("DOCUMENT_CHUNK_BATCH_SIZE", "128"))
     
     @staticmethod
     async def upload_document(
@@ -395,19 +1041,22 @@ class DocumentService:
         if extension not in DocumentService.ALLOWED_EXTENSIONS:
             raise HTTPException(status_code=400, detail=f"File type not allowed. Allowed types: {', '.join(DocumentService.ALLOWED_EXTENSIONS)}")
         
-        # Ensure upload directory exists
-        os.makedirs(DocumentService.UPLOAD_DIR, exist_ok=True)
-        
-        # Generate unique filename
-        timestamp = datetime.now().strftime("%Y%m%d%H%M%S")
-        unique_filename = f"{timestamp}_{file.filename}"
-        file_path = os.path.join(DocumentService.UPLOAD_DIR, unique_filename)
+        # Stream the upload to disk, hashing and counting as we go
+        file_path, content_hash, file_size = await DocumentService._store_upload(file, extension)
         
-        # Save file
-        with open(file_path, "wb") as buffer:
-            content = await file.read()
-            buffer.write(content)
-            file_size = len(content)
+        # Identical content from the same uploader is processed only once
+        existing = db.query(Document).filter(
+            Document.uploader_id == uploader_id,
+            Document.content_hash == content_hash
+        ).order_by(Document.id.desc()).first()
+        if existing:
+            if existing.processing_status == "failed":
+                existing.processing_status = "queued"
+                existing.processing_attempts = 0
+                db.commit()
+                db.refresh(existing)
+                await document_queue.enqueue(existing.id)
+            return existing
         
         # Create document record
         document = Document(
@@ -415,23 +1064,78 @@ class DocumentService:
             file_path=file_path,
             file_type=extension,
             file_size=file_size,
+            content_hash=content_hash,
             uploader_id=uploader_id
         )
         
+        document.processing_status = "queued"
         db.add(document)
         db.commit()
         db.refresh(document)
         
-        # Queue document for processing
-        # In a production system, this would be handled by a background task
-        # For now, we'll process it synchronously
-        await DocumentService.process_document(db, document.id)
+        # Hand the document to the background workers; clients poll its status
+        await document_queue.enqueue(document.id)
         
         return document
     
+    @staticmethod
+    async def _store_upload(file: UploadFile, extension: str) -> Tuple[str, str, int]:
+        """
+        Copy an upload to content-addressed storage in fixed-size chunks.
+        Returns (file path, sha256 hex digest, size in bytes). Uploads over MAX_UPLOAD_BYTES
+        are rejected with 413 as soon as the limit is crossed. Disk I/O runs on worker threads.
+        """
+        await asyncio.to_thread(os.makedirs, DocumentService.UPLOAD_DIR, exist_ok=True)
+        digest = hashlib.sha256()
+        file_size = 0
+        
+        buffer = await asyncio.to_thread(
+            tempfile.NamedTemporaryFile, dir=DocumentService.UPLOAD_DIR, suffix=".part", delete=False
+        )
+        try:
+            while True:
+                chunk = await file.read(DocumentService.UPLOAD_CHUNK_SIZE)
+                if not chunk:
+                    break
+                file_size += len(chunk)
+                if file_size > DocumentService.MAX_UPLOAD_BYTES:
+                    raise HTTPException(
+                        status_code=413,
+                        detail=f"File exceeds the {DocumentService.MAX_UPLOAD_BYTES // (1024 * 1024)} MB upload limit"
+                    )
+                digest.update(chunk)
+                await asyncio.to_thread(buffer.write, chunk)
+            await asyncio.to_thread(buffer.close)
+        except BaseException:
+            await asyncio.to_thread(DocumentService._discard_upload, buffer)
+            raise
+        
+        content_hash = digest.hexdigest()
+        file_path = os.path.join(DocumentService.UPLOAD_DIR, content_hash[:2], f"{content_hash}.{extension}")
+        await asyncio.to_thread(DocumentService._move_upload, buffer.name, file_path)
+        
+        return file_path, content_hash, file_size
+    
+    @staticmethod
+    def _discard_upload(buffer) -> None:
+        buffer.close()
+        os.remove(buffer.name)
+    
+    @staticmethod
+    def _move_upload(temp_path: str, file_path: str) -> None:
+        """Move a finished upload into place; content already stored is kept and the copy dropped."""
+        if os.path.exists(file_path):
+            os.remove(temp_path)
+        else:
+            os.makedirs(os.path.dirname(file_path), exist_ok=True)
+            os.replace(temp_path, file_path)
+    
     @staticmethod
     async def process_document(db: Session, document_id: int) -> Document:
-        """Process a document and extract knowledge items."""
+        """
+        Process a document and extract knowledge items.
+        Runs on the document queue workers; errors are raised for the queue to record and retry.
+        """
         document = db.query(Document).filter(Document.id == document_id).first()
         
         if not document:
@@ -439,11 +1143,12 @@ class DocumentService:
         
         # Update status
         document.processing_status = "processing"
+        document.processing_attempts = (document.processing_attempts or 0) + 1
         db.commit()
         
         try:
-            # Extract text based on file type
-            text = await DocumentService._extract_text(document.file_path, document.file_type)
+            # Drop chunks left behind by an earlier, interrupted attempt
+            DocumentService._clear_chunks(db, document)
             
             # Create a default repository for the user if none exists
             from app.models.models import User
@@ -463,87 +1168,97 @@ class DocumentService:
                     is_public=False
                 )
             
-            # Create knowledge item for the document
-            knowledge_item = await KnowledgeService.create_knowledge_item(
-                db=db,
-                repository_id=default_repo.id,
-                title=document.filename,
-                content=text,
-                creator_id=document.uploader_id,
-                content_type="document",
-                source_type="document",
-                metadata={
-                    "document_id": document.id,
-                    "file_type": document.file_type,
-                    "file_size": document.file_size
-                }
-            )
+            # Stream extracted text through the chunker and store each chunk as its own item,
+            # embedding and committing CHUNK_BATCH_SIZE chunks at a time
+            chunker = TextChunker()
+            remainder = ""
+            pending: List[str] = []
+            chunk_count = 0
+            async for segment in iter_document_text(document.file_path, document.file_type):
+                chunks, remainder = chunker.split_partial(remainder + segment)
+                pending.extend(chunks)
+                while len(pending) >= DocumentService.CHUNK_BATCH_SIZE:
+                    batch = pending[:DocumentService.CHUNK_BATCH_SIZE]
+                    pending = pending[DocumentService.CHUNK_BATCH_SIZE:]
+                    await DocumentService._store_chunks(db, document, default_repo.id, batch, chunk_count)
+                    chunk_count += len(batch)
             
-            # Link document to knowledge item
-            document.knowledge_items.append(knowledge_item)
+            chunks, _ = chunker.split_partial(remainder, final=True)
+            pending.extend(chunks)
+            if pending:
+                await DocumentService._store_chunks(db, document, default_repo.id, pending, chunk_count)
             
             # Update document status
             document.processed = True
             document.processing_status = "completed"
+            document.processing_error = None
             db.commit()
             db.refresh(document)
             
             return document
         except Exception as e:
-            logger.error(f"Error processing document: {e}")
-            document.processing_status = "failed"
-            db.commit()
-            raise HTTPException(status_code=500, detail=f"Error processing document: {str(e)}")
+            logger.error(f"Error processing document {document_id}: {e}")
+            raise
     
     @staticmethod
-    async def _extract_text(file_path: str, file_type: str) -> str:
-        """Extract text from a document based on its type."""
-        if file_type == 'txt' or file_type == 'md':
-            with open(file_path, 'r', encoding='utf-8') as f:
-                return f.read()
-        
-        elif file_type == 'pdf':
-            try:
-                import PyPDF2
-                text = ""
-                with open(file_path, 'rb') as f:
-                    pdf_reader = PyPDF2.PdfReader(f)
-                    for page_num in range(len(pdf_reader.pages)):
-                        text += pdf_reader.pages[page_num].extract_text() + "\n\n"
-                return text
-            except ImportError:
-                return "PDF extraction requires PyPDF2 library. Please install it."
-        
-        elif file_type == 'docx':
-            try:
-                import docx
-                doc = docx.Document(file_path)
-                return "\n\n".join([para.text for para in doc.paragraphs])
-            except ImportError:
-                return "DOCX extraction requires python-docx library. Please install it."
-        
-        elif file_type == 'csv':
-            try:
-                import csv
-                text = ""
-                with open(file_path, 'r', encoding='utf-8') as f:
-                    csv_reader = csv.reader(f)
-                    for row in csv_reader:
-                        text += ",".join(row) + "\n"
-                return text
-            except Exception as e:
-                return f"Error extracting CSV: {str(e)}"
+    async def _store_chunks(db: Session, document: Document, repository_id: int, chunks: List[str], first_index: int) -> None:
+        """Embed and store a batch of consecutive chunks, linked to their document."""
+        await KnowledgeService.create_knowledge_items(
+            db=db,
+            items=[
+                {
+                    "repository_id": repository_id,
+                    "title": f"{document.filename} (part {chunk_index + 1})",
+                    "content": chunk,
+                    "content_type": "document_chunk",
+                    "source_type": "document",
+                    "metadata": {
+                        "document_id": document.id,
+                        "chunk_index": chunk_index,
+                        "file_type": document.file_type
+                    }
+                }
+                for chunk_index, chunk in enumerate(chunks, start=first_index)
+            ],
+            creator_id=document.uploader_id,
+            document_id=document.id
+        )
+    
+    @staticmethod
+    def _clear_chunks(db: Session, document: Document) -> None:
+        """
+        Delete the knowledge items linked to a document so it can be processed again,
+        together with their connections, citations and tag, agent and document links.
+        """
+        rows = db.query(KnowledgeItem.id, KnowledgeItem.repository_id).join(
+            document_knowledge_items, document_knowledge_items.c.knowledge_item_id == KnowledgeItem.id
+        ).filter(document_knowledge_items.c.document_id == document.id).all()
+        if not rows:
+            return
         
-        elif file_type == 'json':
-            try:
-                import json
-                with open(file_path, 'r', encoding='utf-8') as f:
-                    data = json.load(f)
-                return json.dumps(data, indent=2)
-            except Exception as e:
-                return f"Error extracting JSON: {str(e)}"
+        item_ids = [item_id for item_id, _ in rows]
+        db.query(KnowledgeConnection).filter(or_(
+            KnowledgeConnection.source_id.in_(item_ids),
+            KnowledgeConnection.target_id.in_(item_ids)
+        )).delete(synchronize_session=False)
+        db.query(Citation).filter(Citation.knowledge_item_id.in_(item_ids)).delete(synchronize_session=False)
+        db.query(WebSearchResult).filter(WebSearchResult.knowledge_item_id.in_(item_ids)).update(
+            {WebSearchResult.knowledge_item_id: None, WebSearchResult.added_to_knowledge: False},
+            synchronize_session=False
+        )
+        db.execute(knowledge_item_tags.delete().where(knowledge_item_tags.c.knowledge_item_id.in_(item_ids)))
+        db.execute(knowledge_item_agents.delete().where(knowledge_item_agents.c.knowledge_item_id.in_(item_ids)))
+        db.execute(document_knowledge_items.delete().where(document_knowledge_items.c.knowledge_item_id.in_(item_ids)))
+        db.query(KnowledgeItem).filter(KnowledgeItem.id.in_(item_ids)).delete(synchronize_session=False)
+        db.commit()
         
-        return f"Unsupported file type: {file_type}"
+        if not KnowledgeService.uses_pgvector(db):
+            by_repository: Dict[int, List[int]] = {}
+            for item_id, repository_id in rows:
+                by_repository.setdefault(repository_id, []).append(item_id)
+            for repository_id, ids in by_repository.items():
+                vector_indexes.remove_items(db, repository_id, ids)
+        graph_cache.remove_items(item_ids)
 
 
 class WebResearchService:
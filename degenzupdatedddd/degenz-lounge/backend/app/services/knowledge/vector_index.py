@@ -0,0 +1,485 @@
+"""
+Vector indexes for the Knowledge Management System in DeGeNz Lounge.
+This module provides in-process approximate nearest neighbour indexes that are kept per repository,
+updated incrementally and persisted to disk.
+"""
+
+import os
+import logging
+import threading
+from typing import Dict, List, Optional, Tuple, Iterable, Set, Type
+
+import numpy as np
+from sqlalchemy import func
+from sqlalchemy.orm import Session
+
+# Initialize logging
+logger = logging.getLogger(__name__)
+
+
+def cosine_top_k(query: np.ndarray, matrix: np.ndarray, norms: np.ndarray, k: int) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    Score every row of `matrix` against `query` with a single matrix-vector product.
+    `norms` are the precomputed row norms. Returns (row positions, scores) of the top k rows, best first.
+    """
+    query = np.asarray(query, dtype=np.float32)
+    query_norm = np.linalg.norm(query)
+    if not matrix.shape[0] or k <= 0 or query_norm == 0:
+        return np.empty(0, dtype=np.int64), np.empty(0, dtype=np.float32)
+
+    denominators = norms * query_norm
+    scores = np.divide(matrix @ query, denominators, out=np.zeros_like(norms), where=denominators > 0)
+
+    k = min(k, scores.shape[0])
+    top = np.argpartition(-scores, k - 1)[:k]
+    top = top[np.argsort(-scores[top])]
+    return top, scores[top]
+
+
+class VectorIndex:
+    """
+    Exact (brute force) cosine index over a contiguous float32 matrix.
+
+    Rows live in preallocated buffers whose capacity doubles when full, with an id -> row map:
+    replacing a vector updates its row in place and removing one moves the last row into the gap,
+    so updates cost O(batch) rather than a copy of the whole index.
+    """
+
+    kind = "flat"
+    INITIAL_CAPACITY = 64
+
+    def __init__(self, dimension: Optional[int] = None):
+        self.dimension = dimension
+        self._size = 0
+        self._rows: Dict[int, int] = {}
+        self._id_buffer = np.empty(0, dtype=np.int64)
+        self._vector_buffer = np.empty((0, dimension or 0), dtype=np.float32)
+        self._norm_buffer = np.empty(0, dtype=np.float32)
+
+    def __len__(self) -> int:
+        return self._size
+
+    @property
+    def _ids(self) -> np.ndarray:
+        return self._id_buffer[:self._size]
+
+    @property
+    def _vectors(self) -> np.ndarray:
+        return self._vector_buffer[:self._size]
+
+    @property
+    def _norms(self) -> np.ndarray:
+        return self._norm_buffer[:self._size]
+
+    @property
+    def max_id(self) -> int:
+        """Largest item id stored in the index (0 when empty)."""
+        return int(self._ids.max()) if len(self) else 0
+
+    def add(self, ids: Iterable[int], embeddings: Iterable[List[float]]) -> int:
+        """Add or replace vectors. Returns the number of vectors added."""
+        ids = list(ids)
+        rows = []
+        kept_ids = []
+        for item_id, embedding in zip(ids, embeddings):
+            if not embedding:
+                continue
+            if self.dimension is None:
+                self.dimension = len(embedding)
+                self._vector_buffer = np.empty((self._id_buffer.shape[0], self.dimension), dtype=np.float32)
+            if len(embedding) != self.dimension:
+                logger.warning(
+                    f"Skipping item {item_id}: embedding has {len(embedding)} dimensions, index has {self.dimension}"
+                )
+                continue
+            rows.append(embedding)
+            kept_ids.append(int(item_id))
+
+        if not rows:
+            return 0
+
+        # Adding an id that already exists replaces its vector in place
+        self._reserve(self._size + len(kept_ids))
+        positions = np.empty(len(kept_ids), dtype=np.int64)
+        for i, item_id in enumerate(kept_ids):
+            row = self._rows.get(item_id)
+            if row is None:
+                row = self._rows[item_id] = self._size
+                self._id_buffer[row] = item_id
+                self._size += 1
+            positions[i] = row
+
+        vectors = np.asarray(rows, dtype=np.float32)
+        self._vector_buffer[positions] = vectors
+        self._norm_buffer[positions] = np.linalg.norm(vectors, axis=1)
+        self._on_add(positions, vectors)
+        return len(kept_ids)
+
+    def remove(self, ids: Iterable[int]) -> int:
+        """Remove vectors by item id. Returns the number of vectors removed."""
+        removed = 0
+        for item_id in ids:
+            row = self._rows.pop(int(item_id), None)
+            if row is None:
+                continue
+            last = self._size - 1
+            if row != last:
+                moved_id = int(self._id_buffer[last])
+                self._id_buffer[row] = moved_id
+                self._vector_buffer[row] = self._vector_buffer[last]
+                self._norm_buffer[row] = self._norm_buffer[last]
+                self._rows[moved_id] = row
+                self._on_move(last, row)
+            self._size = last
+            removed += 1
+        return removed
+
+    def _reserve(self, size: int) -> None:
+        """Grow the buffers, doubling their capacity, so they hold at least `size` rows."""
+        capacity = self._id_buffer.shape[0]
+        if size <= capacity:
+            return
+        capacity = max(size, 2 * capacity, self.INITIAL_CAPACITY)
+        self._id_buffer = self._grow(self._id_buffer, capacity)
+        self._vector_buffer = self._grow(self._vector_buffer, capacity)
+        self._norm_buffer = self._grow(self._norm_buffer, capacity)
+        self._on_reserve(capacity)
+
+    def _grow(self, buffer: np.ndarray, capacity: int) -> np.ndarray:
+        grown = np.empty((capacity,) + buffer.shape[1:], dtype=buffer.dtype)
+        used = min(self._size, buffer.shape[0])
+        grown[:used] = buffer[:used]
+        return grown
+
+    def search(
+        self,
+        query: List[float],
+        k: int = 10,
+        nprobe: Optional[int] = None,
+        candidate_ids: Optional[Set[int]] = None
+    ) -> List[Tuple[int, float]]:
+        """Return up to k (item_id, cosine similarity) pairs, best first."""
+        if not len(self) or not query or len(query) != self.dimension:
+            return []
+
+        query = np.asarray(query, dtype=np.float32)
+        rows = self._probe_rows(query, nprobe)
+        if candidate_ids is not None:
+            candidates = np.fromiter(
+                (self._rows[item_id] for item_id in candidate_ids if item_id in self._rows), dtype=np.int64
+            )
+            candidates.sort()
+            # A selective filter is cheaper to score exactly than to probe, and keeps full recall
+            if rows is None or candidates.shape[0] <= rows.shape[0]:
+                rows = candidates
+            else:
+                rows = np.intersect1d(rows, candidates, assume_unique=True)
+
+        return self._score_rows(query, rows, k)
+
+    def _probe_rows(self, query: np.ndarray, nprobe: Optional[int]) -> Optional[np.ndarray]:
+        """Rows to score for a query, or None for all rows."""
+        return None
+
+    def _score_rows(self, query: np.ndarray, rows: Optional[np.ndarray], k: int) -> List[Tuple[int, float]]:
+        """Score the given rows against the query and return the top k."""
+        vectors = self._vectors if rows is None else self._vectors[rows]
+        norms = self._norms if rows is None else self._norms[rows]
+        ids = self._ids if rows is None else self._ids[rows]
+
+        top, scores = cosine_top_k(query, vectors, norms, k)
+        return [(int(ids[i]), float(score)) for i, score in zip(top, scores)]
+
+    def _on_add(self, rows: np.ndarray, vectors: np.ndarray) -> None:
+        """Hook for subclasses to maintain auxiliary structures after `rows` were written."""
+
+    def _on_move(self, source: int, target: int) -> None:
+        """Hook for subclasses to maintain auxiliary structures when a row is moved by a remove."""
+
+    def _on_reserve(self, capacity: int) -> None:
+        """Hook for subclasses to grow auxiliary per-row buffers."""
+
+    def _state(self) -> Dict[str, np.ndarray]:
+        return {"ids": self._ids, "vectors": self._vectors}
+
+    def _restore(self, state: Dict[str, np.ndarray]) -> None:
+        self._id_buffer = state["ids"].astype(np.int64)
+        self._vector_buffer = state["vectors"].astype(np.float32)
+        self._size = int(self._id_buffer.shape[0])
+        self._rows = {int(item_id): row for row, item_id in enumerate(self._id_buffer)}
+        self._norm_buffer = (
+            np.linalg.norm(self._vector_buffer, axis=1) if self._size else np.empty(0, dtype=np.float32)
+        ).astype(np.float32)
+        self.dimension = (
+            int(self._vector_buffer.shape[1]) if self._vector_buffer.ndim == 2 and self._vector_buffer.shape[1] else None
+        )
+        self._on_reserve(self._size)
+
+    def save(self, path: str) -> None:
+        """Persist the index to disk."""
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        tmp_path = f"{path}.tmp.npz"
+        np.savez(tmp_path, kind=np.array(self.kind), **self._state())
+        os.replace(tmp_path, path)
+
+    @classmethod
+    def load(cls, path: str) -> "VectorIndex":
+        """Load an index from disk."""
+        with np.load(path, allow_pickle=False) as data:
+            state = {key: data[key] for key in data.files}
+        index_cls = INDEX_TYPES.get(str(state.pop("kind", cls.kind)), cls)
+        index = index_cls()
+        index._restore(state)
+        return index
+
+
+class IVFFlatIndex(VectorIndex):
+    """
+    Inverted-file index: vectors are clustered with spherical k-means and a query only scores
+    the vectors in its `nprobe` closest clusters. Raising `nprobe` trades latency for recall.
+    """
+
+    kind = "ivf_flat"
+
+    def __init__(
+        self,
+        dimension: Optional[int] = None,
+        train_threshold: int = int(os.getenv("KNOWLEDGE_IVF_TRAIN_THRESHOLD", "4096")),
+        default_nprobe: int = int(os.getenv("KNOWLEDGE_IVF_NPROBE", "8"))
+    ):
+        super().__init__(dimension)
+        self.train_threshold = train_threshold
+        self.default_nprobe = default_nprobe
+        self._centroids: Optional[np.ndarray] = None
+        self._assignment_buffer = np.empty(0, dtype=np.int32)
+        self._trained_size = 0
+
+    @property
+    def _assignments(self) -> np.ndarray:
+        return self._assignment_buffer[:self._size]
+
+    @property
+    def is_trained(self) -> bool:
+        return self._centroids is not None
+
+    def train(self, iterations: int = 10, seed: int = 0) -> None:
+        """(Re)build the coarse quantizer from the vectors currently in the index."""
+        if not len(self):
+            return
+        unit = self._unit_vectors(self._vectors, self._norms)
+        n_lists = int(np.clip(np.sqrt(len(self)), 1, 4096))
+
+        rng = np.random.default_rng(seed)
+        sample_size = min(len(self), n_lists * 64)
+        sample = unit[rng.choice(len(self), size=sample_size, replace=False)]
+        centroids = sample[rng.choice(sample_size, size=n_lists, replace=False)].copy()
+
+        for _ in range(iterations):
+            labels = np.argmax(sample @ centroids.T, axis=1)
+            sums = np.zeros_like(centroids)
+            np.add.at(sums, labels, sample)
+            norms = np.linalg.norm(sums, axis=1)
+            # Empty clusters keep their previous centroid
+            filled = norms > 0
+            centroids[filled] = sums[filled] / norms[filled, None]
+
+        self._centroids = centroids.astype(np.float32)
+        self._assignment_buffer[:self._size] = self._assign(unit)
+        self._trained_size = len(self)
+        logger.info(f"Trained IVF index with {n_lists} lists over {len(self)} vectors")
+
+    def _probe_rows(self, query: np.ndarray, nprobe: Optional[int]) -> Optional[np.ndarray]:
+        nprobe = nprobe or self.default_nprobe
+        if not self.is_trained or nprobe >= self._centroids.shape[0]:
+            return None
+        centroid_scores = self._centroids @ query
+        probe_lists = np.argpartition(-centroid_scores, nprobe - 1)[:nprobe]
+        return np.flatnonzero(np.isin(self._assignments, probe_lists))
+
+    def _on_add(self, rows: np.ndarray, vectors: np.ndarray) -> None:
+        if self.is_trained:
+            norms = np.linalg.norm(vectors, axis=1)
+            self._assignment_buffer[rows] = self._assign(self._unit_vectors(vectors, norms))
+
+        # Retrain once the index has doubled since the last training so clusters stay balanced
+        if len(self) >= max(self.train_threshold, 2 * self._trained_size):
+            self.train()
+
+    def _on_move(self, source: int, target: int) -> None:
+        self._assignment_buffer[target] = self._assignment_buffer[source]
+
+    def _on_reserve(self, capacity: int) -> None:
+        if self._assignment_buffer.shape[0] < capacity:
+            self._assignment_buffer = self._grow(self._assignment_buffer, capacity)
+
+    def _assign(self, unit_vectors: np.ndarray) -> np.ndarray:
+        return np.argmax(unit_vectors @ self._centroids.T, axis=1).astype(np.int32)
+
+    @staticmethod
+    def _unit_vectors(vectors: np.ndarray, norms: np.ndarray) -> np.ndarray:
+        return np.divide(vectors, norms[:, None], out=np.zeros_like(vectors), where=norms[:, None] > 0)
+
+    def _state(self) -> Dict[str, np.ndarray]:
+        state = super()._state()
+        if self.is_trained:
+            state["centroids"] = self._centroids
+            state["assignments"] = self._assignments
+            state["trained_size"] = np.array(self._trained_size)
+        return state
+
+    def _restore(self, state: Dict[str, np.ndarray]) -> None:
+        super()._restore(state)
+        if "centroids" in state:
+            self._centroids = state["centroids"].astype(np.float32)
+            self._assignment_buffer = state["assignments"].astype(np.int32)
+            self._trained_size = int(state["trained_size"])
+
+
+# Registered index implementations, selectable with KNOWLEDGE_INDEX_TYPE
+INDEX_TYPES: Dict[str, Type[VectorIndex]] = {
+    VectorIndex.kind: VectorIndex,
+    IVFFlatIndex.kind: IVFFlatIndex,
+}
+
+
+def register_index_type(index_cls: Type[VectorIndex]) -> None:
+    """Register an additional index implementation under its `kind`."""
+    INDEX_TYPES[index_cls.kind] = index_cls
+
+
+class VectorIndexManager:
+    """Keeps one vector index per knowledge repository, loaded from disk or rebuilt from the database."""
+
+    def __init__(self, index_dir: Optional[str] = None, index_type: Optional[str] = None, save_every: Optional[int] = None):
+        self.index_dir = index_dir or os.getenv("KNOWLEDGE_INDEX_DIR", "data/vector_indexes")
+        self.index_type = index_type or os.getenv("KNOWLEDGE_INDEX_TYPE", IVFFlatIndex.kind)
+        self.save_every = save_every or int(os.getenv("KNOWLEDGE_INDEX_SAVE_EVERY", "256"))
+        self._indexes: Dict[int, VectorIndex] = {}
+        self._pending_writes: Dict[int, int] = {}
+        self._lock = threading.RLock()
+
+    def _path(self, repository_id: int) -> str:
+        return os.path.join(self.index_dir, f"repository_{repository_id}.npz")
+
+    def _new_index(self) -> VectorIndex:
+        index_cls = INDEX_TYPES.get(self.index_type)
+        if not index_cls:
+            raise ValueError(f"Unknown vector index type: {self.index_type}")
+        return index_cls()
+
+    def get_index(self, db: Session, repository_id: int) -> VectorIndex:
+        """Get the index for a repository, loading or rebuilding it on first use."""
+        with self._lock:
+            index = self._indexes.get(repository_id)
+            if index is None:
+                index = self._load(db, repository_id)
+                self._indexes[repository_id] = index
+            return index
+
+    def _load(self, db: Session, repository_id: int) -> VectorIndex:
+        path = self._path(repository_id)
+        if os.path.exists(path):
+            try:
+                index = VectorIndex.load(path)
+                if self._catch_up(db, repository_id, index):
+                    return index
+            except Exception as e:
+                logger.warning(f"Discarding vector index for repository {repository_id}: {e}")
+        return self.rebuild(db, repository_id)
+
+    def _catch_up(self, db: Session, repository_id: int, index: VectorIndex) -> bool:
+        """Add rows created after the index was persisted. Returns False if the index is stale."""
+        from app.models.knowledge_models import KnowledgeItem
+
+        missing = self._embedding_rows(db, repository_id, after_id=index.max_id)
+        added = index.add((row.id for row in missing), (row.embedding for row in missing))
+
+        row_count = db.query(func.count(KnowledgeItem.id)).filter(
+            KnowledgeItem.repository_id == repository_id,
+            KnowledgeItem.embedding.isnot(None)
+        ).scalar() or 0
+        if len(index) > row_count:
+            # Rows were deleted or moved while the index was offline
+            return False
+        if added:
+            self._mark_dirty(repository_id, index, added)
+        return True
+
+    def rebuild(self, db: Session, repository_id: int) -> VectorIndex:
+        """Rebuild a repository index from the database and persist it."""
+        index = self._new_index()
+        rows = self._embedding_rows(db, repository_id)
+        index.add((row.id for row in rows), (row.embedding for row in rows))
+        with self._lock:
+            self._indexes[repository_id] = index
+            self._save(repository_id, index)
+        logger.info(f"Rebuilt vector index for repository {repository_id} with {len(index)} vectors")
+        return index
+
+    @staticmethod
+    def _embedding_rows(db: Session, repository_id: int, after_id: int = 0) -> list:
+        from app.models.knowledge_models import KnowledgeItem
+
+        return db.query(KnowledgeItem.id, KnowledgeItem.embedding).filter(
+            KnowledgeItem.repository_id == repository_id,
+            KnowledgeItem.embedding.isnot(None),
+            KnowledgeItem.id > after_id
+        ).order_by(KnowledgeItem.id).all()
+
+    def add_item(self, db: Session, repository_id: int, item_id: int, embedding: List[float]) -> None:
+        """Incrementally add a single item to its repository index."""
+        self.add_items(db, repository_id, [item_id], [embedding])
+
+    def add_items(self, db: Session, repository_id: int, item_ids: List[int], embeddings: List[List[float]]) -> None:
+        """Incrementally add items to their repository index."""
+        with self._lock:
+            index = self.get_index(db, repository_id)
+            added = index.add(item_ids, embeddings)
+            if added:
+                self._mark_dirty(repository_id, index, added)
+
+    def remove_items(self, db: Session, repository_id: int, item_ids: List[int]) -> None:
+        """Remove items from their repository index."""
+        with self._lock:
+            index = self.get_index(db, repository_id)
+            removed = index.remove(item_ids)
+            if removed:
+                self._mark_dirty(repository_id, index, removed)
+
+    def drop(self, repository_id: int) -> None:
+        """Forget a repository index and delete it from disk."""
+        with self._lock:
+            self._indexes.pop(repository_id, None)
+            self._pending_writes.pop(repository_id, None)
+            path = self._path(repository_id)
+            if os.path.exists(path):
+                os.remove(path)
+
+    def _mark_dirty(self, repository_id: int, index: VectorIndex, count: int) -> None:
+        pending = self._pending_writes.get(repository_id, 0) + count
+        if pending >= self.save_every:
+            self._save(repository_id, index)
+        else:
+            self._pending_writes[repository_id] = pending
+
+    def _save(self, repository_id: int, index: VectorIndex) -> None:
+        try:
+            index.save(self._path(repository_id))
+            self._pending_writes.pop(repository_id, None)
+        except Exception as e:
+            logger.error(f"Error saving vector index for repository {repository_id}: {e}")
+
+    def flush(self) -> None:
+        """Persist every index with unsaved changes."""
+        with self._lock:
+            for repository_id in list(self._pending_writes):
+                index = self._indexes.get(repository_id)
+                if index is not None:
+                    self._save(repository_id, index)
+
+    def load_all(self, db: Session) -> None:
+        """Load (or rebuild) the index of every repository, e.g. on startup."""
+        from app.models.knowledge_models import KnowledgeRepository
+
+        for (repository_id,) in db.query(KnowledgeRepository.id).all():
+            self.get_index(db, repository_id)
@@ -22,6 +22,7 @@ from app.models.prompt_models import (
     PromptLibraryReview
 )
 from app.services.ai.unified_service import UnifiedAIService
+from app.services.ai.usage import GenerationResult
 
 # Initialize logging
 logger = logging.getLogger(__name__)
@@ -246,15 +247,16 @@ class PromptTemplateService:
         # Generate response using AI service
         start_time = time.time()
         try:
-            response = ai_service.generate_text(
+            response = await ai_service.generate_text(
                 prompt=prompt_text,
                 model=model,
+                client=f"user:{user_id}",
                 **parameters
             )
-            success = True
+            success = response.error is None
         except Exception as e:
             logger.error(f"Error generating response: {e}")
-            response = {"text": f"Error: {str(e)}"}
+            response = GenerationResult.failed("unknown", model, str(e), [{"content": prompt_text}])
             success = False
             
         execution_time = time.time() - start_time
@@ -267,7 +269,7 @@ class PromptTemplateService:
             parameters=parameters,
             variables_used=variables,
             prompt_text=prompt_text,
-            response_text=response.get("text", ""),
+            response_text=response.response,
             execution_time=execution_time,
             rating=None,  # To be set by user later
             notes=None    # To be set by user later
@@ -288,7 +290,7 @@ class PromptTemplateService:
             parameters=parameters,
             variables_used=variables,
             execution_time=execution_time,
-            token_count=response.get("token_count", 0),
+            token_count=response.total_tokens,
             success=success
         )
         
@@ -548,17 +550,18 @@ class PromptChainService:
             # Generate response
             step_start_time = time.time()
             try:
-                response = ai_service.generate_text(
+                response = await ai_service.generate_text(
                     prompt=prompt_text,
                     model=model,
+                    client=f"user:{user_id}",
                     **parameters
                 )
-                step_success = True
+                step_success = response.error is None
             except Exception as e:
                 logger.error(f"Error in chain step {i+1}: {e}")
-                response = {"text": f"Error: {str(e)}"}
+                response = GenerationResult.failed("unknown", model, str(e), [{"content": prompt_text}])
                 step_success = False
-                success = False
+            success = success and step_success
                 
             step_time = time.time() - step_start_time
             step_times.append(step_time)
@@ -569,17 +572,18 @@ class PromptChainService:
                 "template_id": template.id,
                 "template_title": template.title,
                 "prompt": prompt_text,
-                "response": response.get("text", ""),
+                "response": response.response,
                 "execution_time": step_time,
+                "token_count": response.total_tokens,
                 "success": step_success
             }
             intermediate_results.append(result)
             
             # Update variables for next step
-            current_variables["previous_response"] = response.get("text", "")
+            current_variables["previous_response"] = response.text
             
             # Add tokens
-            total_tokens += response.get("token_count", 0)
+            total_tokens += response.total_tokens
             
             # Stop if step failed
             if not step_success:
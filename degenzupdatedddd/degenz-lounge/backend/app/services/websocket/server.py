@@ -1,3 +1,5 @@
+import os
+import uuid
 import asyncio
 import json
 import logging
@@ -7,19 +9,26 @@ from sqlalchemy.orm import Session
 
 from app.database import get_db
 from app.models import models, schemas
-from app.services.ai.gemini_service import GeminiService, LangChainService
+from app.services.ai.gemini_service import GeminiService, LangChainService, get_gemini_service
 
 # Configure logging
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
+# Send agent responses as incremental agent_message_delta frames while they are generated
+STREAM_AGENT_RESPONSES = os.getenv("WEBSOCKET_STREAM_RESPONSES", "true").lower() == "true"
+# Delegated agent tasks run concurrently, at most this many at once per session
+AGENT_FANOUT_CONCURRENCY = int(os.getenv("AGENT_FANOUT_CONCURRENCY", "4"))
+AGENT_RESPONSE_TIMEOUT = float(os.getenv("AGENT_RESPONSE_TIMEOUT", "60"))
+
 class WebSocketManager:
     """
     Manager for WebSocket connections
     """
     def __init__(self):
         self.active_connections: Dict[str, Dict[str, WebSocket]] = {}
-        self.gemini_service = GeminiService()
+        self.session_limits: Dict[str, asyncio.Semaphore] = {}
+        self.gemini_service = get_gemini_service()
         self.langchain_service = LangChainService(self.gemini_service)
     
     async def connect(self, websocket: WebSocket, session_id: str, client_id: str):
@@ -53,6 +62,7 @@ class WebSocketManager:
             
             if not self.active_connections[session_id]:
                 del self.active_connections[session_id]
+                self.session_limits.pop(session_id, None)
     
     async def broadcast_notification(self, session_id: str, notification: Dict[str, Any]):
         """
@@ -74,6 +84,95 @@ class WebSocketManager:
             for connection in self.active_connections[session_id].values():
                 await connection.send_json(formatted_message)
     
+    async def broadcast_agent_message_delta(self, session_id: str, delta: Dict[str, Any]):
+        """
+        Broadcast a partial agent response to all clients in a session.
+        Deltas share a stream_id with the agent_message that completes them.
+        """
+        if session_id in self.active_connections:
+            formatted_message = {
+                "type": "agent_message_delta",
+                "data": delta
+            }
+            for connection in list(self.active_connections[session_id].values()):
+                await connection.send_json(formatted_message)
+    
+    async def broadcast_agent_error(self, session_id: str, stream_id: str, agent_data: Dict[str, Any], error: str):
+        """
+        Tell every client in a session that an agent response failed.
+        The frame terminates any streamed draft with the same stream_id.
+        """
+        await self.broadcast_notification(
+            session_id,
+            {
+                "type": "agent_error",
+                "stream_id": stream_id,
+                "agent_id": agent_data["id"],
+                "agent_name": agent_data["name"],
+                "message": error
+            }
+        )
+    
+    async def generate_agent_response(self, session_id: str, agent_data: Dict[str, Any], task: str,
+                                      stream_id: Optional[str] = None, report_errors: bool = True):
+        """
+        Generate an agent's response, streaming it to the session as agent_message_delta frames.
+        Returns (stream_id, content); content is the complete response to persist and send
+        as the final agent_message, which replaces the streamed draft on the client.
+        If generation fails, an agent_error frame for the stream is broadcast (unless
+        `report_errors` is False because the caller reports it) and the error is re-raised.
+        """
+        stream_id = stream_id or uuid.uuid4().hex
+        try:
+            if not STREAM_AGENT_RESPONSES:
+                return stream_id, await self.langchain_service.run_agent_workflow(
+                    agent_data, task, f"session:{session_id}"
+                )
+            
+            parts = []
+            async for delta in self.langchain_service.stream_agent_workflow(agent_data, task, f"session:{session_id}"):
+                parts.append(delta)
+                await self.broadcast_agent_message_delta(
+                    session_id,
+                    {
+                        "stream_id": stream_id,
+                        "index": len(parts) - 1,
+                        "delta": delta,
+                        "agent_name": agent_data["name"],
+                        "agent_role": agent_data["role"]
+                    }
+                )
+            return stream_id, f"{agent_data['name']} ({agent_data['role']}): {''.join(parts)}"
+        except Exception as e:
+            if report_errors:
+                await self.broadcast_agent_error(session_id, stream_id, agent_data, str(e))
+            raise
+    
+    def _session_limit(self, session_id: str) -> asyncio.Semaphore:
+        if session_id not in self.session_limits:
+            self.session_limits[session_id] = asyncio.Semaphore(AGENT_FANOUT_CONCURRENCY)
+        return self.session_limits[session_id]
+    
+    async def run_delegated_task(self, session_id: str, agent_data: Dict[str, Any], task: str):
+        """
+        Run one delegated agent task under the session's concurrency limit and timeout.
+        Returns (agent_data, stream_id, response, error); error is None on success.
+        """
+        stream_id = uuid.uuid4().hex
+        try:
+            async with self._session_limit(session_id):
+                _, response = await asyncio.wait_for(
+                    self.generate_agent_response(session_id, agent_data, task, stream_id, report_errors=False),
+                    AGENT_RESPONSE_TIMEOUT
+                )
+            return agent_data, stream_id, response, None
+        except asyncio.TimeoutError:
+            logger.warning(f"Agent {agent_data['id']} timed out after {AGENT_RESPONSE_TIMEOUT:.0f}s in session {session_id}")
+            return agent_data, stream_id, None, f"Timed out after {AGENT_RESPONSE_TIMEOUT:.0f} seconds"
+        except Exception as e:
+            logger.error(f"Agent {agent_data['id']} failed in session {session_id}: {str(e)}")
+            return agent_data, stream_id, None, str(e)
+    
     async def broadcast_agent_to_agent_message(self, session_id: str, message: Dict[str, Any]):
         """
         Broadcast an agent-to-agent message to all clients in a session
@@ -201,7 +300,8 @@ class WebSocketManager:
                 # Generate response from the recipient agent
                 response = await self.langchain_service.run_agent_workflow(
                     recipient_data,
-                    prompt
+                    prompt,
+                    f"session:{session_id}"
                 )
                 
                 # Create a response direct message
@@ -304,11 +404,6 @@ class WebSocketManager:
                     "examples": agent.examples
                 }
                 
-                response = await self.langchain_service.run_agent_workflow(
-                    agent_data,
-                    message.get("content", "")
-                )
-                
                 # Save the message to the database
                 db_message = models.Message(
                     content=message.get("content", ""),
@@ -319,7 +414,13 @@ class WebSocketManager:
                 db.add(db_message)
                 db.commit()
                 
-                # Save the agent response to the database
+                stream_id, response = await self.generate_agent_response(
+                    session_id,
+                    agent_data,
+                    message.get("content", "")
+                )
+                
+                # Save the complete agent response to the database
                 agent_db_message = models.Message(
                     content=response,
                     session_id=int(session_id),
@@ -335,6 +436,7 @@ class WebSocketManager:
                     session_id,
                     {
                         "id": agent_db_message.id,
+                        "stream_id": stream_id,
                         "content": response,
                         "agent_name": agent.name,
                         "agent_role": agent.role,
@@ -383,11 +485,12 @@ class WebSocketManager:
                 # Run the manager workflow to delegate tasks
                 delegation_result = await self.langchain_service.run_manager_workflow(
                     message.get("content", ""),
-                    available_agents
+                    available_agents,
+                    f"session:{session_id}"
                 )
                 
-                # Process each assigned agent
-                agent_responses = []
+                # Run the assigned agents concurrently
+                tasks = []
                 for assignment in delegation_result.get("assigned_agents", []):
                     agent_id = assignment.get("agent_id")
                     task = assignment.get("task")
@@ -396,14 +499,23 @@ class WebSocketManager:
                     agent_data = next((a for a in available_agents if str(a["id"]) == str(agent_id)), None)
                     
                     if agent_data:
-                        # Generate response from the agent
-                        response = await self.langchain_service.run_agent_workflow(
-                            agent_data,
-                            task
-                        )
+                        tasks.append(asyncio.create_task(
+                            self.run_delegated_task(session_id, agent_data, task)
+                        ))
+                
+                # Persist and broadcast each agent response as soon as it finishes
+                agent_responses = []
+                try:
+                    for finished in asyncio.as_completed(tasks):
+                        agent_data, stream_id, response, error = await finished
+                        
+                        if error is not None:
+                            # Report the failed agent and carry on with the others
+                            await self.broadcast_agent_error(session_id, stream_id, agent_data, error)
+                            continue
                         
                         # Find the session agent
-                        session_agent = next((sa for sa in session_agents if sa.agent_id == int(agent_id)), None)
+                        session_agent = next((sa for sa in session_agents if sa.agent_id == int(agent_data["id"])), None)
                         
                         if session_agent:
                             # Save the agent response to the database
@@ -417,18 +529,23 @@ class WebSocketManager:
                             db.add(agent_db_message)
                             db.commit()
                             
-                            # Add to agent responses
-                            agent_responses.append({
+                            agent_response = {
                                 "id": agent_db_message.id,
+                                "stream_id": stream_id,
                                 "content": response,
                                 "agent_name": agent_data["name"],
                                 "agent_role": agent_data["role"],
                                 "timestamp": agent_db_message.created_at.isoformat()
-                            })
+                            }
+                            agent_responses.append(agent_response)
+                            await self.broadcast_agent_message(session_id, agent_response)
+                finally:
+                    for pending in tasks:
+                        pending.cancel()
                 
                 # If there are multiple responses, resolve conflicts
                 if len(agent_responses) > 1:
-                    resolution_result = await self.langchain_service.resolve_conflicts(agent_responses)
+                    resolution_result = await self.langchain_service.resolve_conflicts(agent_responses, f"session:{session_id}")
                     
                     # Save the resolution to the database
                     resolution_db_message = models.Message(
@@ -452,10 +569,6 @@ class WebSocketManager:
                             "timestamp": resolution_db_message.created_at.isoformat()
                         }
                     )
-                
-                # Broadcast each agent response
-                for response in agent_responses:
-                    await self.broadcast_agent_message(session_id, response)
         
         except Exception as e:
             logger.error(f"Error processing message: {str(e)}")
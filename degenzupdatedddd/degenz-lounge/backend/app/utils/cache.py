@@ -0,0 +1,190 @@
+"""
+Caching helpers for DeGeNz Lounge.
+Provides an in-process LRU/TTL cache and an optional Redis tier behind a single interface.
+"""
+
+import os
+import json
+import time
+import logging
+import threading
+from collections import OrderedDict
+from typing import Any, Dict, Iterable, Optional
+
+logger = logging.getLogger(__name__)
+
+
+class LRUCache:
+    """Thread-safe in-process LRU cache with an optional time-to-live per entry."""
+
+    def __init__(self, max_size: int = 1024, ttl: Optional[float] = None):
+        self.max_size = max_size
+        self.ttl = ttl
+        self._entries: "OrderedDict[str, tuple]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def get(self, key: str, default: Any = None) -> Any:
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return default
+            value, expires_at = entry
+            if expires_at is not None and expires_at <= time.monotonic():
+                del self._entries[key]
+                return default
+            self._entries.move_to_end(key)
+            return value
+
+    def set(self, key: str, value: Any, ttl: Optional[float] = None) -> None:
+        ttl = self.ttl if ttl is None else ttl
+        expires_at = time.monotonic() + ttl if ttl else None
+        with self._lock:
+            self._entries[key] = (value, expires_at)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_size:
+                self._entries.popitem(last=False)
+
+    def delete(self, key: str) -> None:
+        with self._lock:
+            self._entries.pop(key, None)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+
+
+class RedisCache:
+    """
+    Redis-backed cache tier storing JSON values under a key prefix. Errors are treated as misses
+    and pause the tier briefly so an unreachable Redis does not add a timeout to every lookup.
+    """
+
+    RETRY_AFTER = 30.0
+
+    def __init__(self, client, prefix: str, ttl: Optional[float] = None):
+        self.client = client
+        self.prefix = prefix
+        self.ttl = ttl
+        self._paused_until = 0.0
+
+    @property
+    def available(self) -> bool:
+        return time.monotonic() >= self._paused_until
+
+    def _failed(self, action: str, error: Exception) -> None:
+        logger.warning(f"Redis cache {action} failed: {error}")
+        self._paused_until = time.monotonic() + self.RETRY_AFTER
+
+    @classmethod
+    def from_env(cls, prefix: str, ttl: Optional[float] = None) -> Optional["RedisCache"]:
+        """Create a tier from REDIS_URL, or return None when Redis is not configured."""
+        url = os.getenv("REDIS_URL")
+        if not url:
+            return None
+        try:
+            import redis
+            client = redis.Redis.from_url(url, socket_timeout=0.5, socket_connect_timeout=0.5)
+            return cls(client, prefix, ttl)
+        except Exception as e:
+            logger.warning(f"Redis cache tier disabled: {e}")
+            return None
+
+    def _key(self, key: str) -> str:
+        return f"{self.prefix}:{key}"
+
+    def get_many(self, keys: Iterable[str]) -> Dict[str, Any]:
+        keys = list(keys)
+        if not keys or not self.available:
+            return {}
+        try:
+            values = self.client.mget([self._key(key) for key in keys])
+        except Exception as e:
+            self._failed("read", e)
+            return {}
+        return {key: json.loads(value) for key, value in zip(keys, values) if value is not None}
+
+    def set_many(self, items: Dict[str, Any], ttl: Optional[float] = None) -> None:
+        if not items or not self.available:
+            return
+        ttl = self.ttl if ttl is None else ttl
+        try:
+            pipeline = self.client.pipeline(transaction=False)
+            for key, value in items.items():
+                pipeline.set(self._key(key), json.dumps(value), ex=int(ttl) if ttl else None)
+            pipeline.execute()
+        except Exception as e:
+            self._failed("write", e)
+
+    def delete(self, key: str) -> None:
+        if not self.available:
+            return
+        try:
+            self.client.delete(self._key(key))
+        except Exception as e:
+            self._failed("delete", e)
+
+
+class TieredCache:
+    """In-process LRU in front of an optional Redis tier, with hit/miss counters."""
+
+    def __init__(self, namespace: str, max_size: int = 1024, ttl: Optional[float] = None, use_redis: bool = True):
+        self.namespace = namespace
+        self.memory = LRUCache(max_size=max_size, ttl=ttl)
+        self.redis = RedisCache.from_env(f"degenz:{namespace}", ttl) if use_redis else None
+        self.memory_hits = 0
+        self.redis_hits = 0
+        self.misses = 0
+
+    def get(self, key: str, default: Any = None) -> Any:
+        return self.get_many([key]).get(key, default)
+
+    def get_many(self, keys: Iterable[str]) -> Dict[str, Any]:
+        """Look keys up in memory, then Redis; Redis hits are promoted into memory."""
+        found = {}
+        remaining = []
+        for key in keys:
+            value = self.memory.get(key)
+            if value is None:
+                remaining.append(key)
+            else:
+                found[key] = value
+        self.memory_hits += len(found)
+
+        if remaining and self.redis is not None:
+            from_redis = self.redis.get_many(remaining)
+            for key, value in from_redis.items():
+                self.memory.set(key, value)
+            found.update(from_redis)
+            self.redis_hits += len(from_redis)
+
+        self.misses += sum(1 for key in remaining if key not in found)
+        return found
+
+    def set(self, key: str, value: Any, ttl: Optional[float] = None) -> None:
+        self.set_many({key: value}, ttl)
+
+    def set_many(self, items: Dict[str, Any], ttl: Optional[float] = None) -> None:
+        for key, value in items.items():
+            self.memory.set(key, value, ttl)
+        if self.redis is not None:
+            self.redis.set_many(items, ttl)
+
+    def delete(self, key: str) -> None:
+        self.memory.delete(key)
+        if self.redis is not None:
+            self.redis.delete(key)
+
+    def stats(self) -> Dict[str, Any]:
+        lookups = self.memory_hits + self.redis_hits + self.misses
+        return {
+            "namespace": self.namespace,
+            "size": len(self.memory),
+            "memory_hits": self.memory_hits,
+            "redis_hits": self.redis_hits,
+            "misses": self.misses,
+            "hit_rate": (self.memory_hits + self.redis_hits) / lookups if lookups else 0.0,
+            "redis_enabled": self.redis is not None
+        }
@@ -0,0 +1,43 @@
+"""
+Token counting helpers for DeGeNz Lounge.
+Uses tiktoken when it is installed and falls back to a word/punctuation approximation otherwise.
+"""
+
+import re
+import logging
+from typing import List, Tuple
+
+logger = logging.getLogger(__name__)
+
+try:
+    import tiktoken
+    _encoding = tiktoken.get_encoding("cl100k_base")
+except Exception:  # tiktoken is optional
+    _encoding = None
+
+# Words and individual punctuation marks; close to BPE counts for English prose
+_TOKEN_PATTERN = re.compile(r"\w+|[^\w\s]", re.UNICODE)
+
+
+def count_tokens(text: str) -> int:
+    """Count the tokens in a piece of text."""
+    if not text:
+        return 0
+    if _encoding is not None:
+        return len(_encoding.encode(text, disallowed_special=()))
+    return len(_TOKEN_PATTERN.findall(text))
+
+
+def token_spans(text: str) -> List[Tuple[int, int]]:
+    """
+    Return the (start, end) character offsets of each token in the text.
+    Offsets always index into the original string, so slices never split a character.
+    """
+    if not text:
+        return []
+    if _encoding is not None:
+        tokens = _encoding.encode(text, disallowed_special=())
+        _, offsets = _encoding.decode_with_offsets(tokens)
+        ends = offsets[1:] + [len(text)]
+        return [(start, end) for start, end in zip(offsets, ends) if end > start]
+    return [match.span() for match in _TOKEN_PATTERN.finditer(text)]
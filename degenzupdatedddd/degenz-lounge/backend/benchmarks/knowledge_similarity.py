@@ -0,0 +1,83 @@
+"""
+Benchmark for knowledge search scoring.
+
+Compares the per-item cosine loop previously used by KnowledgeService.search_knowledge
+with the vectorized matrix-vector path (cosine_top_k).
+
+Usage:
+    python -m benchmarks.knowledge_similarity --sizes 10000 100000 1000000 --dim 384
+"""
+
+import argparse
+import time
+
+import numpy as np
+
+from app.services.knowledge.vector_index import cosine_top_k
+
+
+def loop_top_k(query, embeddings, k):
+    """Per-item scoring: fresh arrays and norms for every candidate, then a full sort."""
+    scored = []
+    for item_id, embedding in enumerate(embeddings):
+        vec1 = np.array(query)
+        vec2 = np.array(embedding)
+        norm1 = np.linalg.norm(vec1)
+        norm2 = np.linalg.norm(vec2)
+        similarity = np.dot(vec1, vec2) / (norm1 * norm2) if norm1 and norm2 else 0.0
+        scored.append((item_id, similarity))
+    scored.sort(key=lambda x: x[1], reverse=True)
+    return scored[:k]
+
+
+def vectorized_top_k(query, matrix, norms, k):
+    """Contiguous float32 matrix with precomputed norms, one matvec plus argpartition."""
+    top, scores = cosine_top_k(query, matrix, norms, k)
+    return list(zip(top.tolist(), scores.tolist()))
+
+
+def timed(fn, repeats):
+    best = float("inf")
+    for _ in range(repeats):
+        start = time.perf_counter()
+        fn()
+        best = min(best, time.perf_counter() - start)
+    return best
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--sizes", type=int, nargs="+", default=[10_000, 100_000, 1_000_000])
+    parser.add_argument("--dim", type=int, default=384)
+    parser.add_argument("--k", type=int, default=10)
+    parser.add_argument("--repeats", type=int, default=3)
+    parser.add_argument("--loop-limit", type=int, default=100_000,
+                        help="Skip the per-item loop above this size (it is extrapolated instead)")
+    args = parser.parse_args()
+
+    rng = np.random.default_rng(0)
+    query = rng.normal(size=args.dim).astype(np.float32)
+
+    print(f"{'items':>10} {'loop (s)':>12} {'vectorized (s)':>16} {'speedup':>10}")
+    for size in args.sizes:
+        matrix = rng.normal(size=(size, args.dim)).astype(np.float32)
+        norms = np.linalg.norm(matrix, axis=1)
+        vectorized = timed(lambda: vectorized_top_k(query, matrix, norms, args.k), args.repeats)
+
+        if size <= args.loop_limit:
+            embeddings = matrix.tolist()
+            loop = timed(lambda: loop_top_k(query.tolist(), embeddings, args.k), 1)
+            loop_label = f"{loop:12.3f}"
+        else:
+            # Extrapolate linearly from a sample; the loop is O(N) per query
+            sample = matrix[:args.loop_limit].tolist()
+            loop = timed(lambda: loop_top_k(query.tolist(), sample, args.k), 1) * size / args.loop_limit
+            loop_label = f"{loop:11.3f}*"
+
+        print(f"{size:>10} {loop_label} {vectorized:16.4f} {loop / vectorized:9.0f}x")
+
+    print("* extrapolated from --loop-limit items")
+
+
+if __name__ == "__main__":
+    main()
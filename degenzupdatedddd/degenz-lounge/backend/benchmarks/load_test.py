@@ -0,0 +1,174 @@
+"""
+Load test for the orchestration layer against the local mock model.
+
+Start the API with the offline provider, then drive it over REST and the session WebSocket:
+
+    LOCAL_LLM_ENABLED=true LOCAL_LLM_LATENCY_MS=200 uvicorn main:app --workers 1
+    python -m benchmarks.load_test --url http://localhost:8000 --ws-clients 50 --turns 10
+
+Setup registers a load-test user, creates a manager and worker agents and one session per
+WebSocket client (session broadcasts are shared, so clients do not see each other's replies).
+Each WebSocket client sends user messages and waits for every agent reply of the turn; REST
+clients post session messages and list agents. Reported are throughput and latency
+percentiles for each operation, including time to the first streamed token.
+"""
+
+import argparse
+import asyncio
+import json
+import time
+import uuid
+from collections import defaultdict
+from typing import Dict, List
+
+import httpx
+import websockets
+
+
+class Recorder:
+    """Latency samples and error counts per operation."""
+
+    def __init__(self):
+        self.samples: Dict[str, List[float]] = defaultdict(list)
+        self.errors: Dict[str, int] = defaultdict(int)
+
+    def add(self, name: str, seconds: float) -> None:
+        self.samples[name].append(seconds)
+
+    def error(self, name: str) -> None:
+        self.errors[name] += 1
+
+    def report(self, elapsed: float) -> None:
+        print(f"{'operation':<22} {'count':>7} {'errors':>7} {'rps':>8} {'p50 ms':>9} {'p95 ms':>9} {'p99 ms':>9}")
+        for name in sorted(set(self.samples) | set(self.errors)):
+            samples = sorted(self.samples[name])
+            print(f"{name:<22} {len(samples):>7} {self.errors[name]:>7} {len(samples) / elapsed:>8.1f} "
+                  f"{percentile(samples, 50):>9.1f} {percentile(samples, 95):>9.1f} {percentile(samples, 99):>9.1f}")
+
+
+def percentile(samples: List[float], pct: float) -> float:
+    if not samples:
+        return float("nan")
+    index = min(len(samples) - 1, int(round(pct / 100 * (len(samples) - 1))))
+    return samples[index] * 1000
+
+
+async def setup(client: httpx.AsyncClient, sessions: int, workers: int) -> List[int]:
+    """Create the load-test user, agents and sessions; returns the session ids."""
+    username = f"loadtest-{uuid.uuid4().hex[:8]}"
+    password = uuid.uuid4().hex
+    response = await client.post("/auth/register", json={
+        "username": username, "email": f"{username}@example.com", "password": password
+    })
+    response.raise_for_status()
+    response = await client.post("/auth/token", data={"username": username, "password": password})
+    response.raise_for_status()
+    client.headers["Authorization"] = f"Bearer {response.json()['access_token']}"
+
+    agent_ids = []
+    for i in range(workers + 1):
+        response = await client.post("/agents/", json={
+            "name": "Manager" if i == 0 else f"Worker {i}",
+            "role": "manager" if i == 0 else "assistant",
+            "personality": "concise",
+            "system_instructions": "Answer briefly.",
+            "examples": {}
+        })
+        response.raise_for_status()
+        agent_ids.append(response.json()["id"])
+
+    session_ids = []
+    for i in range(sessions):
+        response = await client.post("/sandbox/start", json={"name": f"load test {i}", "description": "load test"})
+        response.raise_for_status()
+        session_id = response.json()["id"]
+        for j, agent_id in enumerate(agent_ids):
+            response = await client.post(f"/sandbox/sessions/{session_id}/agents",
+                                         params={"agent_id": agent_id, "is_manager": j == 0})
+            response.raise_for_status()
+        session_ids.append(session_id)
+    return session_ids
+
+
+async def ws_client(url: str, session_id: int, turns: int, replies: int, timeout: float, recorder: Recorder) -> None:
+    """Send `turns` user messages over one WebSocket, waiting for all agent replies each turn."""
+    ws_url = url.replace("http", "ws", 1) + f"/ws/{session_id}/{uuid.uuid4().hex[:8]}"
+    async with websockets.connect(ws_url, max_size=None) as ws:
+        for turn in range(turns):
+            started = time.perf_counter()
+            await ws.send(json.dumps({"type": "user_message", "content": f"Turn {turn}: plan the next release"}))
+            received = 0
+            first_token = None
+            try:
+                while received < replies:
+                    frame = json.loads(await asyncio.wait_for(ws.recv(), timeout))
+                    kind = frame.get("type")
+                    if kind == "agent_message_delta" and first_token is None:
+                        first_token = time.perf_counter() - started
+                    elif kind == "agent_message":
+                        received += 1
+                    elif kind in ("agent_error", "error"):
+                        recorder.error("ws_turn")
+                        received += 1
+            except asyncio.TimeoutError:
+                recorder.error("ws_turn")
+                continue
+            if first_token is not None:
+                recorder.add("ws_first_token", first_token)
+            recorder.add("ws_turn", time.perf_counter() - started)
+
+
+async def rest_client(client: httpx.AsyncClient, session_id: int, requests: int, recorder: Recorder) -> None:
+    """Alternate posting session messages and listing agents."""
+    for i in range(requests):
+        name, call = (
+            ("rest_post_message", client.post(f"/sandbox/sessions/{session_id}/message", json={
+                "content": f"REST message {i}", "message_type": "user", "session_id": session_id
+            }))
+            if i % 2 == 0 else
+            ("rest_list_agents", client.get("/agents/"))
+        )
+        started = time.perf_counter()
+        try:
+            response = await call
+            response.raise_for_status()
+        except httpx.HTTPError:
+            recorder.error(name)
+            continue
+        recorder.add(name, time.perf_counter() - started)
+
+
+async def run(args) -> None:
+    limits = httpx.Limits(max_connections=args.rest_clients + 10)
+    async with httpx.AsyncClient(base_url=args.url, timeout=args.timeout, limits=limits) as client:
+        session_ids = await setup(client, max(args.ws_clients, 1), args.workers)
+        # The local model's manager delegates to every session agent (itself included), then
+        # several replies are merged by one conflict resolution message
+        agents = args.workers + 1
+        replies = agents + (1 if agents > 1 else 0)
+
+        recorder = Recorder()
+        started = time.perf_counter()
+        await asyncio.gather(
+            *(ws_client(args.url, session_ids[i], args.turns, replies, args.timeout, recorder)
+              for i in range(args.ws_clients)),
+            *(rest_client(client, session_ids[i % len(session_ids)], args.rest_requests, recorder)
+              for i in range(args.rest_clients))
+        )
+        recorder.report(time.perf_counter() - started)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--url", default="http://localhost:8000")
+    parser.add_argument("--ws-clients", type=int, default=20)
+    parser.add_argument("--turns", type=int, default=5, help="User messages per WebSocket client")
+    parser.add_argument("--workers", type=int, default=2, help="Worker agents per session besides the manager")
+    parser.add_argument("--rest-clients", type=int, default=20)
+    parser.add_argument("--rest-requests", type=int, default=50, help="Requests per REST client")
+    parser.add_argument("--timeout", type=float, default=60.0)
+    asyncio.run(run(parser.parse_args()))
+
+
+if __name__ == "__main__":
+    main()
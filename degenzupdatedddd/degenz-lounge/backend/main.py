@@ -8,6 +8,7 @@ from app.routes import agents, sandbox, auth
 from app.routes import workflows, conflict_resolution, hierarchy
 from app.routes import settings_routes # Added settings_routes import
 from app.services.websocket.server import setup_websocket_routes
+from app.services.ai.http_client import close_http_clients
 
 app = FastAPI(title="DeGeNz Lounge API", description="API for DeGeNz Lounge - AI Agent Orchestration Platform")
 
@@ -36,6 +37,10 @@ app.include_router(settings_routes.router, prefix="/api/settings", tags=["settin
 # Setup WebSocket routes
 setup_websocket_routes(app)
 
+@app.on_event("shutdown")
+async def shutdown_ai_clients():
+    await close_http_clients()
+
 @app.get("/")
 def read_root():
     return {"message": "Welcome to DeGeNz Lounge API"}
@@ -0,0 +1,139 @@
+"""
+Migrations for the knowledge base.
+
+    python migrate_knowledge.py pgvector [--batch-size 1000]
+    python migrate_knowledge.py documents
+    python migrate_knowledge.py fts
+
+`pgvector` enables the pgvector extension, adds knowledge_items.embedding_vector, backfills it
+from the existing ARRAY(Float) embeddings and builds the similarity index.
+Set KNOWLEDGE_VECTOR_BACKEND=pgvector afterwards to search on the server.
+
+`documents` adds the document processing and content hash columns.
+
+`fts` builds the GIN full-text index used by lexical and hybrid search.
+"""
+
+import argparse
+import logging
+from sqlalchemy import text, inspect
+
+from app.database import engine
+from app.models.knowledge_models import EMBEDDING_DIMENSIONS, PGVECTOR_INDEX_TYPE, FTS_CONFIG
+
+# Configure logging
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+def enable_pgvector():
+    """
+    Create the extension and the vector column if they don't exist
+    """
+    with engine.begin() as conn:
+        logger.info("Enabling pgvector extension...")
+        conn.execute(text("CREATE EXTENSION IF NOT EXISTS vector"))
+        conn.execute(text(
+            f"ALTER TABLE knowledge_items ADD COLUMN IF NOT EXISTS embedding_vector vector({EMBEDDING_DIMENSIONS})"
+        ))
+    logger.info("embedding_vector column is present")
+
+def backfill_embedding_vectors(batch_size: int = 1000):
+    """
+    Copy ARRAY(Float) embeddings into embedding_vector in batches
+    """
+    total = 0
+    while True:
+        with engine.begin() as conn:
+            result = conn.execute(text("""
+                UPDATE knowledge_items
+                SET embedding_vector = embedding::vector
+                WHERE id IN (
+                    SELECT id FROM knowledge_items
+                    WHERE embedding_vector IS NULL
+                      AND array_length(embedding, 1) = :dimensions
+                    ORDER BY id
+                    LIMIT :batch_size
+                )
+            """), {"dimensions": EMBEDDING_DIMENSIONS, "batch_size": batch_size})
+        if not result.rowcount:
+            break
+        total += result.rowcount
+        logger.info(f"Backfilled {total} embeddings...")
+    logger.info(f"Backfill complete: {total} rows updated")
+
+def create_vector_index():
+    """
+    Build the HNSW or IVFFlat index used for cosine distance ordering
+    """
+    with engine.begin() as conn:
+        if PGVECTOR_INDEX_TYPE == "ivfflat":
+            # IVFFlat needs data to pick its lists; sqrt(rows) is the usual starting point
+            rows = conn.execute(text("SELECT count(*) FROM knowledge_items WHERE embedding_vector IS NOT NULL")).scalar()
+            lists = max(1, int(rows ** 0.5))
+            options = f"WITH (lists = {lists})"
+        else:
+            options = "WITH (m = 16, ef_construction = 64)"
+
+        logger.info(f"Creating {PGVECTOR_INDEX_TYPE} index...")
+        conn.execute(text(
+            f"CREATE INDEX IF NOT EXISTS ix_knowledge_items_embedding_vector ON knowledge_items "
+            f"USING {PGVECTOR_INDEX_TYPE} (embedding_vector vector_cosine_ops) {options}"
+        ))
+    logger.info("Vector index created successfully")
+
+# Columns added to documents after the initial schema, as (name, DDL type)
+DOCUMENT_COLUMNS = [
+    ("processing_attempts", "INTEGER DEFAULT 0"),
+    ("processing_error", "TEXT"),
+    ("content_hash", "VARCHAR(64)"),
+    ("processing_heartbeat_at", "TIMESTAMP WITH TIME ZONE"),
+]
+
+def add_document_columns():
+    """
+    Add any missing document columns
+    """
+    existing = {column["name"] for column in inspect(engine).get_columns("documents")}
+    with engine.begin() as conn:
+        for name, ddl in DOCUMENT_COLUMNS:
+            if name not in existing:
+                logger.info(f"Adding documents.{name}...")
+                conn.execute(text(f"ALTER TABLE documents ADD COLUMN {name} {ddl}"))
+        conn.execute(text("CREATE INDEX IF NOT EXISTS ix_documents_content_hash ON documents (content_hash)"))
+    logger.info("Document columns are up to date")
+
+def create_fts_index():
+    """
+    Build the GIN index over to_tsvector(title || content); must match search_document()
+    """
+    with engine.connect() as conn:
+        logger.info("Creating full-text index...")
+        # CONCURRENTLY keeps the table writable but cannot run inside a transaction
+        conn.execution_options(isolation_level="AUTOCOMMIT").execute(text(
+            "CREATE INDEX CONCURRENTLY IF NOT EXISTS ix_knowledge_items_fts ON knowledge_items "
+            f"USING gin (to_tsvector('{FTS_CONFIG}', coalesce(title, '') || ' ' || coalesce(content, '')))"
+        ))
+    logger.info("Full-text index created successfully")
+
+def migrate_pgvector(batch_size: int = 1000):
+    enable_pgvector()
+    backfill_embedding_vectors(batch_size)
+    create_vector_index()
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Knowledge base migrations")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+
+    pgvector_parser = subparsers.add_parser("pgvector", help="Add and backfill the pgvector embedding column")
+    pgvector_parser.add_argument("--batch-size", type=int, default=1000)
+
+    subparsers.add_parser("documents", help="Add document processing columns")
+    subparsers.add_parser("fts", help="Create the full-text search index")
+
+    args = parser.parse_args()
+    if args.command == "pgvector":
+        migrate_pgvector(args.batch_size)
+    elif args.command == "documents":
+        add_document_columns()
+    elif args.command == "fts":
+        create_fts_index()
@@ -0,0 +1,79 @@
+import json
+from unittest.mock import patch, MagicMock
+
+from app.utils.cache import LRUCache, RedisCache, TieredCache
+
+def test_lru_cache_evicts_least_recently_used():
+    # Arrange
+    cache = LRUCache(max_size=2)
+    cache.set("a", 1)
+    cache.set("b", 2)
+
+    # Act
+    cache.get("a")
+    cache.set("c", 3)
+
+    # Assert
+    assert cache.get("a") == 1
+    assert cache.get("b") is None
+    assert cache.get("c") == 3
+
+@patch('app.utils.cache.time.monotonic')
+def test_lru_cache_expires_entries_after_ttl(mock_monotonic):
+    # Arrange
+    mock_monotonic.return_value = 100.0
+    cache = LRUCache(ttl=10)
+    cache.set("a", 1)
+
+    # Act
+    mock_monotonic.return_value = 111.0
+
+    # Assert
+    assert cache.get("a") is None
+    assert len(cache) == 0
+
+def test_tiered_cache_counts_hits_and_misses():
+    # Arrange
+    cache = TieredCache(namespace="test", use_redis=False)
+    cache.set("a", [0.1, 0.2])
+
+    # Act
+    found = cache.get_many(["a", "b"])
+
+    # Assert
+    assert found == {"a": [0.1, 0.2]}
+    stats = cache.stats()
+    assert stats["memory_hits"] == 1
+    assert stats["misses"] == 1
+    assert stats["hit_rate"] == 0.5
+
+def test_tiered_cache_promotes_redis_hits_into_memory():
+    # Arrange
+    client = MagicMock()
+    client.mget.return_value = [json.dumps([1.0, 2.0])]
+    cache = TieredCache(namespace="test", use_redis=False)
+    cache.redis = RedisCache(client, "degenz:test")
+
+    # Act
+    first = cache.get("a")
+    second = cache.get("a")
+
+    # Assert
+    assert first == second == [1.0, 2.0]
+    client.mget.assert_called_once_with(["degenz:test:a"])
+    assert cache.stats()["redis_hits"] == 1
+    assert cache.stats()["memory_hits"] == 1
+
+def test_redis_errors_are_misses_and_pause_the_tier():
+    # Arrange
+    client = MagicMock()
+    client.mget.side_effect = ConnectionError("redis down")
+    tier = RedisCache(client, "degenz:test")
+
+    # Act
+    first = tier.get_many(["a"])
+    second = tier.get_many(["a"])
+
+    # Assert
+    assert first == second == {}
+    client.mget.assert_called_once()
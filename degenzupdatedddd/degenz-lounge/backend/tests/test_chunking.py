@@ -0,0 +1,67 @@
+import pytest
+
+from app.services.knowledge.chunking import TextChunker
+from app.utils.tokens import count_tokens, token_spans
+
+def make_text(sentences):
+    return " ".join(f"Sentence number {i} talks about topic {i % 7}." for i in range(sentences))
+
+def test_chunks_respect_token_budget_and_cover_text():
+    # Arrange
+    text = make_text(200)
+    chunker = TextChunker(chunk_tokens=50, overlap_tokens=10)
+
+    # Act
+    chunks = chunker.split(text)
+
+    # Assert
+    assert len(chunks) > 1
+    assert all(count_tokens(chunk) <= 50 for chunk in chunks)
+    assert chunks[0].startswith("Sentence number 0")
+    assert chunks[-1].endswith("Sentence number 199 talks about topic 3.")
+
+def test_consecutive_chunks_overlap():
+    # Arrange
+    text = make_text(100)
+    chunker = TextChunker(chunk_tokens=40, overlap_tokens=8)
+
+    # Act
+    chunks = chunker.split(text)
+
+    # Assert
+    for previous, current in zip(chunks, chunks[1:]):
+        overlap = current[:token_spans(current)[7][1]]
+        assert previous.endswith(overlap)
+
+def test_chunks_prefer_sentence_boundaries():
+    # Arrange
+    text = make_text(30)
+    chunker = TextChunker(chunk_tokens=30, overlap_tokens=0)
+
+    # Act
+    chunks = chunker.split(text)
+
+    # Assert
+    assert all(chunk.endswith(".") for chunk in chunks)
+
+def test_short_and_empty_text():
+    # Arrange
+    chunker = TextChunker(chunk_tokens=50, overlap_tokens=10)
+
+    # Act / Assert
+    assert chunker.split("") == []
+    assert chunker.split("Just one line.") == ["Just one line."]
+    with pytest.raises(ValueError):
+        TextChunker(chunk_tokens=10, overlap_tokens=10)
+
+def test_streamed_segments_match_whole_text():
+    # Arrange
+    text = make_text(150)
+    segments = [text[i:i + 97] for i in range(0, len(text), 97)]
+    chunker = TextChunker(chunk_tokens=45, overlap_tokens=5)
+
+    # Act
+    streamed = list(chunker.split_stream(segments))
+
+    # Assert
+    assert streamed == chunker.split(text)
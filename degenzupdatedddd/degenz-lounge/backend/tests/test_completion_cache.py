@@ -0,0 +1,41 @@
+from app.services.ai.completion_cache import CompletionCache
+from app.services.ai.usage import GenerationResult
+
+def test_request_key_is_stable_and_sensitive_to_content():
+    # Arrange
+    messages = [{"role": "user", "content": "Summarize this"}]
+
+    # Act
+    key = CompletionCache.request_key("Gemini", "gemini-pro", "Be brief", messages, 0, 256)
+    same = CompletionCache.request_key("gemini", "gemini-pro", "Be brief", [{"content": "Summarize this", "role": "user"}], 0.0, 256)
+    other = CompletionCache.request_key("gemini", "gemini-pro", "Be brief", messages, 0, 512)
+
+    # Assert
+    assert key == same
+    assert key != other
+
+def test_should_cache_defaults_to_deterministic_calls_only():
+    # Arrange
+    cache = CompletionCache(use_redis=False, enabled=True)
+
+    # Assert
+    assert cache.should_cache(0)
+    assert not cache.should_cache(0.7)
+    assert cache.should_cache(0.7, cache=True)
+    assert not cache.should_cache(0, cache=False)
+    assert cache.stats()["bypasses"] == 1
+
+def test_errors_are_not_cached():
+    # Arrange
+    cache = CompletionCache(use_redis=False, enabled=True)
+
+    # Act
+    cache.set("failed", GenerationResult.failed("gemini", None, "rate limited", [{"content": "Hi"}]))
+    cache.set("failed-dict", {"error": "timeout"})
+    cache.set("ok", "Error codes are listed in the appendix.")
+
+    # Assert
+    assert cache.get("failed") is None
+    assert cache.get("failed-dict") is None
+    assert cache.get("ok") == "Error codes are listed in the appendix."
+    assert cache.stats()["memory_hits"] == 1
@@ -0,0 +1,68 @@
+import asyncio
+from unittest.mock import AsyncMock, patch
+
+from app.services.knowledge.document_queue import DocumentQueue, MemoryJobQueue
+
+async def _work(queue, document_id, acks=1):
+    """Queue a job and run one worker until `acks` acknowledgements were made."""
+    await queue._jobs.put(document_id)
+    worker = asyncio.create_task(queue._worker(0))
+    for _ in range(100):
+        await asyncio.sleep(0.01)
+        if queue._jobs.ack.await_count >= acks:
+            break
+    worker.cancel()
+    await asyncio.gather(worker, *queue._pending_retries, return_exceptions=True)
+
+def _queue():
+    queue = DocumentQueue(concurrency=1, backend="memory")
+    queue._jobs = MemoryJobQueue()
+    queue._jobs.ack = AsyncMock()
+    return queue
+
+@patch.object(DocumentQueue, "_run", new_callable=AsyncMock, return_value=None)
+def test_worker_acknowledges_completed_jobs(mock_run):
+    # Arrange
+    queue = _queue()
+
+    # Act
+    asyncio.run(_work(queue, 7))
+
+    # Assert
+    mock_run.assert_awaited_once_with(7)
+    queue._jobs.ack.assert_awaited_once_with(7)
+
+@patch.object(DocumentQueue, "_run", new_callable=AsyncMock, side_effect=[0.0, None])
+def test_retried_job_is_acknowledged_after_it_is_requeued(mock_run):
+    # Arrange
+    queue = _queue()
+    queue._jobs.put = AsyncMock(wraps=queue._jobs.put)
+
+    # Act
+    asyncio.run(_work(queue, 7, acks=2))
+
+    # Assert
+    assert mock_run.await_count == 2
+    assert queue._jobs.put.await_count == 2
+    assert queue._jobs.ack.await_count == 2
+
+def test_memory_queue_holds_jobs_until_every_put_is_acknowledged():
+    # Arrange
+    jobs = MemoryJobQueue()
+
+    async def retry_then_finish():
+        await jobs.put(7)
+        await jobs.get(0.1)
+        await jobs.put(7)
+        await jobs.ack(7)
+        held_while_queued = jobs.held
+        await jobs.get(0.1)
+        await jobs.ack(7)
+        return held_while_queued
+
+    # Act
+    held_while_queued = asyncio.run(retry_then_finish())
+
+    # Assert
+    assert held_while_queued == [7]
+    assert jobs.held == []
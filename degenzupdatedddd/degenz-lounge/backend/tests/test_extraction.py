@@ -0,0 +1,42 @@
+import zipfile
+from unittest.mock import patch
+
+import pytest
+
+from app.services.knowledge import extraction
+from app.services.knowledge.extraction import iter_docx_paragraphs, iter_json
+
+W = 'xmlns:w="http://schemas.openxmlformats.org/wordprocessingml/2006/main"'
+
+def _docx(path, body):
+    with zipfile.ZipFile(path, "w") as archive:
+        archive.writestr("word/document.xml", f'<w:document {W}><w:body>{body}</w:body></w:document>')
+    return str(path)
+
+@patch.object(extraction, "DOCX_PARAGRAPHS_PER_SEGMENT", 2)
+def test_docx_paragraphs_stream_in_segments_including_tables(tmp_path):
+    # Arrange
+    file_path = _docx(
+        tmp_path / "notes.docx",
+        "<w:p><w:r><w:t>Roadmap</w:t></w:r></w:p>"
+        "<w:p><w:r><w:t>Ship</w:t><w:tab/><w:t>v2</w:t></w:r></w:p>"
+        "<w:tbl><w:tr><w:tc><w:p><w:r><w:t>Owner</w:t></w:r></w:p></w:tc></w:tr></w:tbl>"
+        "<w:sectPr/>"
+    )
+
+    # Act
+    segments = list(iter_docx_paragraphs(file_path))
+
+    # Assert
+    assert segments == ["Roadmap\n\nShip\tv2\n\n", "Owner\n\n"]
+
+def test_json_over_the_size_cap_is_rejected(tmp_path):
+    # Arrange
+    file_path = tmp_path / "export.json"
+    file_path.write_text('{"items": [1, 2, 3]}', encoding="utf-8")
+
+    # Act / Assert
+    with patch.object(extraction, "JSON_MAX_BYTES", 8):
+        with pytest.raises(ValueError):
+            list(iter_json(str(file_path)))
+    assert "".join(iter_json(str(file_path))).startswith('{\n  "items"')
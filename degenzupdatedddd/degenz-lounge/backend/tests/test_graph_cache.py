@@ -0,0 +1,105 @@
+import json
+
+from sqlalchemy import Column, Float, Integer, MetaData, String, Table, create_engine, select
+from sqlalchemy.orm import Session
+
+from app.services.knowledge.graph_cache import RepositoryGraph, export_lines, full_graph, neighbourhood, node_payload
+
+def make_graph():
+    graph = RepositoryGraph(1)
+    graph.load(
+        [node_payload(i, f"Item {i}", "text", 1.0, []) for i in range(1, 6)],
+        [(10, 1, 2, "related", 0.9), (11, 2, 3, "supports", 0.5), (12, 3, 4, "related", 0.1), (13, 1, 99, "related", 1.0)]
+    )
+    return graph
+
+def test_incident_edges_read_from_csr_and_pending():
+    # Arrange
+    graph = make_graph()
+
+    # Act
+    graph.add_edge((14, 5, 2, "related", 0.3))
+
+    # Assert
+    assert sorted(edge[0] for edge in graph.incident_edges(2)) == [10, 11, 14]
+    assert [edge[0] for edge in graph.incident_edges(99)] == [13]
+    assert graph.edge_count == 5
+
+def test_remove_node_drops_incident_edges_and_bumps_version():
+    # Arrange
+    graph = make_graph()
+    graph.add_edge((14, 5, 2, "related", 0.3))
+    version = graph.version
+
+    # Act
+    graph.remove_node(2)
+    graph.compact()
+
+    # Assert
+    assert graph.version != version
+    assert 2 not in graph.nodes
+    assert sorted(edge[0] for edge in graph.edges()) == [12, 13]
+    assert graph.incident_edges(5) == []
+
+def test_neighbourhood_respects_depth_cap_and_repository_nodes():
+    # Arrange
+    graph = make_graph()
+
+    # Act
+    one_hop = neighbourhood([graph], 1, depth=1, max_nodes=100)
+    capped = neighbourhood([graph], 1, depth=3, max_nodes=3)
+
+    # Assert
+    assert [node["id"] for node in one_hop["nodes"]] == [1, 2]
+    assert one_hop["edges"] == [{"source": 1, "target": 2, "type": "related", "strength": 0.9}]
+    assert [node["id"] for node in capped["nodes"]] == [1, 2, 3]
+
+def test_full_graph_only_includes_edges_between_returned_nodes():
+    # Arrange
+    graph = make_graph()
+
+    # Act
+    result = full_graph([graph])
+
+    # Assert
+    assert len(result["nodes"]) == 5
+    assert sorted((edge["source"], edge["target"]) for edge in result["edges"]) == [(1, 2), (2, 3), (3, 4)]
+
+def test_export_lines_streams_every_node_and_edge_in_partitions():
+    # Arrange
+    metadata = MetaData()
+    items = Table("items", metadata, Column("id", Integer, primary_key=True), Column("title", String),
+                  Column("content_type", String), Column("importance", Float))
+    connections = Table("connections", metadata, Column("id", Integer, primary_key=True),
+                        Column("source_id", Integer), Column("target_id", Integer),
+                        Column("relationship_type", String), Column("strength", Float))
+    engine = create_engine("sqlite://")
+    metadata.create_all(engine)
+    with engine.begin() as connection:
+        connection.execute(items.insert(), [
+            {"id": i, "title": f"Item {i}", "content_type": "text", "importance": 1.0} for i in range(1, 6)
+        ])
+        connection.execute(connections.insert(), [
+            {"id": 10 + i, "source_id": i, "target_id": i + 1, "relationship_type": "related", "strength": 0.5}
+            for i in range(1, 4)
+        ])
+    tag_batches = []
+
+    def tag_names(item_ids):
+        tag_batches.append(item_ids)
+        return {1: ["export"]}
+
+    # Act
+    with Session(engine) as db:
+        lines = [json.loads(line) for line in export_lines(
+            db, select(items).order_by(items.c.id), select(connections).order_by(connections.c.id), tag_names, 2
+        )]
+
+    # Assert
+    nodes = [line["node"] for line in lines if line["type"] == "node"]
+    edges = [line["edge"] for line in lines if line["type"] == "edge"]
+    assert len(lines) == 8
+    assert [node["label"] for node in nodes] == [f"Item {i}" for i in range(1, 6)]
+    assert nodes[0]["tags"] == ["export"]
+    assert [(edge["source"], edge["target"]) for edge in edges] == [(1, 2), (2, 3), (3, 4)]
+    assert tag_batches == [[1, 2], [3, 4], [5]]
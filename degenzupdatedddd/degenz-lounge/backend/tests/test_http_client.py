@@ -0,0 +1,38 @@
+import asyncio
+from unittest.mock import patch
+
+from app.services.ai.http_client import get_http_client, close_http_clients, provider_timeout
+
+def test_get_http_client_reuses_client_per_provider():
+    # Arrange
+    first = get_http_client("mistral")
+
+    # Act
+    second = get_http_client("mistral")
+    other = get_http_client("grok")
+
+    # Assert
+    assert first is second
+    assert other is not first
+    asyncio.run(close_http_clients())
+
+@patch.dict('os.environ', {"GROK_HTTP_TIMEOUT": "15"})
+def test_provider_timeout_uses_provider_override():
+    # Act
+    timeout = provider_timeout("grok")
+
+    # Assert
+    assert timeout.read == 15.0
+    assert provider_timeout("huggingface").read == 120.0
+
+def test_close_http_clients_recreates_client_on_next_use():
+    # Arrange
+    client = get_http_client("deepseek")
+
+    # Act
+    asyncio.run(close_http_clients())
+
+    # Assert
+    assert client.is_closed
+    assert get_http_client("deepseek") is not client
+    asyncio.run(close_http_clients())
@@ -0,0 +1,49 @@
+import asyncio
+
+from app.services.ai.providers import LocalMockProvider, get_provider
+
+def _provider(**kwargs):
+    options = dict(latency_ms=0, latency_spread_ms=0, tokens_per_second=0, seed=1)
+    options.update(kwargs)
+    return LocalMockProvider(**options)
+
+def test_generate_is_deterministic_and_counts_tokens():
+    # Arrange
+    provider = _provider()
+    messages = [{"role": "user", "content": "Plan the release"}]
+
+    # Act
+    first = asyncio.run(provider.generate(messages, "Be brief."))
+    second = asyncio.run(provider.generate(messages, "Be brief."))
+
+    # Assert
+    assert first.text == second.text
+    assert first.completion_tokens > 0
+    assert first.prompt_tokens > 0
+    assert isinstance(get_provider("local"), LocalMockProvider)
+
+def test_stream_response_yields_the_generated_text():
+    # Arrange
+    provider = _provider()
+    messages = [{"role": "user", "content": "Plan the release"}]
+
+    async def collect():
+        return [delta async for delta in provider.stream_response(messages)]
+
+    # Act
+    deltas = asyncio.run(collect())
+
+    # Assert
+    assert len(deltas) > 1
+    assert "".join(deltas) == asyncio.run(provider.generate(messages)).text
+
+def test_generate_injects_failures():
+    # Arrange
+    provider = _provider(rate_limit_rate=1.0)
+
+    # Act
+    result = asyncio.run(provider.generate([{"role": "user", "content": "Hi"}]))
+
+    # Assert
+    assert result.error.startswith("429")
+    assert result.response.startswith("Error: 429")
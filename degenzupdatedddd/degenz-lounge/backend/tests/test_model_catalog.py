@@ -0,0 +1,61 @@
+import asyncio
+from unittest.mock import patch, AsyncMock
+
+from app.services.ai.model_catalog import ModelCatalog
+
+def test_concurrent_misses_share_one_fetch():
+    # Arrange
+    catalog = ModelCatalog(ttl=60)
+
+    async def fetch():
+        await asyncio.sleep(0.01)
+        return [{"id": "m1", "name": "Model 1"}]
+    fetch_mock = AsyncMock(side_effect=fetch)
+
+    async def run():
+        return await asyncio.gather(*(catalog.get("openrouter:env", fetch_mock) for _ in range(5)))
+
+    # Act
+    results = asyncio.run(run())
+
+    # Assert
+    assert all(models == [{"id": "m1", "name": "Model 1"}] for models in results)
+    assert fetch_mock.await_count == 1
+
+@patch('app.services.ai.model_catalog.time.monotonic')
+def test_stale_entry_is_served_while_refreshing(mock_monotonic):
+    # Arrange
+    catalog = ModelCatalog(ttl=60, stale_ttl=600)
+    fetch = AsyncMock(side_effect=[[{"id": "old"}], [{"id": "new"}]])
+
+    async def run():
+        mock_monotonic.return_value = 0.0
+        await catalog.get("mistral:env", fetch)
+        mock_monotonic.return_value = 120.0
+        stale = await catalog.get("mistral:env", fetch)
+        await asyncio.sleep(0)
+        fresh = await catalog.get("mistral:env", fetch)
+        return stale, fresh
+
+    # Act
+    stale, fresh = asyncio.run(run())
+
+    # Assert
+    assert stale == [{"id": "old"}]
+    assert fresh == [{"id": "new"}]
+    assert fetch.await_count == 2
+
+def test_failed_refresh_keeps_previous_catalog():
+    # Arrange
+    catalog = ModelCatalog(ttl=0, stale_ttl=0)
+    fetch = AsyncMock(side_effect=[[{"id": "m1"}], []])
+
+    async def run():
+        await catalog.get("deepseek:env", fetch)
+        return await catalog.get("deepseek:env", fetch)
+
+    # Act
+    models = asyncio.run(run())
+
+    # Assert
+    assert models == [{"id": "m1"}]
@@ -0,0 +1,50 @@
+from unittest.mock import patch, MagicMock
+
+from app.services.ai.provider_registry import ProviderRegistry
+
+def test_registry_reuses_instances_per_provider_and_key():
+    # Arrange
+    factory = MagicMock(side_effect=lambda name, key: object())
+    registry = ProviderRegistry(factory=factory)
+
+    # Act
+    first = registry.get("mistral", "key-a")
+    again = registry.get("Mistral", "key-a")
+    other_key = registry.get("mistral", "key-b")
+
+    # Assert
+    assert first is again
+    assert other_key is not first
+    assert factory.call_count == 2
+
+@patch('app.utils.cache.time.monotonic')
+def test_registry_evicts_idle_instances(mock_monotonic):
+    # Arrange
+    mock_monotonic.return_value = 100.0
+    factory = MagicMock(side_effect=lambda name, key: object())
+    registry = ProviderRegistry(factory=factory, idle_ttl=60)
+    first = registry.get("grok", "key")
+
+    # Act
+    mock_monotonic.return_value = 150.0
+    kept = registry.get("grok", "key")
+    mock_monotonic.return_value = 211.0
+    replaced = registry.get("grok", "key")
+
+    # Assert
+    assert kept is first
+    assert replaced is not first
+
+def test_registry_does_not_cache_failed_construction():
+    # Arrange
+    factory = MagicMock(side_effect=ValueError("Grok API key is required"))
+    registry = ProviderRegistry(factory=factory)
+
+    # Act
+    try:
+        registry.get("grok")
+    except ValueError:
+        pass
+
+    # Assert
+    assert len(registry) == 0
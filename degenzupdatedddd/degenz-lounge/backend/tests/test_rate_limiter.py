@@ -0,0 +1,91 @@
+import asyncio
+from unittest.mock import patch
+
+import pytest
+
+from app.services.ai import gemini_service
+from app.services.ai.gemini_service import GeminiService
+from app.services.ai.rate_limiter import ProviderLimiter, TokenBucket, RateLimitExceeded
+
+async def _run_in_order(limiter, requests):
+    """Hold the only slot, queue `requests` as (name, priority, client), then release and record grant order."""
+    order = []
+    await limiter.acquire(1, 0, "holder", 1)
+
+    async def request(name, priority, client):
+        await limiter.acquire(1, priority, client, 1)
+        order.append(name)
+        limiter.release(1)
+
+    tasks = [asyncio.create_task(request(*r)) for r in requests]
+    await asyncio.sleep(0)
+    limiter.release(1)
+    await asyncio.gather(*tasks)
+    return order
+
+def test_interactive_calls_are_scheduled_before_background():
+    # Arrange
+    limiter = ProviderLimiter("test", rpm=0, tpm=0, max_concurrency=1)
+    requests = [("background", 2, "jobs"), ("chat", 0, "session-1")]
+
+    # Act
+    order = asyncio.run(_run_in_order(limiter, requests))
+
+    # Assert
+    assert order == ["chat", "background"]
+
+def test_fair_queue_interleaves_clients_in_the_same_class():
+    # Arrange
+    limiter = ProviderLimiter("test", rpm=0, tpm=0, max_concurrency=1)
+    requests = [("a1", 0, "a"), ("a2", 0, "a"), ("a3", 0, "a"), ("b1", 0, "b")]
+
+    # Act
+    order = asyncio.run(_run_in_order(limiter, requests))
+
+    # Assert
+    assert order.index("b1") < order.index("a2")
+
+@patch('app.services.ai.rate_limiter.time.monotonic')
+def test_token_bucket_reports_wait_for_tpm_budget(mock_monotonic):
+    # Arrange
+    mock_monotonic.return_value = 0.0
+    bucket = TokenBucket(per_minute=600)
+    bucket.consume(600)
+
+    # Act
+    wait = bucket.time_until(100)
+    mock_monotonic.return_value = 10.0
+
+    # Assert
+    assert wait == pytest.approx(10.0)
+    assert bucket.time_until(100) == 0.0
+
+def test_acquire_times_out_when_no_capacity():
+    # Arrange
+    limiter = ProviderLimiter("test", rpm=0, tpm=0, max_concurrency=1)
+
+    async def run():
+        await limiter.acquire(1, 0, "holder", 1)
+        await limiter.acquire(1, 0, "waiter", 0.01)
+
+    # Act / Assert
+    with pytest.raises(RateLimitExceeded):
+        asyncio.run(run())
+    assert limiter.rejected == 1
+
+@patch.object(ProviderLimiter, "acquire", autospec=True)
+def test_gemini_calls_are_queued_per_client(mock_acquire):
+    # Arrange
+    with patch.object(gemini_service, "LOCAL_LLM_ENABLED", True):
+        service = GeminiService()
+
+    async def generate_and_stream():
+        await service.generate_response("Plan the release", client="session:1")
+        return [delta async for delta in service.stream_response("Plan the release", client="session:2")]
+
+    # Act
+    deltas = asyncio.run(generate_and_stream())
+
+    # Assert
+    assert deltas
+    assert [call.args[3] for call in mock_acquire.call_args_list] == ["session:1", "session:2"]
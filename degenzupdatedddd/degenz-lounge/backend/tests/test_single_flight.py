@@ -0,0 +1,88 @@
+import asyncio
+from unittest.mock import AsyncMock, patch
+
+import pytest
+
+from app.services.ai import gemini_service
+from app.services.ai.gemini_service import GeminiService
+from app.services.ai.single_flight import SingleFlight
+from app.services.ai.usage import GenerationResult
+
+def test_do_coalesces_concurrent_calls_with_same_key():
+    # Arrange
+    flight = SingleFlight()
+    calls = []
+
+    async def fetch():
+        calls.append(1)
+        await asyncio.sleep(0.01)
+        return "response"
+
+    async def run():
+        return await asyncio.gather(*(flight.do("key", fetch) for _ in range(5)))
+
+    # Act
+    results = asyncio.run(run())
+
+    # Assert
+    assert results == ["response"] * 5
+    assert len(calls) == 1
+    assert flight.stats()["coalesced"] == 4
+    assert flight.stats()["in_flight"] == 0
+
+def test_do_shares_errors_and_forgets_failed_call():
+    # Arrange
+    flight = SingleFlight()
+
+    async def fail():
+        await asyncio.sleep(0.01)
+        raise ValueError("upstream failed")
+
+    async def run():
+        return await asyncio.gather(flight.do("key", fail), flight.do("key", fail), return_exceptions=True)
+
+    # Act
+    results = asyncio.run(run())
+
+    # Assert
+    assert all(isinstance(result, ValueError) for result in results)
+    assert flight.executed == 1
+    assert flight.stats()["in_flight"] == 0
+
+def test_do_keeps_shared_call_running_when_one_caller_is_cancelled():
+    # Arrange
+    flight = SingleFlight()
+
+    async def fetch():
+        await asyncio.sleep(0.02)
+        return "response"
+
+    async def run():
+        first = asyncio.ensure_future(flight.do("key", fetch))
+        second = asyncio.ensure_future(flight.do("key", fetch))
+        await asyncio.sleep(0.005)
+        first.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await first
+        return await second
+
+    # Act
+    result = asyncio.run(run())
+
+    # Assert
+    assert result == "response"
+
+@patch('app.services.ai.gemini_service.single_flight')
+def test_gemini_flight_key_does_not_contain_the_api_key(mock_flight):
+    # Arrange
+    mock_flight.do = AsyncMock(return_value=("gemini", GenerationResult(text="Hello", provider="gemini")))
+    with patch.object(gemini_service, "LOCAL_LLM_ENABLED", True):
+        service = GeminiService()
+    service.api_key = "secret-gemini-key"
+
+    # Act
+    response = asyncio.run(service.generate_response("Hi"))
+
+    # Assert
+    assert response == "Hello"
+    assert "secret-gemini-key" not in mock_flight.do.call_args.args[0]
@@ -0,0 +1,47 @@
+import asyncio
+from unittest.mock import patch
+
+import httpx
+
+from app.services.ai.streaming import stream_chat_completions, stream_gemini_content
+
+def _client(body: str) -> httpx.AsyncClient:
+    return httpx.AsyncClient(transport=httpx.MockTransport(
+        lambda request: httpx.Response(200, text=body, headers={"Content-Type": "text/event-stream"})
+    ))
+
+async def _collect(stream):
+    return [delta async for delta in stream]
+
+@patch('app.services.ai.streaming.get_http_client')
+def test_stream_chat_completions_yields_content_deltas(mock_get_http_client):
+    # Arrange
+    mock_get_http_client.return_value = _client(
+        'data: {"choices": [{"delta": {"role": "assistant"}}]}\n\n'
+        'data: {"choices": [{"delta": {"content": "Hel"}}]}\n\n'
+        ': keep-alive\n\n'
+        'data: {"choices": [{"delta": {"content": "lo"}}]}\n\n'
+        'data: [DONE]\n\n'
+    )
+
+    # Act
+    deltas = asyncio.run(_collect(stream_chat_completions(
+        "mistral", "https://example.test/chat/completions", {}, {"model": "m", "messages": []}
+    )))
+
+    # Assert
+    assert deltas == ["Hel", "lo"]
+
+@patch('app.services.ai.streaming.get_http_client')
+def test_stream_gemini_content_yields_candidate_text(mock_get_http_client):
+    # Arrange
+    mock_get_http_client.return_value = _client(
+        'data: {"candidates": [{"content": {"parts": [{"text": "Hi "}]}}]}\n\n'
+        'data: {"candidates": [{"content": {"parts": [{"text": "there"}]}}]}\n\n'
+    )
+
+    # Act
+    deltas = asyncio.run(_collect(stream_gemini_content("https://example.test/stream", {"contents": []})))
+
+    # Assert
+    assert deltas == ["Hi ", "there"]
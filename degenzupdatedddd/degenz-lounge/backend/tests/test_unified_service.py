@@ -0,0 +1,70 @@
+import asyncio
+from unittest.mock import AsyncMock, patch
+
+from app.services.ai import gemini_service
+from app.services.ai.gemini_service import GeminiService
+from app.services.ai.rate_limiter import ProviderLimiter, PRIORITIES
+from app.services.ai.unified_service import UnifiedAIService
+
+def _unified_service():
+    # GeminiService backed by the offline local model instead of the hosted one
+    with patch.object(gemini_service, "LOCAL_LLM_ENABLED", True):
+        gemini = GeminiService()
+    with patch("app.services.ai.unified_service.get_gemini_service", return_value=gemini):
+        return UnifiedAIService()
+
+def test_generate_text_through_default_provider():
+    # Arrange
+    service = _unified_service()
+
+    # Act
+    result = asyncio.run(service.generate_text("hello", system_prompt="Be brief.", temperature=0.2, cache=False))
+
+    # Assert
+    assert result.provider == "gemini"
+    assert result.error is None
+    assert result.text
+    assert result.completion_tokens > 0
+
+def test_generate_kwargs_maps_system_prompt_for_gemini_service():
+    # Arrange
+    service = _unified_service()
+
+    # Act
+    kwargs = service._generate_kwargs(
+        service.providers["gemini"], prompt="hi", model="gemini-flash-2.0",
+        system_prompt="Be brief.", temperature=0.7, max_tokens=64
+    )
+
+    # Assert
+    assert kwargs == {"prompt": "hi", "system_instructions": "Be brief."}
+
+@patch.object(ProviderLimiter, "acquire", autospec=True)
+def test_gemini_call_takes_a_single_rate_limiter_slot(mock_acquire):
+    # Arrange
+    service = _unified_service()
+
+    # Act
+    result = asyncio.run(service.generate_text(
+        "hello", cache=False, client="user:1", priority="background"
+    ))
+
+    # Assert
+    assert result.error is None
+    assert mock_acquire.call_count == 1
+    _, _, priority, client, _ = mock_acquire.call_args.args
+    assert (priority, client) == (PRIORITIES["background"], "user:1")
+
+@patch.object(GeminiService, "embed_texts", new_callable=AsyncMock, return_value=[[0.1, 0.2]])
+@patch.object(ProviderLimiter, "acquire", autospec=True)
+def test_generate_embeddings_uses_the_requested_priority(mock_acquire, mock_embed):
+    # Arrange
+    service = _unified_service()
+
+    # Act
+    embeddings = asyncio.run(service.generate_embeddings(["query"], client="user:1", priority="interactive"))
+
+    # Assert
+    assert embeddings == [[0.1, 0.2]]
+    _, _, priority, client, _ = mock_acquire.call_args.args
+    assert (priority, client) == (PRIORITIES["interactive"], "user:1")
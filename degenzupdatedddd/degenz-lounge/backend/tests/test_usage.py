@@ -0,0 +1,42 @@
+from app.services.ai.usage import GenerationResult
+from app.utils.tokens import count_tokens
+
+def test_from_chat_completion_uses_reported_usage():
+    # Arrange
+    body = {
+        "model": "mistral-large-latest",
+        "choices": [{"message": {"content": "Hello there"}, "finish_reason": "stop"}],
+        "usage": {"prompt_tokens": 12, "completion_tokens": 3, "total_tokens": 15}
+    }
+
+    # Act
+    result = GenerationResult.from_chat_completion("mistral", "mistral-large", body, [{"role": "user", "content": "Hi"}])
+
+    # Assert
+    assert result.text == "Hello there"
+    assert result.model == "mistral-large-latest"
+    assert result.total_tokens == 15
+    assert result.finish_reason == "stop"
+    assert not result.estimated
+
+def test_from_response_estimates_usage_for_plain_text():
+    # Arrange
+    messages = [{"role": "user", "content": "Summarize the meeting notes"}]
+
+    # Act
+    result = GenerationResult.from_response("gemini", None, "The meeting covered the roadmap.", messages, "Be brief.")
+
+    # Assert
+    assert result.estimated
+    assert result.prompt_tokens == count_tokens("Summarize the meeting notes") + count_tokens("Be brief.")
+    assert result.completion_tokens == count_tokens("The meeting covered the roadmap.")
+
+def test_from_response_reports_errors():
+    # Act
+    result = GenerationResult.from_response("grok", "grok-2", {"error": "429 Too Many Requests"}, [{"content": "Hi"}])
+
+    # Assert
+    assert result.error == "429 Too Many Requests"
+    assert result.response == "Error: 429 Too Many Requests"
+    assert result.completion_tokens == 0
+    assert result.to_dict()["error"] == "429 Too Many Requests"
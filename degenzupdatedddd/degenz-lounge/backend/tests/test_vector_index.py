@@ -0,0 +1,127 @@
+import numpy as np
+import pytest
+
+from app.services.knowledge.vector_index import VectorIndex, IVFFlatIndex, cosine_top_k
+
+@pytest.fixture
+def embeddings():
+    rng = np.random.default_rng(42)
+    return rng.normal(size=(2000, 32)).astype(np.float32)
+
+def test_cosine_top_k_matches_per_item_scoring(embeddings):
+    # Arrange
+    query = embeddings[0] + 0.5
+    norms = np.linalg.norm(embeddings, axis=1)
+    expected = sorted(
+        range(len(embeddings)),
+        key=lambda i: float(np.dot(query, embeddings[i]) / (np.linalg.norm(query) * norms[i])),
+        reverse=True
+    )[:5]
+
+    # Act
+    top, scores = cosine_top_k(query, embeddings, norms, 5)
+
+    # Assert
+    assert top.tolist() == expected
+    assert list(scores) == sorted(scores, reverse=True)
+
+def test_flat_index_returns_exact_neighbours(embeddings):
+    # Arrange
+    index = VectorIndex()
+    index.add(range(1, 2001), embeddings.tolist())
+
+    # Act
+    results = index.search(embeddings[9].tolist(), k=5)
+
+    # Assert
+    assert len(results) == 5
+    assert results[0][0] == 10
+    assert results[0][1] == pytest.approx(1.0, abs=1e-5)
+    assert [score for _, score in results] == sorted([score for _, score in results], reverse=True)
+
+def test_add_replaces_existing_id_and_remove_deletes(embeddings):
+    # Arrange
+    index = VectorIndex()
+    index.add([1, 2], embeddings[:2].tolist())
+
+    # Act
+    index.add([1], [embeddings[5].tolist()])
+    index.remove([2])
+
+    # Assert
+    assert len(index) == 1
+    assert index.search(embeddings[5].tolist(), k=1)[0][0] == 1
+
+def test_empty_and_mismatched_embeddings_are_skipped(embeddings):
+    # Arrange
+    index = VectorIndex()
+
+    # Act
+    added = index.add([1, 2, 3], [embeddings[0].tolist(), [], [0.1, 0.2]])
+
+    # Assert
+    assert added == 1
+    assert index.search([0.1, 0.2], k=1) == []
+
+def test_ivf_index_trains_and_full_probe_matches_exact_search(embeddings):
+    # Arrange
+    flat = VectorIndex()
+    ivf = IVFFlatIndex(train_threshold=500)
+    flat.add(range(1, 2001), embeddings.tolist())
+    ivf.add(range(1, 2001), embeddings.tolist())
+    query = embeddings[100].tolist()
+
+    # Act
+    exact = flat.search(query, k=10)
+    probed = ivf.search(query, k=10, nprobe=1000)
+
+    # Assert
+    assert ivf.is_trained
+    assert [item_id for item_id, _ in probed] == [item_id for item_id, _ in exact]
+
+def test_candidate_filter_is_applied_alongside_probe(embeddings):
+    # Arrange
+    ivf = IVFFlatIndex(train_threshold=500)
+    ivf.add(range(1, 2001), embeddings.tolist())
+
+    # Act
+    results = ivf.search(embeddings[0].tolist(), k=10, nprobe=1, candidate_ids={5, 6, 7})
+
+    # Assert
+    assert sorted(item_id for item_id, _ in results) == [5, 6, 7]
+
+def test_index_round_trips_through_disk(tmp_path, embeddings):
+    # Arrange
+    ivf = IVFFlatIndex(train_threshold=500)
+    ivf.add(range(1, 2001), embeddings.tolist())
+    path = str(tmp_path / "repository_1.npz")
+
+    # Act
+    ivf.save(path)
+    loaded = VectorIndex.load(path)
+
+    # Assert
+    assert isinstance(loaded, IVFFlatIndex)
+    assert loaded.is_trained
+    assert len(loaded) == 2000
+    assert loaded.search(embeddings[3].tolist(), k=3, nprobe=4) == ivf.search(embeddings[3].tolist(), k=3, nprobe=4)
+
+def test_incremental_updates_keep_rows_and_clusters_consistent(embeddings):
+    # Arrange
+    flat = VectorIndex()
+    ivf = IVFFlatIndex(train_threshold=500)
+    for index in (flat, ivf):
+        for item_id in range(1, 1001):
+            index.add([item_id], [embeddings[item_id - 1].tolist()])
+
+    # Act
+    for index in (flat, ivf):
+        index.remove(range(1, 1001, 2))
+        index.add([2, 4], [embeddings[1500].tolist(), embeddings[1501].tolist()])
+
+    # Assert
+    assert len(flat) == len(ivf) == 500
+    query = embeddings[1500].tolist()
+    assert ivf.search(query, k=10, nprobe=1000) == flat.search(query, k=10)
+    for item_id, vector in ((2, embeddings[1500]), (4, embeddings[1501]), (998, embeddings[997])):
+        assert ivf.search(vector.tolist(), k=1, nprobe=1)[0][0] == item_id